@@ -1,3 +1,28 @@
 from agent.workflow import TradingAgent, GraphBuilder
+from agent.tool_executor import ParallelToolExecutor, ToolCallMemo
+from agent.registry import AgentRegistry
+from agent.sessions import SessionManager, HistoryCompactor
+from agent.context import ContextBudgeter, get_budget_stats
+from agent.cache import ResponseCache, tools_used
+from agent.router import QueryRouter, get_router_stats
+from agent.streaming import stream_agent_events, to_sse, ttft_tracker, stream_total_tracker
 
-__all__ = ["TradingAgent", "GraphBuilder"]
+__all__ = [
+    "TradingAgent",
+    "GraphBuilder",
+    "ParallelToolExecutor",
+    "ToolCallMemo",
+    "AgentRegistry",
+    "SessionManager",
+    "HistoryCompactor",
+    "ContextBudgeter",
+    "get_budget_stats",
+    "ResponseCache",
+    "tools_used",
+    "QueryRouter",
+    "get_router_stats",
+    "stream_agent_events",
+    "to_sse",
+    "ttft_tracker",
+    "stream_total_tracker",
+]
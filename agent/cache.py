@@ -0,0 +1,198 @@
+import json
+import re
+import threading
+from collections import Counter, OrderedDict
+from typing import FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+from core import StateStore, extract_tickers, load_config, logger, open_state_store, run_in_threadpool
+from core.tickers import COMPANIES
+
+# Quarters, halves, fiscal years, ordinal periods and any other number, in a lower-cased question
+PERIOD_PATTERN = re.compile(
+    r"\b(?:[qh][1-4]|fy\s?\d{2,4}|(?:first|second|third|fourth|1st|2nd|3rd|4th)\s+(?:quarter|half))\b|\d+(?:\.\d+)?"
+)
+
+def normalize_question(question: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    question = re.sub(r"[^\w\s/.$%-]", " ", question.lower())
+    return " ".join(question.split()).strip(" .")
+
+
+def tools_used(messages: list) -> List[str]:
+    """Names of the tools whose results appear in a graph's output messages."""
+    return sorted({msg.name for msg in messages if getattr(msg, "type", None) == "tool" and msg.name})
+
+
+class ResponseCache:
+    """Two-tier answer cache in front of the agent graph.
+    
+    The exact tier is keyed on the normalized question and lives in the
+    ``response_cache`` state store, so with a shared backend every worker
+    serves answers any worker produced. The semantic tier embeds the question
+    with the shared embedding model and returns the closest cached answer
+    whose cosine similarity clears ``similarity_threshold`` among those naming
+    the same tickers, periods and numbers (so "AAPL Q3 margin" never answers
+    "MSFT Q3 margin" or "AAPL Q2 margin"); its index is per process. Entries expire after the shortest TTL of the tools
+    that produced them and are evicted LRU once ``max_entries`` is reached.
+    """
+    
+    def __init__(self, config: Optional[dict] = None, embeddings=None, store: Optional[StateStore] = None):
+        config = config or load_config()
+        settings = config.get("response_cache", {})
+        self.enabled = settings.get("enabled", True)
+        self.max_entries = settings.get("max_entries", 1000)
+        self.default_ttl = settings.get("default_ttl_seconds", 3600)
+        self.tool_ttls = settings.get("tool_ttl_seconds", {})
+        semantic = settings.get("semantic", {})
+        self.semantic_enabled = semantic.get("enabled", True)
+        self.similarity_threshold = semantic.get("similarity_threshold", 0.92)
+        companies = config.get("router", {}).get("companies", {})
+        self.companies = {**COMPANIES, **{name.lower(): ticker for name, ticker in companies.items()}}
+        
+        self._embeddings = embeddings
+        self._store = store or open_state_store("response_cache", max_entries=self.max_entries, config=config)
+        # Semantic index: normalized question -> (scope, unit embedding), for answers this process stored
+        self._vectors: "OrderedDict[str, Tuple[FrozenSet[str], np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = Counter()
+    
+    def _get_embeddings(self):
+        if self._embeddings is None:
+            from vectorstore import get_vector_store_manager
+            self._embeddings = get_vector_store_manager().get_embeddings()
+        return self._embeddings
+    
+    async def _embed(self, question: str) -> Optional[np.ndarray]:
+        if not self.semantic_enabled:
+            return None
+        try:
+            vector = np.asarray(await self._get_embeddings().aembed_query(question), dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Semantic cache disabled for this lookup: {e}")
+            self.stats["embedding_errors"] += 1
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+    
+    async def _get(self, key: str) -> Optional[dict]:
+        """The cached entry for ``key``; a shared store is read in the thread pool."""
+        if self._store.shared:
+            value = await run_in_threadpool(self._store.get, key)
+        else:
+            value = self._store.get(key)
+        return json.loads(value) if value is not None else None
+    
+    def _scope(self, question: str) -> FrozenSet[str]:
+        """Tickers, periods and numbers a question names; a semantic hit must name the same ones."""
+        periods = ["".join(match.split()) for match in PERIOD_PATTERN.findall(question.lower())]
+        return frozenset(extract_tickers(question, self.companies)) | frozenset(periods)
+    
+    def _semantic_match(self, embedding: np.ndarray, scope: FrozenSet[str]) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            keys = [key for key, (entry_scope, _) in self._vectors.items() if entry_scope == scope]
+            if not keys:
+                return None
+            scores = np.stack([self._vectors[key][1] for key in keys]) @ embedding
+        best = int(np.argmax(scores))
+        if scores[best] >= self.similarity_threshold:
+            return keys[best], float(scores[best])
+        return None
+    
+    async def lookup(self, question: str) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """Return ``(answer, embedding)``; answer is None on a miss.
+        
+        The embedding (if computed) should be passed back to ``store`` so the
+        question is not embedded twice.
+        """
+        if not self.enabled:
+            return None, None
+        
+        key = normalize_question(question)
+        entry = await self._get(key)
+        if entry is not None:
+            self.stats["exact_hits"] += 1
+            return entry["answer"], None
+        
+        embedding = await self._embed(question)
+        if embedding is not None:
+            match = self._semantic_match(embedding, self._scope(question))
+            if match is not None:
+                matched_key, score = match
+                entry = await self._get(matched_key)
+                if entry is not None:
+                    self.stats["semantic_hits"] += 1
+                    logger.info(f"Semantic cache hit ({score:.3f}): '{question}' ~ '{matched_key}'")
+                    return entry["answer"], embedding
+                # Expired or evicted from the store
+                with self._lock:
+                    self._vectors.pop(matched_key, None)
+        
+        self.stats["misses"] += 1
+        return None, embedding
+    
+    def ttl_for(self, tools: List[str]) -> float:
+        """Freshness of an answer is bounded by its most volatile tool."""
+        ttls = [self.tool_ttls.get(name, self.default_ttl) for name in tools]
+        return min(ttls, default=self.default_ttl)
+    
+    def store(self, question: str, answer: str, tools: List[str] = (), embedding: Optional[np.ndarray] = None) -> None:
+        """Cache an answer produced using ``tools``."""
+        if not self.enabled or not answer:
+            return
+        
+        tools = list(tools)
+        ttl = self.ttl_for(tools)
+        if ttl <= 0:
+            return
+        
+        key = normalize_question(question)
+        self._store.set(key, json.dumps({"answer": answer, "tools": tools}), ttl=ttl)
+        if embedding is not None:
+            with self._lock:
+                self._vectors[key] = (self._scope(question), embedding)
+                self._vectors.move_to_end(key)
+                while len(self._vectors) > self.max_entries:
+                    self._vectors.popitem(last=False)
+    
+    async def astore(self, question: str, answer: str, tools: List[str] = (), embedding: Optional[np.ndarray] = None) -> None:
+        """Async :meth:`store`; a shared store is written in the thread pool."""
+        if self._store.shared:
+            await run_in_threadpool(self.store, question, answer, tools, embedding)
+        else:
+            self.store(question, answer, tools, embedding)
+    
+    def clear(self) -> None:
+        self._store.clear()
+        with self._lock:
+            self._vectors.clear()
+    
+    def invalidate_tool(self, tool_name: str) -> int:
+        """Drop answers that used ``tool_name`` (e.g. the knowledge base after a document is removed)."""
+        stale = []
+        for key in list(self._store.scan()):
+            value = self._store.get(key)
+            if value is not None and tool_name in json.loads(value)["tools"]:
+                stale.append(key)
+        self._store.delete(*stale)
+        with self._lock:
+            for key in stale:
+                self._vectors.pop(key, None)
+        return len(stale)
+    
+    def get_stats(self) -> dict:
+        """Hit/miss counters plus current size and hit rate."""
+        stats = dict(self.stats)
+        store_stats = self._store.get_stats()
+        stats.update(
+            entries=store_stats.pop("entries"),
+            expired=store_stats.get("expired", 0),
+            evictions=store_stats.get("evictions", 0),
+            backend=store_stats["backend"],
+        )
+        with self._lock:
+            stats["semantic_entries"] = len(self._vectors)
+        lookups = stats.get("exact_hits", 0) + stats.get("semantic_hits", 0) + stats.get("misses", 0)
+        stats["hit_rate"] = round((lookups - stats.get("misses", 0)) / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from langchain_core.messages import HumanMessage, ToolMessage
+
+from core import load_config
+from agent.sessions import estimate_tokens
+from vectorstore.bm25 import tokenize
+
+# Process-wide counters, so they survive agent rebuilds
+budget_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+@dataclass
+class Snippet:
+    text: str
+    position: int
+    score: float = 0.0
+    terms: set = field(init=False)
+    
+    def __post_init__(self):
+        self.terms = set(tokenize(self.text))
+    
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.text)
+
+
+def split_snippets(content: str) -> List[str]:
+    """Break a tool output into independently rankable snippets.
+    
+    JSON lists (web search results, Polygon financials) become one snippet per
+    item, with long ``raw_content`` split into paragraphs tagged by URL; plain
+    text (retriever chunks) is split on blank lines.
+    """
+    try:
+        items = json.loads(content)
+    except (TypeError, ValueError):
+        items = None
+    
+    if isinstance(items, list) and items:
+        snippets = []
+        for item in items:
+            if not isinstance(item, dict):
+                snippets.append(item if isinstance(item, str) else json.dumps(item, separators=(",", ":")))
+                continue
+            raw = item.get("raw_content")
+            summary = {key: value for key, value in item.items() if key != "raw_content"}
+            snippets.append(json.dumps(summary, separators=(",", ":")))
+            if raw:
+                tag = f"[{item.get('url', 'source')}] "
+                snippets.extend(tag + paragraph.strip() for paragraph in str(raw).split("\n\n") if paragraph.strip())
+        return snippets
+    
+    return [paragraph.strip() for paragraph in str(content).split("\n\n") if paragraph.strip()]
+
+
+class ContextBudgeter:
+    """Trims tool outputs before they are sent back to the LLM.
+    
+    Each tool message is split into snippets, exact and near-duplicate
+    snippets (within the message and across the turn) are dropped, and the
+    rest are ranked by term overlap with the user's question and packed
+    best-first into a token budget: the tool's own budget, scaled down
+    proportionally when the turn's tool outputs together exceed the per-turn
+    budget. Tokens trimmed are counted in ``budget_stats``.
+    """
+    
+    def __init__(self, settings: Optional[dict] = None):
+        settings = settings if settings is not None else load_config().get("context_budget", {})
+        self.enabled = settings.get("enabled", True)
+        self.turn_tokens = settings.get("turn_tokens", 3000)
+        self.default_tool_tokens = settings.get("default_tool_tokens", 1200)
+        self.tool_tokens = settings.get("tool_tokens", {})
+        self.dedupe_similarity = settings.get("dedupe_similarity", 0.8)
+        self.min_snippet_tokens = settings.get("min_snippet_tokens", 40)
+    
+    def budget_for(self, tool_name: str) -> int:
+        return self.tool_tokens.get(tool_name, self.default_tool_tokens)
+    
+    @staticmethod
+    def _question(state: dict) -> str:
+        for message in reversed(state["messages"]):
+            if isinstance(message, HumanMessage):
+                return str(message.content)
+        return ""
+    
+    def _dedupe(self, snippets: List[Snippet], seen: dict) -> List[Snippet]:
+        """Drop exact and near-duplicate snippets (token-set Jaccard >= ``dedupe_similarity``).
+        
+        Candidates are found through a bottom-k MinHash signature, so each
+        snippet is compared exactly only against snippets that share one of
+        its smallest term hashes instead of against every snippet seen.
+        """
+        kept = []
+        for snippet in snippets:
+            digest = hashlib.sha1(" ".join(snippet.text.lower().split()).encode("utf-8")).hexdigest()
+            terms = snippet.terms
+            signature = sorted(hash(term) for term in terms)[:8]
+            candidates = {index for value in signature for index in seen["buckets"].get(value, ())}
+            duplicate = digest in seen["hashes"] or any(
+                len(terms & seen["terms"][index]) / len(terms | seen["terms"][index]) >= self.dedupe_similarity
+                for index in candidates
+            )
+            if duplicate:
+                self._count("snippets_deduped")
+                continue
+            seen["hashes"].add(digest)
+            for value in signature:
+                seen["buckets"].setdefault(value, []).append(len(seen["terms"]))
+            seen["terms"].append(terms)
+            kept.append(snippet)
+        return kept
+    
+    @staticmethod
+    def _rank(snippets: List[Snippet], question_terms: set) -> List[Snippet]:
+        for snippet in snippets:
+            overlap = len(question_terms & snippet.terms) / len(question_terms) if question_terms else 0.0
+            # Tools return results best-first; keep that as a tie-breaker
+            snippet.score = overlap + 0.1 / (1 + snippet.position)
+        return sorted(snippets, key=lambda snippet: snippet.score, reverse=True)
+    
+    def _pack(self, snippets: List[Snippet], budget: int) -> List[str]:
+        packed, used = [], 0
+        for snippet in snippets:
+            remaining = budget - used
+            if snippet.tokens <= remaining:
+                packed.append(snippet.text)
+                used += snippet.tokens
+            elif remaining >= self.min_snippet_tokens:
+                packed.append(snippet.text[:remaining * 4] + " ...")
+                used = budget
+            else:
+                self._count("snippets_dropped")
+        return packed
+    
+    @staticmethod
+    def _count(key: str, amount: int = 1) -> None:
+        with _stats_lock:
+            budget_stats[key] += amount
+    
+    def apply(self, state: dict, result: dict) -> dict:
+        """Budget the ToolMessages in a tools-node ``result`` against the question in ``state``."""
+        if not self.enabled:
+            return result
+        
+        messages = result["messages"]
+        candidates = [
+            (i, message) for i, message in enumerate(messages)
+            if isinstance(message, ToolMessage) and message.status != "error"
+        ]
+        if not candidates:
+            return result
+        
+        question_terms = set(tokenize(self._question(state)))
+        seen = {"hashes": set(), "terms": [], "buckets": {}}
+        prepared = []
+        for i, message in candidates:
+            snippets = [Snippet(text, position) for position, text in enumerate(split_snippets(message.content))]
+            unique = self._rank(self._dedupe(snippets, seen), question_terms)
+            size = sum(snippet.tokens for snippet in unique)
+            prepared.append((i, message, unique, size, len(unique) < len(snippets)))
+        
+        wanted = {i: min(self.budget_for(message.name), size) for i, message, _, size, _ in prepared}
+        total_wanted = sum(wanted.values())
+        scale = min(1.0, self.turn_tokens / total_wanted) if total_wanted else 1.0
+        
+        budgeted = list(messages)
+        for i, message, snippets, size, deduped in prepared:
+            budget = int(wanted[i] * scale)
+            before = estimate_tokens(str(message.content))
+            self._count("tool_messages")
+            self._count("tokens_before", before)
+            if not deduped and size <= budget:
+                # Already fits: keep the tool's own formatting
+                self._count("tokens_after", before)
+                continue
+            content = "\n\n".join(self._pack(snippets, budget)) or "(duplicate of another tool result in this turn)"
+            after = estimate_tokens(content)
+            self._count("tokens_after", after)
+            self._count("tokens_trimmed", max(0, before - after))
+            self._count("messages_trimmed")
+            budgeted[i] = message.model_copy(update={"content": content})
+        return {**result, "messages": budgeted}
+
+
+def get_budget_stats() -> dict:
+    with _stats_lock:
+        stats = dict(budget_stats)
+    before = stats.get("tokens_before", 0)
+    stats["trimmed_ratio"] = round(stats.get("tokens_trimmed", 0) / before, 4) if before else 0.0
+    return stats
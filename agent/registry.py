@@ -0,0 +1,85 @@
+import threading
+from typing import Callable, Optional
+
+from core import config_mtime, logger, run_in_threadpool
+from agent.workflow import TradingAgent
+
+
+class AgentRegistry:
+    """Process-wide holder for a built TradingAgent.
+    
+    The LLM clients and the compiled LangGraph graph are created once and shared
+    by every request. Compiled graphs keep no per-invocation state, so concurrent
+    requests can use the same instance. When config.yaml changes on disk (or
+    ``rebuild()`` is called) a new agent is built and swapped in atomically;
+    requests arriving meanwhile and those already running keep the current
+    agent, and the old agent's tool threads are released once their calls
+    finish. The async methods check the config and build in the thread pool. The optional
+    checkpointer is shared across rebuilds, so sessions survive a reload.
+    """
+    
+    def __init__(self, agent_factory: Callable[[], TradingAgent] = TradingAgent, checkpointer=None):
+        self._agent_factory = agent_factory
+        self._checkpointer = checkpointer
+        self._lock = threading.Lock()
+        self._agent: Optional[TradingAgent] = None
+        self._config_mtime: Optional[float] = None
+        self.build_count = 0
+    
+    def _build(self, mtime: float) -> TradingAgent:
+        """Build a fresh agent and publish it. Caller must hold the lock."""
+        agent = self._agent_factory()
+        agent.build(checkpointer=self._checkpointer)
+        previous, self._agent = self._agent, agent
+        if previous is not None:
+            previous.close()
+        self._config_mtime = mtime
+        self.build_count += 1
+        logger.info(f"Built TradingAgent (build #{self.build_count})")
+        return agent
+    
+    def get_agent(self) -> TradingAgent:
+        """Return the shared agent, rebuilding it if config.yaml has changed."""
+        mtime = config_mtime()
+        agent = self._agent
+        if agent is not None and mtime == self._config_mtime:
+            return agent
+        
+        # While another request rebuilds, keep serving the current agent
+        if not self._lock.acquire(blocking=agent is None):
+            return agent
+        try:
+            # Another request may have rebuilt while we waited for the lock
+            if self._agent is None or mtime != self._config_mtime:
+                if self._agent is not None:
+                    logger.info("config.yaml changed, rebuilding TradingAgent")
+                return self._build(mtime)
+            return self._agent
+        finally:
+            self._lock.release()
+    
+    async def aget_agent(self) -> TradingAgent:
+        """Async :meth:`get_agent`: the config stat and any rebuild stay off the event loop."""
+        return await run_in_threadpool(self.get_agent)
+    
+    def get_graph(self):
+        """Return the shared compiled graph."""
+        return self.get_agent().get_graph()
+    
+    async def aget_graph(self):
+        return (await self.aget_agent()).get_graph()
+    
+    def close(self) -> None:
+        """Release the current agent's resources at shutdown."""
+        with self._lock:
+            agent, self._agent = self._agent, None
+        if agent is not None:
+            agent.close()
+    
+    def rebuild(self) -> TradingAgent:
+        """Force a rebuild of the agent, e.g. after rotating API keys."""
+        with self._lock:
+            return self._build(config_mtime())
+    
+    async def arebuild(self) -> TradingAgent:
+        return await run_in_threadpool(self.rebuild)
@@ -0,0 +1,168 @@
+import hashlib
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from langchain_core.messages import AIMessage
+
+from core import extract_tickers, load_config
+from core.tickers import COMPANIES
+from agent.streaming import LatencyTracker
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Intent vocabulary; the classifier's confidence is the share of the question's
+# content words these (and the neutral words) account for
+NEWS_TERMS = {
+    "news", "latest", "headline", "headlines", "today", "happening", "recent", "recently", "update", "updates",
+    "announcement", "announcements", "announce", "announced", "press", "price", "prices", "quote", "trading", "moving",
+    "moved", "now", "current", "currently", "week",
+}
+FINANCIAL_TERMS = {
+    "revenue", "revenues", "sales", "earnings", "eps", "income", "profit", "profits", "profitability", "margin",
+    "margins", "financials", "financial", "fundamentals", "balance", "sheet", "cash", "flow", "debt", "assets",
+    "liabilities", "equity", "quarter", "quarterly", "fiscal", "annual", "results",
+    "net", "gross", "operating", "expenses", "ebitda", "per", "share", "earn", "earned",
+}
+NEUTRAL_TERMS = {"stock", "stocks", "shares", "company", "inc", "corp", "last", "this", "past", "most", "year", "right"}
+STOP_WORDS = {
+    "what", "whats", "what's", "is", "are", "was", "were", "the", "a", "an", "on", "for", "of", "about", "me",
+    "show", "tell", "give", "get", "any", "in", "to", "with", "and", "its", "it", "s", "please", "from", "there",
+    "did", "do", "does", "i", "can", "you", "some", "their", "at", "has", "have", "been",
+}
+# Questions that need reasoning, advice or the knowledge base always go to the agent
+BLOCKING_TERMS = {
+    "should", "would", "could", "buy", "sell", "hold", "invest", "investing", "recommend", "recommendation",
+    "predict", "prediction", "forecast", "outlook", "compare", "comparison", "versus", "vs", "better", "best",
+    "worse", "explain", "why", "strategy", "strategies", "risk", "risks", "portfolio", "options", "valuation",
+    "undervalued", "overvalued", "target", "think", "opinion", "analysis", "analyze", "document", "documents",
+    "uploaded", "pdf", "difference", "if", "when",
+}
+# A named year or quarter: the financials tool only returns the latest filings
+PERIOD_PATTERN = re.compile(
+    r"\b(?:(?:19|20)\d{2}|[qh][1-4]|fy\s?\d{2,4}|(?:first|second|third|fourth|1st|2nd|3rd|4th)\s+(?:quarter|half))\b"
+)
+
+router_stats = Counter()
+_stats_lock = threading.Lock()
+# Latency of the LLM calls that chose tools; each routed question saves one
+selection_tracker = LatencyTracker()
+
+
+@dataclass
+class Route:
+    """The router's decision for one question; ``intent`` is None when it falls back to the agent."""
+    intent: Optional[str]
+    tickers: List[str] = field(default_factory=list)
+    confidence: float = 0.0
+    reason: str = ""
+    tool_calls: List[dict] = field(default_factory=list)
+
+
+class QueryRouter:
+    """Sends obvious questions straight to their tools, skipping the LLM's tool-selection call.
+    
+    Tickers come from cashtags, upper-case symbols and well-known company
+    names. A keyword classifier picks the intent: ``news`` (web_search),
+    ``financials`` (polygon_financials per ticker) or ``overview`` (both).
+    It is confident when intent and neutral words make up at least
+    ``min_confidence`` of the question's content words; anything asking for
+    advice, comparison or reasoning, naming a specific year or quarter, or
+    mentioning no ticker, falls back to the full agent loop. Routed questions
+    still get one LLM call to write the answer from the tool results.
+    """
+    
+    def __init__(self, tool_names: List[str], settings: Optional[dict] = None):
+        settings = settings if settings is not None else load_config().get("router", {})
+        self.enabled = settings.get("enabled", True)
+        self.min_confidence = settings.get("min_confidence", 0.6)
+        self.max_tickers = settings.get("max_tickers", 3)
+        self.max_words = settings.get("max_words", 16)
+        self.companies = {**COMPANIES, **{name.lower(): ticker for name, ticker in settings.get("companies", {}).items()}}
+        self.tool_names = set(tool_names)
+    
+    def extract_tickers(self, question: str) -> List[str]:
+        return extract_tickers(question, self.companies)
+    
+    def _tool_calls(self, intent: str, tickers: List[str], question: str) -> List[dict]:
+        calls = []
+        if intent in ("financials", "overview"):
+            calls += [{"name": "polygon_financials", "args": {"query": ticker}} for ticker in tickers]
+        if intent in ("news", "overview"):
+            # A canonical query, so rephrasings of the same question share tool cache entries
+            calls.append({"name": "web_search", "args": {"query": f"{' '.join(tickers)} stock latest news"}})
+        digest = hashlib.sha1(question.encode("utf-8")).hexdigest()
+        return [{**call, "id": f"route_{digest[:8]}_{i}"} for i, call in enumerate(calls)]
+    
+    def classify(self, question: str) -> Route:
+        """Decide how ``question`` should be answered, without side effects."""
+        tickers = self.extract_tickers(question)
+        if not tickers:
+            return Route(None, reason="no_ticker")
+        if len(tickers) > self.max_tickers:
+            return Route(None, tickers, reason="too_many_tickers")
+        
+        ticker_words = {ticker.lower() for ticker in tickers} | {word for name in self.companies for word in WORD_PATTERN.findall(name)}
+        words = [word for word in WORD_PATTERN.findall(question.lower()) if word not in ticker_words]
+        if len(words) > self.max_words:
+            return Route(None, tickers, reason="too_long")
+        if BLOCKING_TERMS.intersection(words):
+            return Route(None, tickers, reason="needs_reasoning")
+        if PERIOD_PATTERN.search(question.lower()):
+            return Route(None, tickers, reason="specific_period")
+        
+        content = [word for word in words if word not in STOP_WORDS and not word.isdigit()]
+        news = sum(word in NEWS_TERMS for word in content)
+        financials = sum(word in FINANCIAL_TERMS for word in content)
+        if not news and not financials:
+            return Route(None, tickers, reason="no_intent")
+        explained = news + financials + sum(word in NEUTRAL_TERMS for word in content)
+        confidence = round(explained / len(content), 3)
+        if confidence < self.min_confidence:
+            return Route(None, tickers, confidence, reason="low_confidence")
+        
+        intent = "overview" if news and financials else "news" if news else "financials"
+        tool_calls = self._tool_calls(intent, tickers, question)
+        if not {call["name"] for call in tool_calls} <= self.tool_names:
+            return Route(None, tickers, confidence, reason="tool_unavailable")
+        return Route(intent, tickers, confidence, tool_calls=tool_calls)
+    
+    def route(self, question: str) -> Optional[AIMessage]:
+        """The tool-calling message the agent would have produced, or None to run the agent."""
+        if not self.enabled:
+            return None
+        decision = self.classify(question)
+        with _stats_lock:
+            router_stats["questions"] += 1
+            router_stats[f"routed:{decision.intent}" if decision.intent else f"fallback:{decision.reason}"] += 1
+        if decision.intent is None:
+            return None
+        return AIMessage(content="", tool_calls=decision.tool_calls,
+                         response_metadata={"router": {"intent": decision.intent, "confidence": decision.confidence}})
+
+
+def is_routed(message) -> bool:
+    return isinstance(message, AIMessage) and "router" in message.response_metadata
+
+
+def get_router_stats() -> dict:
+    with _stats_lock:
+        stats = dict(router_stats)
+    questions = stats.pop("questions", 0)
+    intents = {key.split(":", 1)[1]: value for key, value in stats.items() if key.startswith("routed:")}
+    fallbacks = {key.split(":", 1)[1]: value for key, value in stats.items() if key.startswith("fallback:")}
+    routed = sum(intents.values())
+    selection = selection_tracker.summary()
+    return {
+        "questions": questions,
+        "routed": routed,
+        "hit_rate": round(routed / questions, 4) if questions else 0.0,
+        "intents": intents,
+        "fallbacks": fallbacks,
+        "llm_calls_saved": routed,
+        # Each routed question skips one tool-selection call of typical latency
+        "estimated_ms_saved": round(routed * selection.get("mean_ms", 0.0), 2),
+        "tool_selection_call": selection,
+    }
@@ -0,0 +1,452 @@
+import base64
+import json
+import random
+import sqlite3
+import threading
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, Iterator, List, Optional
+from urllib.parse import quote
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, RemoveMessage, SystemMessage, ToolMessage
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+from core import StateStore, load_config, logger, open_state_store, run_in_threadpool
+from agent.prompts import SUMMARY_PROMPT
+from agent.streaming import LatencyTracker
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) that needs no tokenizer download."""
+    return (len(text) + 3) // 4
+
+
+def message_tokens(messages: List[BaseMessage]) -> int:
+    return sum(estimate_tokens(str(message.content)) + 4 for message in messages)
+
+
+class ThreadPoolAsyncMixin:
+    """Async checkpointer methods that run the sync ones in the bounded thread pool."""
+    
+    async def aget_tuple(self, config):
+        return await run_in_threadpool(self.get_tuple, config)
+    
+    async def alist(self, config, *, filter=None, before=None, limit=None) -> AsyncIterator:
+        items = await run_in_threadpool(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+    
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await run_in_threadpool(self.put, config, checkpoint, metadata, new_versions)
+    
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await run_in_threadpool(self.put_writes, config, writes, task_id, task_path)
+    
+    async def adelete_thread(self, thread_id):
+        return await run_in_threadpool(self.delete_thread, thread_id)
+
+
+class StateStoreSaver(ThreadPoolAsyncMixin, BaseCheckpointSaver):
+    """Checkpointer on the ``checkpoints`` state store, so any worker can resume any session.
+    
+    Each thread keeps its ``checkpoints_kept`` most recent checkpoints (the
+    latest of every namespace is never dropped) plus their pending writes,
+    all expiring ``ttl`` seconds after the thread was last written. Writers
+    of one thread run in one process at a time (a graph run), so the
+    read-modify-write updates are serialized with a process-local lock.
+    """
+    
+    def __init__(self, store: StateStore, ttl: Optional[float] = None, checkpoints_kept: int = 10):
+        super().__init__()
+        self.store = store
+        self.ttl = ttl
+        self.checkpoints_kept = checkpoints_kept
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _key(thread_id: str, *parts: str) -> str:
+        return ":".join([quote(str(thread_id), safe="")] + [quote(part, safe="") for part in parts])
+    
+    def _dump(self, value) -> list:
+        type_, blob = self.serde.dumps_typed(value)
+        return [type_, base64.b64encode(blob).decode("ascii")]
+    
+    def _load(self, item: list):
+        return self.serde.loads_typed((item[0], base64.b64decode(item[1])))
+    
+    def _read(self, key: str, default=None):
+        value = self.store.get(key)
+        return json.loads(value) if value is not None else default
+    
+    def _write(self, key: str, value) -> None:
+        self.store.set(key, json.dumps(value), ttl=self.ttl)
+    
+    def _tuple(self, thread_id: str, ns: str, checkpoint_id: str) -> Optional[CheckpointTuple]:
+        record = self._read(self._key(thread_id, ns, "cp", checkpoint_id))
+        if record is None:
+            return None
+        writes = sorted(self._read(self._key(thread_id, ns, "writes", checkpoint_id), {}).values(), key=lambda w: w[:2])
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint_id}},
+            checkpoint=self._load(record["checkpoint"]),
+            metadata=self._load(record["metadata"]),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": record["parent_id"]}}
+                if record["parent_id"] else None
+            ),
+            pending_writes=[(task_id, channel, self._load(value)) for task_id, _, channel, value in writes],
+        )
+    
+    def get_tuple(self, config) -> Optional[CheckpointTuple]:
+        thread_id = str(config["configurable"]["thread_id"])
+        ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config) or self._read(self._key(thread_id, ns, "latest"))
+        return self._tuple(thread_id, ns, checkpoint_id) if checkpoint_id else None
+    
+    def list(self, config, *, filter=None, before=None, limit=None) -> Iterator[CheckpointTuple]:
+        """Checkpoints of ``config``'s thread, newest first (a thread is required)."""
+        if config is None:
+            return
+        thread_id = str(config["configurable"]["thread_id"])
+        ns = config["configurable"].get("checkpoint_ns")
+        before_id = get_checkpoint_id(before) if before else None
+        for item_ns, checkpoint_id in reversed(self._read(self._key(thread_id, "history"), [])):
+            if ns is not None and item_ns != ns:
+                continue
+            if before_id and checkpoint_id >= before_id:
+                continue
+            item = self._tuple(thread_id, item_ns, checkpoint_id)
+            if item is None or (filter and any(item.metadata.get(k) != v for k, v in filter.items())):
+                continue
+            yield item
+            if limit is not None:
+                limit -= 1
+                if limit <= 0:
+                    return
+    
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = str(config["configurable"]["thread_id"])
+        ns = config["configurable"].get("checkpoint_ns", "")
+        record = {
+            "checkpoint": self._dump(checkpoint),
+            "metadata": self._dump(get_checkpoint_metadata(config, metadata)),
+            "parent_id": config["configurable"].get("checkpoint_id"),
+        }
+        with self._lock:
+            self._write(self._key(thread_id, ns, "cp", checkpoint["id"]), record)
+            history = self._read(self._key(thread_id, "history"), [])
+            history.append([ns, checkpoint["id"]])
+            latest = {item_ns: checkpoint_id for item_ns, checkpoint_id in history}
+            dropped = {
+                (item_ns, checkpoint_id) for item_ns, checkpoint_id in history[:-self.checkpoints_kept]
+                if latest[item_ns] != checkpoint_id
+            }
+            for item_ns, checkpoint_id in dropped:
+                self.store.delete(
+                    self._key(thread_id, item_ns, "cp", checkpoint_id), self._key(thread_id, item_ns, "writes", checkpoint_id)
+                )
+            history = [item for item in history if tuple(item) not in dropped]
+            self._write(self._key(thread_id, "history"), history)
+            self._write(self._key(thread_id, ns, "latest"), checkpoint["id"])
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint["id"]}}
+    
+    def put_writes(self, config, writes, task_id, task_path="") -> None:
+        thread_id = str(config["configurable"]["thread_id"])
+        ns = config["configurable"].get("checkpoint_ns", "")
+        key = self._key(thread_id, ns, "writes", str(config["configurable"]["checkpoint_id"]))
+        with self._lock:
+            stored = self._read(key, {})
+            for idx, (channel, value) in enumerate(writes):
+                idx = WRITES_IDX_MAP.get(channel, idx)
+                write_key = f"{task_id}:{idx}"
+                # Special channels (errors, interrupts) overwrite; regular writes are recorded once
+                if channel in WRITES_IDX_MAP or write_key not in stored:
+                    stored[write_key] = [task_id, idx, channel, self._dump(value)]
+            self._write(key, stored)
+    
+    def delete_thread(self, thread_id: str) -> None:
+        thread_id = str(thread_id)
+        with self._lock:
+            history = self._read(self._key(thread_id, "history"), [])
+            keys = {self._key(thread_id, "history")}
+            for ns, checkpoint_id in history:
+                keys.update({
+                    self._key(thread_id, ns, "latest"),
+                    self._key(thread_id, ns, "cp", checkpoint_id),
+                    self._key(thread_id, ns, "writes", checkpoint_id),
+                })
+            self.store.delete(*keys)
+    
+    def get_next_version(self, current, channel) -> str:
+        # Same scheme as the in-memory and SQLite savers: monotonic counter plus a random tiebreak
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+
+def build_checkpointer(settings: dict, config: Optional[dict] = None) -> BaseCheckpointSaver:
+    """Create the checkpointer named by ``sessions.checkpointer`` ("memory", "sqlite" or "state")."""
+    kind = settings.get("checkpointer", "memory")
+    if kind == "memory":
+        return MemorySaver()
+    if kind == "state":
+        return StateStoreSaver(
+            open_state_store("checkpoints", config=config),
+            ttl=settings.get("ttl_seconds", 7 * 86400),
+            checkpoints_kept=settings.get("checkpoints_kept", 10),
+        )
+    if kind == "sqlite":
+        try:
+            from langgraph.checkpoint.sqlite import SqliteSaver
+        except ImportError as e:
+            raise ImportError("The sqlite checkpointer needs `pip install langgraph-checkpoint-sqlite`") from e
+        
+        class ThreadedSqliteSaver(ThreadPoolAsyncMixin, SqliteSaver):
+            """SqliteSaver whose async methods run the sync ones in the bounded thread pool."""
+        
+        path = Path(__file__).parent.parent / settings.get("sqlite_path", ".cache/sessions.sqlite")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return ThreadedSqliteSaver(sqlite3.connect(str(path), check_same_thread=False))
+    raise ValueError(f"Unknown sessions.checkpointer: {kind}")
+
+
+class SessionManager:
+    """Server-side conversation sessions backed by a LangGraph checkpointer.
+    
+    Each session is a checkpointer thread; the graph persists its message
+    history there between requests. The manager hands out session IDs and
+    keeps per-turn token counts and latency in the ``sessions`` state store.
+    With the memory backend the least recently used sessions beyond
+    ``max_sessions`` are evicted (and their threads deleted); a shared
+    backend expires sessions ``ttl_seconds`` after their last use instead.
+    """
+    
+    def __init__(self, config: Optional[dict] = None):
+        config = config or load_config()
+        self.settings = config.get("sessions", {})
+        self.checkpointer = build_checkpointer(self.settings, config)
+        self.max_sessions = self.settings.get("max_sessions", 1000)
+        self.turns_kept = self.settings.get("turns_kept", 50)
+        self.ttl = self.settings.get("ttl_seconds", 7 * 86400)
+        self._store = open_state_store(
+            "sessions", max_entries=self.max_sessions, on_evict=self._evicted, config=config
+        )
+        
+        self._lock = threading.Lock()
+        self.turn_latency = LatencyTracker()
+        self.totals = {"turns": 0, "input_tokens": 0, "output_tokens": 0}
+    
+    @staticmethod
+    def graph_config(session_id: str) -> dict:
+        return {"configurable": {"thread_id": session_id}}
+    
+    def _evicted(self, session_id: str) -> None:
+        self.checkpointer.delete_thread(session_id)
+        logger.info(f"Evicted session {session_id}")
+    
+    def open(self, session_id: Optional[str] = None) -> str:
+        """Return ``session_id`` (or a new one), marking it most recently used."""
+        session_id = session_id or uuid.uuid4().hex
+        if not self._store.touch(session_id, self.ttl):
+            self._store.add(session_id, "[]", ttl=self.ttl)
+        return session_id
+    
+    async def aopen(self, session_id: Optional[str] = None) -> str:
+        """Async :meth:`open`; a shared store is written in the thread pool."""
+        if self._store.shared:
+            return await run_in_threadpool(self.open, session_id)
+        return self.open(session_id)
+    
+    async def has_history(self, session_id: str) -> bool:
+        """Whether the session already holds earlier turns."""
+        return await self.checkpointer.aget_tuple(self.graph_config(session_id)) is not None
+    
+    def record_turn(self, session_id: str, messages: List[BaseMessage], summary: str, latency_ms: float) -> dict:
+        """Record token counts and latency for the turn that ended the ``messages`` history."""
+        last_human = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=-1)
+        replies = [m for m in messages[last_human + 1:] if isinstance(m, AIMessage)]
+        
+        input_tokens = output_tokens = 0
+        for reply in replies:
+            usage = reply.usage_metadata or {}
+            input_tokens += usage.get("input_tokens", 0)
+            output_tokens += usage.get("output_tokens", 0) or estimate_tokens(str(reply.content))
+        
+        turn = {
+            "latency_ms": round(latency_ms, 2),
+            "llm_calls": len(replies),
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "history_messages": len(messages),
+            "history_tokens": message_tokens(messages) + estimate_tokens(summary),
+            "summarized": bool(summary),
+        }
+        self.turn_latency.record(latency_ms)
+        with self._lock:
+            self.totals["turns"] += 1
+            self.totals["input_tokens"] += input_tokens
+            self.totals["output_tokens"] += output_tokens
+        turns = self.turns(session_id)
+        if turns is not None:
+            self._store.set(session_id, json.dumps((turns + [turn])[-self.turns_kept:]), ttl=self.ttl)
+        return turn
+    
+    async def arecord_turn(self, session_id: str, messages: List[BaseMessage], summary: str, latency_ms: float) -> dict:
+        """Async :meth:`record_turn`; a shared store is read and written in the thread pool."""
+        if self._store.shared:
+            return await run_in_threadpool(self.record_turn, session_id, messages, summary, latency_ms)
+        return self.record_turn(session_id, messages, summary, latency_ms)
+    
+    def turns(self, session_id: str) -> Optional[List[dict]]:
+        value = self._store.get(session_id)
+        return json.loads(value) if value is not None else None
+    
+    async def aturns(self, session_id: str) -> Optional[List[dict]]:
+        if self._store.shared:
+            return await run_in_threadpool(self.turns, session_id)
+        return self.turns(session_id)
+    
+    async def delete(self, session_id: str) -> None:
+        if self._store.shared:
+            await run_in_threadpool(self._store.delete, session_id)
+        else:
+            self._store.delete(session_id)
+        await self.checkpointer.adelete_thread(session_id)
+    
+    def get_stats(self) -> dict:
+        with self._lock:
+            totals = dict(self.totals)
+        return {
+            "active_sessions": self._store.size(),
+            "checkpointer": self.settings.get("checkpointer", "memory"),
+            "state_backend": self._store.backend,
+            **totals,
+            "turn_latency": self.turn_latency.summary(),
+        }
+
+
+class HistoryCompactor:
+    """Keeps a session's message history within a fixed window.
+    
+    At the start of each turn, tool outputs from earlier turns are truncated
+    to ``tool_output_max_chars`` and, once the history exceeds ``max_messages``
+    or ``max_history_tokens``, the oldest whole turns are folded into a running
+    summary (by the LLM, or extractively if ``summarize`` is off or the call
+    fails) and removed from the checkpointed state.
+    """
+    
+    def __init__(self, llm, settings: Optional[dict] = None):
+        settings = settings if settings is not None else load_config().get("sessions", {})
+        self.llm = llm
+        self.max_messages = settings.get("max_messages", 20)
+        self.max_history_tokens = settings.get("max_history_tokens", 4000)
+        self.tool_output_max_chars = settings.get("tool_output_max_chars", 500)
+        self.summarize = settings.get("summarize", True)
+    
+    def _truncate_tool_outputs(self, messages: List[BaseMessage], current_turn: int) -> List[BaseMessage]:
+        """Shortened copies of earlier turns' tool outputs; same ids, so add_messages replaces them."""
+        updates = []
+        for message in messages[:current_turn]:
+            content = str(message.content)
+            if isinstance(message, ToolMessage) and len(content) > self.tool_output_max_chars:
+                updates.append(message.model_copy(update={
+                    "content": content[:self.tool_output_max_chars] + " ...[truncated]",
+                }))
+        return updates
+    
+    def _split(self, messages: List[BaseMessage]) -> int:
+        """Index of the first message to keep: the oldest turn start that fits the window."""
+        turn_starts = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+        keep_from = turn_starts[-1] if turn_starts else 0
+        for start in reversed(turn_starts[:-1]):
+            kept = messages[start:]
+            if len(kept) > self.max_messages or message_tokens(kept) > self.max_history_tokens:
+                break
+            keep_from = start
+        return keep_from
+    
+    def _plan(self, state: dict):
+        messages = state["messages"]
+        turn_starts = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+        if len(turn_starts) < 2:
+            return [], []
+        truncated = {m.id: m for m in self._truncate_tool_outputs(messages, turn_starts[-1])}
+        messages = [truncated.get(m.id, m) for m in messages]
+        keep_from = self._split(messages)
+        return list(truncated.values()), messages[:keep_from]
+    
+    @staticmethod
+    def _transcript(messages: List[BaseMessage]) -> str:
+        lines = []
+        for message in messages:
+            if isinstance(message, HumanMessage):
+                lines.append(f"User: {message.content}")
+            elif isinstance(message, ToolMessage):
+                lines.append(f"Tool {message.name}: {message.content}")
+            elif message.content:
+                lines.append(f"Assistant: {message.content}")
+        return "\n".join(lines)
+    
+    def _summary_input(self, summary: str, old: List[BaseMessage]) -> List[BaseMessage]:
+        return [
+            SystemMessage(content=SUMMARY_PROMPT),
+            HumanMessage(content=f"Existing summary:\n{summary or '(none)'}\n\nNew messages:\n{self._transcript(old)}"),
+        ]
+    
+    def _extractive_summary(self, summary: str, old: List[BaseMessage]) -> str:
+        lines = [summary] if summary else []
+        for message in old:
+            if isinstance(message, HumanMessage):
+                lines.append(f"- User asked: {str(message.content)[:200]}")
+            elif isinstance(message, AIMessage) and message.content:
+                lines.append(f"  Answer: {str(message.content)[:300]}")
+        # ~4 chars per token: the running summary stays within a quarter of the history budget
+        return "\n".join(lines)[-self.max_history_tokens:]
+    
+    def _result(self, updates: List[BaseMessage], old: List[BaseMessage], summary: Optional[str]) -> dict:
+        removed = {m.id for m in old}
+        result = {"messages": [m for m in updates if m.id not in removed] + [RemoveMessage(id=m.id) for m in old]}
+        if summary is not None:
+            result["summary"] = summary
+        return result
+    
+    def compact(self, state: dict) -> dict:
+        updates, old = self._plan(state)
+        summary = None
+        if old:
+            summary = state.get("summary", "")
+            try:
+                if not self.summarize:
+                    raise RuntimeError("summarization disabled")
+                summary = self.llm.invoke(self._summary_input(summary, old)).content
+            except Exception as e:
+                logger.debug(f"Using extractive summary: {e}")
+                summary = self._extractive_summary(summary, old)
+        return self._result(updates, old, summary)
+    
+    async def acompact(self, state: dict) -> dict:
+        updates, old = self._plan(state)
+        summary = None
+        if old:
+            summary = state.get("summary", "")
+            try:
+                if not self.summarize:
+                    raise RuntimeError("summarization disabled")
+                summary = (await self.llm.ainvoke(self._summary_input(summary, old))).content
+            except Exception as e:
+                logger.debug(f"Using extractive summary: {e}")
+                summary = self._extractive_summary(summary, old)
+        return self._result(updates, old, summary)
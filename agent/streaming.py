@@ -0,0 +1,105 @@
+import json
+import statistics
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator
+
+
+class LatencyTracker:
+    """Rolling window of latency samples (ms) with percentile summaries."""
+    
+    def __init__(self, window: int = 1000):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+    
+    def record(self, value_ms: float) -> None:
+        with self._lock:
+            self._samples.append(value_ms)
+            self.count += 1
+    
+    def summary(self) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return {"count": self.count}
+        return {
+            "count": self.count,
+            "mean_ms": round(statistics.mean(samples), 2),
+            "p50_ms": round(samples[len(samples) // 2], 2),
+            "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+            "max_ms": round(samples[-1], 2),
+        }
+
+
+# The graph node whose model calls write the answer; other nodes' calls (the
+# history compactor's summary) are not streamed to the client
+ANSWER_NODE = "chatbot"
+
+# Time-to-first-token and total latency of streamed answers
+ttft_tracker = LatencyTracker()
+stream_total_tracker = LatencyTracker()
+
+
+def _truncate(value, limit: int = 500) -> str:
+    text = value if isinstance(value, str) else str(getattr(value, "content", value))
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+async def stream_agent_events(graph, inputs: dict, config: dict = None) -> AsyncIterator[dict]:
+    """Translate LangGraph ``astream_events`` into client-facing events.
+    
+    Yields ``token``, ``tool_start``, ``tool_end`` and a final ``final`` event
+    carrying the answer plus time-to-first-token and total latency. Only
+    model calls of the ``chatbot`` node count as the answer.
+    """
+    start = time.perf_counter()
+    ttft_ms = None
+    answer = ""
+    tools = set()
+    # Tools wrapped by the cache, scheduler and lazy loader emit one run per layer; report the outermost
+    tool_runs = set()
+    
+    async for event in graph.astream_events(inputs, config=config, version="v2"):
+        kind = event["event"]
+        
+        if kind.startswith("on_chat_model") and event.get("metadata", {}).get("langgraph_node") != ANSWER_NODE:
+            continue
+        
+        if kind == "on_chat_model_stream":
+            content = event["data"]["chunk"].content
+            if isinstance(content, str) and content:
+                if ttft_ms is None:
+                    ttft_ms = (time.perf_counter() - start) * 1000
+                    ttft_tracker.record(ttft_ms)
+                yield {"type": "token", "content": content}
+        
+        elif kind == "on_chat_model_end":
+            # The last model call of the run produces the answer
+            answer = getattr(event["data"].get("output"), "content", answer) or answer
+        
+        elif kind == "on_tool_start":
+            tool_runs.add(event["run_id"])
+            if not tool_runs.intersection(event.get("parent_ids", ())):
+                yield {"type": "tool_start", "name": event["name"], "input": event["data"].get("input")}
+        
+        elif kind == "on_tool_end":
+            tools.add(event["name"])
+            if not tool_runs.intersection(event.get("parent_ids", ())):
+                yield {"type": "tool_end", "name": event["name"], "output": _truncate(event["data"].get("output"))}
+    
+    total_ms = (time.perf_counter() - start) * 1000
+    stream_total_tracker.record(total_ms)
+    yield {
+        "type": "final",
+        "answer": answer,
+        "tools": sorted(tools),
+        "ttft_ms": round(ttft_ms, 2) if ttft_ms is not None else None,
+        "total_ms": round(total_ms, 2),
+    }
+
+
+def to_sse(event: dict) -> str:
+    """Encode an event dict as a Server-Sent Events message."""
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
@@ -0,0 +1,174 @@
+import asyncio
+import threading
+import time
+import weakref
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
+
+from core import load_config, logger
+from tools.tool_cache import normalize_args
+
+
+class ToolCallMemo:
+    """Shares tool results between graph runs that carry the same memo.
+    
+    Pass one instance as ``configurable["tool_memo"]`` to every run of a batch:
+    the first call with a given tool and normalized arguments executes, and
+    every other identical call in the batch (concurrent or later) reuses its
+    result, including errors.
+    """
+    
+    def __init__(self):
+        self._tasks: Dict[tuple, asyncio.Future] = {}
+        self.stats = Counter()
+    
+    async def run(self, call: dict, execute: Callable[[], Awaitable[ToolMessage]]) -> ToolMessage:
+        key = (call["name"], normalize_args(call["args"]))
+        task = self._tasks.get(key)
+        if task is None:
+            self.stats["executed"] += 1
+            task = self._tasks[key] = asyncio.ensure_future(execute())
+        else:
+            self.stats["shared"] += 1
+        # Shielded so one cancelled batch item doesn't cancel a call others are waiting on
+        message = await asyncio.shield(task)
+        return message.model_copy(update={"tool_call_id": call["id"], "id": None})
+    
+    def get_stats(self) -> dict:
+        return {"executed": self.stats["executed"], "shared": self.stats["shared"]}
+
+
+class ParallelToolExecutor:
+    """Graph node that runs one turn's tool calls concurrently.
+    
+    Each tool has a process-wide concurrency limit (protecting upstream rate
+    limits across requests) and a timeout. A call that fails or times out
+    becomes an error ToolMessage, so one slow Polygon call can't stall or sink
+    the whole turn; the LLM sees which calls failed and answers from the rest.
+    The sync path's thread pool is created on first use and released by
+    ``shutdown``; sync calls made after that fail instead of starting a new pool.
+    """
+    
+    def __init__(self, tools: List[BaseTool], settings: Optional[dict] = None):
+        settings = settings if settings is not None else load_config()["tools"].get("execution", {})
+        self.tools_by_name: Dict[str, BaseTool] = {tool.name: tool for tool in tools}
+        self.default_timeout = settings.get("default_timeout_seconds", 30)
+        self.default_limit = settings.get("default_max_concurrency", 4)
+        self.per_tool = settings.get("per_tool", {})
+        
+        self._thread_limits = {name: threading.BoundedSemaphore(self.limit_for(name)) for name in self.tools_by_name}
+        # asyncio semaphores are bound to the loop they are first used on
+        self._async_limits = weakref.WeakKeyDictionary()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._closed = False
+    
+    def timeout_for(self, name: str) -> float:
+        return self.per_tool.get(name, {}).get("timeout_seconds", self.default_timeout)
+    
+    def limit_for(self, name: str) -> int:
+        return self.per_tool.get(name, {}).get("max_concurrency", self.default_limit)
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._closed:
+                raise RuntimeError("Tool executor has been shut down")
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=sum(self.limit_for(name) for name in self.tools_by_name) or 1,
+                    thread_name_prefix="tool-call",
+                )
+            return self._executor
+    
+    def shutdown(self) -> None:
+        """Release the sync path's threads; calls already submitted still finish."""
+        with self._executor_lock:
+            self._closed = True
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+    
+    def _async_limit(self, name: str) -> asyncio.Semaphore:
+        limits = self._async_limits.setdefault(asyncio.get_running_loop(), {})
+        if name not in limits:
+            limits[name] = asyncio.Semaphore(self.limit_for(name))
+        return limits[name]
+    
+    @staticmethod
+    def _tool_calls(state: dict) -> list:
+        message = state["messages"][-1]
+        return message.tool_calls if isinstance(message, AIMessage) else []
+    
+    @staticmethod
+    def _error(call: dict, error: str) -> ToolMessage:
+        logger.warning(f"Tool call {call['name']} failed: {error}")
+        return ToolMessage(content=f"Error: {error}", name=call["name"], tool_call_id=call["id"], status="error")
+    
+    def _as_message(self, call: dict, output) -> ToolMessage:
+        if isinstance(output, ToolMessage):
+            return output
+        return ToolMessage(content=str(output), name=call["name"], tool_call_id=call["id"])
+    
+    async def _arun_call(self, call: dict, config: Optional[RunnableConfig]) -> ToolMessage:
+        memo = (config or {}).get("configurable", {}).get("tool_memo")
+        if memo is not None:
+            return await memo.run(call, lambda: self._aexecute(call, config))
+        return await self._aexecute(call, config)
+    
+    async def _aexecute(self, call: dict, config: Optional[RunnableConfig]) -> ToolMessage:
+        tool = self.tools_by_name.get(call["name"])
+        if tool is None:
+            return self._error(call, f"{call['name']} is not a valid tool, try one of {list(self.tools_by_name)}")
+        
+        timeout = self.timeout_for(call["name"])
+        try:
+            async with self._async_limit(call["name"]):
+                output = await asyncio.wait_for(tool.ainvoke({**call, "type": "tool_call"}, config), timeout)
+            return self._as_message(call, output)
+        except asyncio.TimeoutError:
+            return self._error(call, f"{call['name']} timed out after {timeout}s")
+        except Exception as e:
+            return self._error(call, f"{type(e).__name__}: {e}")
+    
+    async def ainvoke(self, state: dict, config: Optional[RunnableConfig] = None) -> dict:
+        calls = self._tool_calls(state)
+        messages = await asyncio.gather(*(self._arun_call(call, config) for call in calls))
+        return {"messages": list(messages)}
+    
+    def _run_call(self, call: dict, config: Optional[RunnableConfig]):
+        with self._thread_limits[call["name"]]:
+            return self.tools_by_name[call["name"]].invoke({**call, "type": "tool_call"}, config)
+    
+    def invoke(self, state: dict, config: Optional[RunnableConfig] = None) -> dict:
+        """Sync variant for graph.invoke: fans calls out to a thread pool."""
+        calls = self._tool_calls(state)
+        started = time.monotonic()
+        futures = {}
+        messages = []
+        for call in calls:
+            if call["name"] not in self.tools_by_name:
+                messages.append(self._error(call, f"{call['name']} is not a valid tool"))
+            else:
+                try:
+                    futures[call["id"]] = (call, self._get_executor().submit(self._run_call, call, config))
+                except RuntimeError as e:
+                    messages.append(self._error(call, str(e)))
+        
+        for call in calls:
+            if call["id"] not in futures:
+                continue
+            _, future = futures[call["id"]]
+            timeout = self.timeout_for(call["name"])
+            try:
+                remaining = max(0.0, started + timeout - time.monotonic())
+                messages.append(self._as_message(call, future.result(timeout=remaining)))
+            except FutureTimeoutError:
+                messages.append(self._error(call, f"{call['name']} timed out after {timeout}s"))
+            except Exception as e:
+                messages.append(self._error(call, f"{type(e).__name__}: {e}"))
+        return {"messages": messages}
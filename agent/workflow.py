@@ -1,18 +1,25 @@
+import time
 from typing import Annotated
-from typing_extensions import TypedDict
+from typing_extensions import NotRequired, TypedDict
 from langgraph.graph import StateGraph, START
 from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode, tools_condition
-from langchain_core.messages import SystemMessage
+from langgraph.prebuilt import tools_condition
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableLambda
 
-from core import ModelLoader
+from core import ModelLoader, run_in_threadpool
 from tools import all_tools
 from agent.prompts import TRADING_SYSTEM_PROMPT
+from agent.context import ContextBudgeter
+from agent.sessions import HistoryCompactor
+from agent.tool_executor import ParallelToolExecutor
+from agent.router import QueryRouter, is_routed, selection_tracker
 
 
 class AgentState(TypedDict):
     """State schema for the trading agent."""
     messages: Annotated[list, add_messages]
+    summary: NotRequired[str]  # compacted history of earlier turns in a session
 
 
 class TradingAgent:
@@ -23,33 +30,96 @@ class TradingAgent:
         self.llm = self.model_loader.load_llm()
         self.tools = all_tools
         self.llm_with_tools = self.llm.bind_tools(tools=self.tools)
+        # Routed turns already have their tool results; the model only writes the answer
+        self.llm_synthesis = self.llm.bind_tools(tools=self.tools, tool_choice="none")
+        self.router = QueryRouter([tool.name for tool in self.tools])
+        self.tool_executor = None
+        self.context_budgeter = ContextBudgeter()
         self.graph = None
     
+    def _prepare_messages(self, state: AgentState) -> list:
+        """Return the LLM input for the current state."""
+        system_prompt = TRADING_SYSTEM_PROMPT
+        if state.get("summary"):
+            system_prompt += f"\n\n## Conversation So Far\n{state['summary']}"
+        return [SystemMessage(content=system_prompt)] + state["messages"]
+    
+    def _route_node(self, state: AgentState) -> dict:
+        """Send an obvious question straight to its tools; anything else goes to the chatbot."""
+        message = state["messages"][-1]
+        routed = self.router.route(str(message.content)) if isinstance(message, HumanMessage) else None
+        return {"messages": [routed]} if routed is not None else {}
+    
+    async def _aroute_node(self, state: AgentState) -> dict:
+        """Async variant of _route_node; routing is cheap enough to run on the event loop."""
+        return self._route_node(state)
+    
+    @staticmethod
+    def _after_route(state: AgentState) -> str:
+        return "tools" if is_routed(state["messages"][-1]) else "chatbot"
+    
+    def _llm_for(self, state: AgentState):
+        """The synthesis model when this turn's tools were chosen by the router."""
+        for message in reversed(state["messages"]):
+            if isinstance(message, HumanMessage):
+                break
+            if is_routed(message):
+                return self.llm_synthesis
+        return self.llm_with_tools
+    
+    @staticmethod
+    def _record_selection(response, started: float) -> None:
+        if getattr(response, "tool_calls", None):
+            selection_tracker.record((time.perf_counter() - started) * 1000)
+    
     def _chatbot_node(self, state: AgentState) -> dict:
         """Process user message and generate response."""
-        messages = state["messages"]
-        
-        # Add system prompt if this is the first message
-        if len(messages) == 1:
-            messages = [SystemMessage(content=TRADING_SYSTEM_PROMPT)] + messages
-        
-        response = self.llm_with_tools.invoke(messages)
+        started = time.perf_counter()
+        response = self._llm_for(state).invoke(self._prepare_messages(state))
+        self._record_selection(response, started)
+        return {"messages": [response]}
+    
+    async def _achatbot_node(self, state: AgentState) -> dict:
+        """Async variant of _chatbot_node used by graph.ainvoke/astream."""
+        started = time.perf_counter()
+        response = await self._llm_for(state).ainvoke(self._prepare_messages(state))
+        self._record_selection(response, started)
         return {"messages": [response]}
     
-    def build(self) -> None:
-        """Build the LangGraph workflow."""
+    def _tools_node(self, state: AgentState, config=None) -> dict:
+        """Run the turn's tool calls, then trim their outputs to the context budget."""
+        return self.context_budgeter.apply(state, self.tool_executor.invoke(state, config))
+    
+    async def _atools_node(self, state: AgentState, config=None) -> dict:
+        """Async variant of _tools_node; budgeting is CPU-bound, so it runs off the event loop."""
+        result = await self.tool_executor.ainvoke(state, config)
+        return await run_in_threadpool(self.context_budgeter.apply, state, result)
+    
+    def build(self, checkpointer=None) -> None:
+        """Build the LangGraph workflow; a checkpointer makes it keep per-session history."""
         graph_builder = StateGraph(AgentState)
         
         # Add nodes
-        graph_builder.add_node("chatbot", self._chatbot_node)
-        graph_builder.add_node("tools", ToolNode(tools=self.tools))
+        compactor = HistoryCompactor(self.llm)
+        graph_builder.add_node("compact", RunnableLambda(compactor.compact, afunc=compactor.acompact))
+        graph_builder.add_node("route", RunnableLambda(self._route_node, afunc=self._aroute_node))
+        graph_builder.add_node("chatbot", RunnableLambda(self._chatbot_node, afunc=self._achatbot_node))
+        self.tool_executor = ParallelToolExecutor(self.tools)
+        graph_builder.add_node("tools", RunnableLambda(self._tools_node, afunc=self._atools_node))
         
         # Add edges
-        graph_builder.add_edge(START, "chatbot")
+        graph_builder.add_edge(START, "compact")
+        graph_builder.add_edge("compact", "route")
+        graph_builder.add_conditional_edges("route", self._after_route, ["tools", "chatbot"])
         graph_builder.add_conditional_edges("chatbot", tools_condition)
         graph_builder.add_edge("tools", "chatbot")
         
-        self.graph = graph_builder.compile()
+        self.graph = graph_builder.compile(checkpointer=checkpointer)
+    
+    def close(self) -> None:
+        """Release the tool executor's threads once the agent is no longer served."""
+        if self.tool_executor is not None:
+            self.tool_executor.shutdown()
     
     def get_graph(self):
         """Get the compiled graph."""
@@ -0,0 +1 @@
+"""Offline benchmarks for StockSage AI. Run each module with ``python -m benchmarks.<name>``."""
@@ -0,0 +1,63 @@
+"""Before/after latency of /query setup: per-request TradingAgent vs. AgentRegistry.
+
+Uses a stub LLM so only agent construction and graph invocation are measured.
+
+    python -m benchmarks.agent_registry --queries 200
+"""
+import argparse
+import statistics
+import time
+from unittest.mock import patch
+
+from benchmarks.stubs import stub_llm
+from agent import AgentRegistry, TradingAgent
+from core import ModelLoader
+
+
+def per_request(question: str) -> None:
+    """Old /query behaviour: build everything for every request."""
+    agent = TradingAgent()
+    agent.build()
+    agent.get_graph().invoke({"messages": [question]})
+
+
+def shared(registry: AgentRegistry, question: str) -> None:
+    """New /query behaviour: reuse the registry's compiled graph."""
+    registry.get_graph().invoke({"messages": [question]})
+
+
+def measure(fn, queries: int) -> list:
+    timings = []
+    for _ in range(queries):
+        start = time.perf_counter()
+        fn("What is a P/E ratio?")
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(label: str, timings: list) -> None:
+    p95 = statistics.quantiles(timings, n=20)[18]
+    print(f"{label:<14} mean={statistics.mean(timings):8.2f}ms  "
+          f"p50={statistics.median(timings):8.2f}ms  p95={p95:8.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+    
+    with patch.object(ModelLoader, "load_llm", side_effect=lambda: stub_llm()):
+        before = measure(per_request, args.queries)
+        
+        registry = AgentRegistry()
+        registry.get_agent()
+        after = measure(lambda q: shared(registry, q), args.queries)
+    
+    report("per-request", before)
+    report("registry", after)
+    print(f"speedup (mean): {statistics.mean(before) / statistics.mean(after):.1f}x, "
+          f"agent builds: {registry.build_count}")
+
+
+if __name__ == "__main__":
+    main()
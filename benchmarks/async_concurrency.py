@@ -0,0 +1,69 @@
+"""Throughput of the /query graph under concurrency: blocking invoke vs. ainvoke.
+
+Each query makes two stub LLM calls and one stub tool call, each with fixed
+latency, mirroring the chatbot -> tools -> chatbot loop. The blocking mode calls
+``graph.invoke`` from the event loop (the old /query behaviour); the async mode
+awaits ``graph.ainvoke``.
+
+    python -m benchmarks.async_concurrency --queries 200
+"""
+import argparse
+import asyncio
+import time
+from unittest.mock import patch
+
+from benchmarks.stubs import ToolCallingStubLLM, stub_retriever_tool
+from agent import TradingAgent
+from core import ModelLoader
+
+
+def build_graph(llm_latency: float, tool_latency: float):
+    llm = ToolCallingStubLLM(latency_seconds=llm_latency)
+    with patch.object(ModelLoader, "load_llm", return_value=llm), \
+            patch("agent.workflow.all_tools", [stub_retriever_tool(tool_latency)]):
+        agent = TradingAgent()
+        agent.build()
+    return agent.get_graph()
+
+
+async def run_blocking(graph, question: str):
+    return graph.invoke({"messages": [question]})
+
+
+async def run_async(graph, question: str):
+    return await graph.ainvoke({"messages": [question]})
+
+
+async def run_batch(runner, graph, queries: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def one(i: int):
+        async with semaphore:
+            await runner(graph, f"What is the P/E ratio of ticker {i}?")
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(queries)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--tool-latency", type=float, default=0.02)
+    args = parser.parse_args()
+    
+    graph = build_graph(args.llm_latency, args.tool_latency)
+    blocking_queries = min(args.queries, 20)  # serialised, so keep it short
+    
+    elapsed = asyncio.run(run_batch(run_blocking, graph, blocking_queries, blocking_queries))
+    print(f"{'invoke':<8} concurrency={blocking_queries:<4} {blocking_queries / elapsed:8.1f} q/s")
+    
+    for concurrency in [1, 10, 50, args.queries]:
+        elapsed = asyncio.run(run_batch(run_async, graph, args.queries, concurrency))
+        print(f"{'ainvoke':<8} concurrency={concurrency:<4} {args.queries / elapsed:8.1f} q/s "
+              f"({elapsed:.2f}s for {args.queries} queries)")
+
+
+if __name__ == "__main__":
+    main()
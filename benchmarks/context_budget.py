@@ -0,0 +1,117 @@
+"""Prompt size and latency of the answer LLM call with and without context budgeting.
+
+Stub tools return realistically bloated outputs: web search results with
+``raw_content`` full of page boilerplate (repeated across sites), knowledge
+base chunks that overlap the web results, and a long Polygon financials JSON
+list. The stub LLM charges a per-token prefill latency, so trimming the tool
+messages shows up in end-to-end latency as well as prompt tokens.
+
+    python -m benchmarks.context_budget --queries 20
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from unittest.mock import patch
+
+from langchain_core.tools import StructuredTool
+
+from benchmarks.stubs import ToolCallingStubLLM
+from agent import TradingAgent, get_budget_stats
+from core import ModelLoader, load_config
+
+BOILERPLATE = [
+    "We use cookies to improve your experience. By continuing to browse you agree to our cookie policy.",
+    "Subscribe to our newsletter for the latest market news delivered to your inbox every morning.",
+    "This article is for informational purposes only and does not constitute investment advice.",
+    "Related: Top 10 dividend stocks to buy now. Related: Why the Fed matters for your portfolio.",
+]
+
+
+VOCABULARY = [f"term{i}" for i in range(2000)]
+
+
+def filler(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+
+def make_tools(question_terms: str, seed: int = 0):
+    rng = random.Random(seed)
+    
+    def web_search(query: str) -> list:
+        results = []
+        for site in range(5):
+            paragraphs = [f"{question_terms} {filler(rng, 60)}" for _ in range(3)]
+            paragraphs += [filler(rng, 80) for _ in range(12)] + BOILERPLATE
+            results.append({
+                "url": f"https://news.example.com/{site}",
+                "content": f"{question_terms} {filler(rng, 40)}",
+                "raw_content": "\n\n".join(paragraphs),
+            })
+        return results
+    
+    def retriever(question: str) -> str:
+        chunks = [f"{question_terms} {filler(rng, 150)}" for _ in range(3)]
+        return "\n\n".join(chunks + chunks[:1])  # overlapping chunks from two documents
+    
+    def financials(query: str) -> str:
+        return json.dumps([
+            {"fiscal_period": f"Q{q}", "fiscal_year": str(2020 + q // 4),
+             "financials": {"income_statement": {name: {"value": rng.randint(1, 10**9), "unit": "USD"}
+                                                 for name in ["revenues", "net_income", "operating_income",
+                                                              "gross_profit", "cost_of_revenue", "eps"]}}}
+            for q in range(12)
+        ])
+    
+    return [
+        StructuredTool.from_function(func=web_search, name="web_search", description="Stub web search."),
+        StructuredTool.from_function(func=retriever, name="retriever_tool", description="Stub retriever."),
+        StructuredTool.from_function(func=financials, name="polygon_financials", description="Stub financials."),
+    ]
+
+
+def build_graph(enabled: bool, latency_per_token: float):
+    question = "AAPL earnings guidance"
+    calls = [
+        {"name": "web_search", "args": {"query": question}},
+        {"name": "retriever_tool", "args": {"question": question}},
+        {"name": "polygon_financials", "args": {"query": "AAPL"}},
+    ]
+    llm = ToolCallingStubLLM(latency_seconds=0.02, latency_per_token=latency_per_token, tool_calls=calls)
+    settings = {**load_config()["context_budget"], "enabled": enabled}
+    with patch.object(ModelLoader, "load_llm", return_value=llm), \
+            patch("agent.workflow.all_tools", make_tools(question)), \
+            patch("agent.context.load_config", return_value={"context_budget": settings}):
+        agent = TradingAgent()
+        agent.build()
+    return agent.get_graph(), llm
+
+
+async def run(graph, queries: int) -> list:
+    latencies = []
+    for i in range(queries):
+        start = time.perf_counter()
+        await graph.ainvoke({"messages": [f"What did AAPL say about earnings guidance? ({i})"]})
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=20.0, help="stub LLM prefill cost")
+    args = parser.parse_args()
+    
+    for enabled in [False, True]:
+        graph, llm = build_graph(enabled, args.ms_per_1k_tokens / 1000 / 1000)
+        latencies = asyncio.run(run(graph, args.queries))
+        answer_prompts = llm.prompt_tokens[1::2]  # second LLM call of each query sees the tool outputs
+        print(f"budgeting={'on ' if enabled else 'off'}  answer prompt {statistics.mean(answer_prompts):8.0f} tokens  "
+              f"latency mean {statistics.mean(latencies):7.1f}ms  p95 {sorted(latencies)[int(len(latencies) * 0.95) - 1]:7.1f}ms")
+    print(f"trimmed: {get_budget_stats()}")
+
+
+if __name__ == "__main__":
+    main()
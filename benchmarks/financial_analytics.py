@@ -0,0 +1,166 @@
+"""Financial analytics: the columnar store vs. the raw-JSON path.
+
+A comparison question ("rank these semiconductors by net margin, with
+revenue growth") answered two ways:
+
+- raw JSON: one ``polygon_financials`` call per ticker, the way the agent
+  gathers fundamentals today; the JSON goes into the LLM context and the
+  numbers are worked out from it (here, by a plain Python loop over the
+  parsed statements)
+- columnar: one ``financial_analytics`` call; tickers missing from the
+  store are fetched once (cold), after that the query is vectorized NumPy
+  over the memory-mapped columns (warm)
+
+Both use the offline fakes with ``--tool-latency`` per provider call. The
+scale section then times the computation alone on a larger universe, and
+checks the two paths produce the same table.
+
+    python -m benchmarks.financial_analytics --tickers 10 --scale-tickers 500 --scale-quarters 40
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks.load_test import load_test_config
+
+METRICS = ["revenue", "net_margin", "roe"]
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4  # as agent.sessions.estimate_tokens
+
+
+def raw_summary(payloads: dict, metrics: list, quarters: int, sort_by: str) -> str:
+    """The summary table worked out from raw Polygon JSON with plain Python."""
+    from tools.financial_analytics import RATIOS, _render, format_value
+    from tools.financials_store import STATEMENT_FIELDS, period_label
+    
+    def field(result, column):
+        statement, name = STATEMENT_FIELDS[column]
+        return result["financials"][statement][name]["value"]
+    
+    def metric(result, name):
+        if name in RATIOS:
+            numerator, denominator = RATIOS[name]
+            return field(result, numerator) / field(result, denominator)
+        return field(result, name)
+    
+    rows = []
+    for ticker, payload in payloads.items():
+        results = [r for r in json.loads(payload) if r.get("timeframe", "quarterly") == "quarterly"]
+        results.sort(key=lambda r: (int(r["fiscal_year"]), r["fiscal_period"]), reverse=True)
+        latest = results[0]
+        period = int(latest["fiscal_year"]) * 4 + int(latest["fiscal_period"][1:]) - 1
+        cells, sort_key = [], None
+        for name in metrics:
+            values = [metric(result, name) for result in results[:max(quarters, 5)]]
+            average = statistics.fmean(values[:quarters])
+            year_ago = values[4] if len(values) > 4 else None
+            if year_ago is None:
+                change = float("nan")
+            elif name in RATIOS:
+                change = values[0] - year_ago
+            else:
+                change = (values[0] - year_ago) / abs(year_ago)
+            cells += [format_value(values[0], name), format_value(average, name), format_value(change, name, True)]
+            if f"{name}_avg" == sort_by:
+                sort_key = average
+        rows.append((sort_key, ticker, period_label(period), cells))
+    rows.sort(key=lambda row: -row[0])
+    header = ["rank", "ticker", "latest"] + [f"{m}{suffix}" for m in metrics for suffix in ("", f"_avg{quarters}q", "_yoy")]
+    return _render(header, [[str(rank), ticker, label] + cells for rank, (_, ticker, label, cells) in enumerate(rows, 1)])
+
+
+def timed(fn, repeat: int = 1):
+    """(result, median ms) of ``repeat`` runs of ``fn``."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(times)
+
+
+def agent_path(args, tickers: list) -> None:
+    from tools import analytics_tool, financials_tool
+    
+    def raw():
+        # The tool executor runs polygon_financials calls concurrently, up to its per-tool limit
+        with ThreadPoolExecutor(max_workers=args.raw_concurrency) as pool:
+            payloads = dict(zip(tickers, pool.map(lambda t: financials_tool.invoke({"query": t}), tickers)))
+        return payloads
+    
+    payloads, raw_ms = timed(raw)
+    raw_tokens = sum(estimate_tokens(payload) for payload in payloads.values())
+    _, raw_compute_ms = timed(lambda: raw_summary(payloads, METRICS, 4, "net_margin_avg"), repeat=20)
+    
+    query = {"tickers": tickers, "metrics": METRICS, "quarters": 4, "sort_by": "net_margin_avg"}
+    table, cold_ms = timed(lambda: analytics_tool.invoke(query))
+    _, warm_ms = timed(lambda: analytics_tool.invoke(query), repeat=20)
+    
+    print(f"Agent path, {len(tickers)} tickers, {args.tool_latency:.2f}s per provider call:")
+    print(f"  raw JSON       {raw_ms:8.1f}ms fetch + {raw_compute_ms:6.2f}ms compute   "
+          f"{raw_tokens:6d} tokens into the context ({len(tickers)} tool calls)")
+    print(f"  columnar cold  {cold_ms:8.1f}ms (fetch + store + query)         "
+          f"{estimate_tokens(table):6d} tokens (1 tool call)")
+    print(f"  columnar warm  {warm_ms:8.2f}ms                                  "
+          f"{estimate_tokens(table):6d} tokens")
+    print(table)
+
+
+def scale(args) -> bool:
+    from tools.fakes import fake_statements
+    from tools.financial_analytics import summary_table
+    from tools.financials_store import FinancialsStore
+    
+    tickers = [f"T{i:04d}" for i in range(args.scale_tickers)]
+    statements = {ticker: fake_statements(ticker, args.scale_quarters) for ticker in tickers}
+    payloads = {ticker: json.dumps(results) for ticker, results in statements.items()}
+    with tempfile.TemporaryDirectory() as path:
+        store = FinancialsStore(Path(path))
+        _, upsert_ms = timed(lambda: store.upsert(statements))
+        store = FinancialsStore(Path(path))  # reopen: the query reads the memory-mapped file
+        
+        for quarters in (4, min(12, args.scale_quarters)):
+            expected, raw_ms = timed(lambda: raw_summary(payloads, METRICS, quarters, "net_margin_avg"), repeat=3)
+            actual, vector_ms = timed(lambda: summary_table(store.table(), tickers, METRICS, quarters, "net_margin_avg"),
+                                      repeat=3)
+            print(f"Scale, {len(tickers)} tickers x {args.scale_quarters} quarters stored, {quarters}-quarter summary:")
+            print(f"  raw JSON loop  {raw_ms:8.1f}ms")
+            print(f"  vectorized     {vector_ms:8.1f}ms ({raw_ms / vector_ms:.1f}x)   store write {upsert_ms:.0f}ms once")
+            if actual != expected:
+                print("FAIL the vectorized table differs from the raw-JSON one")
+                return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, default=10, help="tickers in the agent-path comparison")
+    parser.add_argument("--tool-latency", type=float, default=0.3, help="fake provider latency per call (s)")
+    parser.add_argument("--raw-concurrency", type=int, default=2, help="polygon_financials calls in flight")
+    parser.add_argument("--scale-tickers", type=int, default=500)
+    parser.add_argument("--scale-quarters", type=int, default=40)
+    args = parser.parse_args()
+    
+    semiconductors = ["NVDA", "AMD", "INTC", "TSM", "AVGO", "QCOM", "MU", "TXN", "ADI", "MRVL", "NXPI", "ON"]
+    tickers = (semiconductors + [f"T{i:04d}" for i in range(args.tickers)])[:args.tickers]
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ["STOCKSAGE_CONFIG"] = str(load_test_config(
+            Path(workdir), llm_latency=0.0, tool_latency=args.tool_latency,
+            overrides={"tools": {"cache": {"enabled": False}, "analytics": {"path": str(Path(workdir) / "financials")}},
+                       "logging": {"format": "text"}},
+        ))
+        agent_path(args, tickers)
+    if not scale(args):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Import time of the app's packages, measured with ``python -X importtime``.
+
+Each target is imported in a fresh interpreter ``--runs`` times and the
+median cumulative time is compared against
+``benchmarks/baselines/import_time.json``. Importing must also not pull in
+provider SDKs, which are loaded lazily on first use.
+
+    python -m benchmarks.import_time                   # compare with the baseline
+    python -m benchmarks.import_time --save-baseline   # record a new baseline
+
+Exits non-zero on a regression beyond ``--tolerance`` (and ``--min-delta-ms``)
+or when an eagerly imported provider module is found.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).parent.parent
+BASELINE_PATH = Path(__file__).parent / "baselines" / "import_time.json"
+TARGETS = ["core", "models", "vectorstore", "tools", "agent", "ingestion", "main"]
+# Provider SDKs that must only be imported when the configured provider is used
+LAZY_MODULES = ["langchain_community", "langchain_google_genai", "langchain_groq", "langchain_pinecone", "pinecone"]
+
+
+def import_profile(target: str) -> tuple:
+    """Return (cumulative microseconds, imported module names) for a cold ``import target``."""
+    env = {**os.environ, "PYTHONPATH": str(REPO_ROOT)}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"import {target} failed: {result.stderr.strip().splitlines()[-1]}")
+    modules, total = set(), None
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header row
+        name = name.strip()
+        modules.add(name)
+        if name == target:
+            total = int(cumulative)
+    return total, modules
+
+
+def measure(targets: list, runs: int) -> dict:
+    results = {}
+    for target in targets:
+        timings, eager = [], set()
+        for _ in range(runs):
+            total, modules = import_profile(target)
+            timings.append(total / 1000)
+            eager |= {name for name in modules if name.split(".")[0] in LAZY_MODULES}
+        results[target] = {
+            "median_ms": round(statistics.median(timings), 1),
+            "min_ms": round(min(timings), 1),
+            "eager_providers": sorted({name.split(".")[0] for name in eager}),
+        }
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_delta_ms: float) -> list:
+    problems = []
+    for target, item in results.items():
+        if item["eager_providers"]:
+            problems.append(f"{target} imports provider SDKs eagerly: {', '.join(item['eager_providers'])}")
+        old = baseline.get(target)
+        if old is None:
+            continue
+        delta = item["median_ms"] - old["median_ms"]
+        if delta > min_delta_ms and delta / old["median_ms"] > tolerance:
+            problems.append(f"{target}: {old['median_ms']}ms -> {item['median_ms']}ms ({delta / old['median_ms']:+.0%})")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--targets", nargs="+", default=TARGETS)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--min-delta-ms", type=float, default=50.0, help="ignore smaller absolute changes (noise)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+    
+    results = measure(args.targets, args.runs)
+    for target, item in results.items():
+        eager = f"  eager providers: {', '.join(item['eager_providers'])}" if item["eager_providers"] else ""
+        print(f"import {target:<12} median {item['median_ms']:7.1f}ms  min {item['min_ms']:7.1f}ms{eager}")
+    
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    problems = compare(results, baseline, args.tolerance, args.min_delta_ms)
+    for problem in problems:
+        print(f"REGRESSION {problem}")
+    if problems:
+        sys.exit(1)
+    print(f"No regressions beyond {args.tolerance:.0%}" if baseline else f"No baseline at {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Sequential vs. staged ingestion over data/samples with fake embeddings and Pinecone.
+
+The sequential path mirrors the original DataIngestion: parse every file in
+turn, split everything, then embed and upsert in one block. The staged path is
+DataIngestion.run_pipeline. Peak Python heap (tracemalloc) of the API process is
+reported for growing batch sizes to show that memory stays flat.
+
+    python -m benchmarks.ingestion_pipeline --copies 1 4 8
+"""
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+
+from benchmarks.stubs import FakeEmbeddings
+from benchmarks.vector_client_reuse import FakePinecone
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+import ingestion.manifest
+import vectorstore.manager
+from ingestion import DataIngestion, DocumentManifest
+from ingestion.pipeline import chunk_id, parse_pages
+from ingestion.uploads import UploadLimits, discard_uploads, spool_file
+from vectorstore import VectorStoreManager
+
+SAMPLES = Path(__file__).parent.parent / "data" / "samples"
+
+
+def fresh_manager(latency: float) -> VectorStoreManager:
+    manager = VectorStoreManager(
+        pinecone_factory=FakePinecone,
+        embeddings_factory=lambda: FakeEmbeddings(dimension=768, latency_seconds=latency),
+    )
+    vectorstore.manager._manager = manager
+    # A fresh manifest too, or repeated uploads would be skipped as unchanged
+    ingestion.manifest._manifest = DocumentManifest(Path(tempfile.mkdtemp()) / "documents.sqlite")
+    return manager
+
+
+def sample_paths(copies: int) -> list:
+    return [path for _ in range(copies) for path in sorted(SAMPLES.iterdir()) if path.suffix in (".pdf", ".docx")]
+
+
+def sequential(paths: list, manager: VectorStoreManager) -> int:
+    documents = []
+    for path in paths:
+        with open(path, "rb") as file:
+            upload = spool_file(file, path.name, UploadLimits())
+        try:
+            documents.extend(parse_pages(upload))
+        finally:
+            discard_uploads([upload])
+    chunks = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200).split_documents(documents)
+    unique = {chunk_id(chunk.page_content, chunk.metadata["source"]): chunk for chunk in chunks}
+    manager.ensure_index(dimension=768)
+    manager.get_vector_store().add_documents(list(unique.values()), ids=list(unique))
+    return len(chunks)
+
+
+def staged(paths: list) -> int:
+    uploads = [SimpleNamespace(filename=f"{i}-{path.name}", file=open(path, "rb")) for i, path in enumerate(paths)]
+    try:
+        return DataIngestion().run_pipeline(uploads)["chunks"]
+    finally:
+        for upload in uploads:
+            upload.file.close()
+
+
+def measure(label: str, fn) -> None:
+    """Time one run, then repeat it under tracemalloc (which slows Python down) for peak heap."""
+    start = time.perf_counter()
+    chunks = fn()
+    elapsed = time.perf_counter() - start
+    
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {chunks:6d} chunks  {elapsed:7.2f}s  {chunks / elapsed:8.1f} chunks/s  "
+          f"peak heap {peak / 1024 / 1024:7.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--copies", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="seconds per embedding call")
+    args = parser.parse_args()
+    
+    # Warm the parse pool so process start-up isn't billed to the first run
+    fresh_manager(args.embed_latency)
+    staged(sample_paths(1))
+    
+    for copies in args.copies:
+        paths = sample_paths(copies)
+        measure(f"sequential x{copies}", lambda: sequential(paths, fresh_manager(args.embed_latency)))
+        measure(f"staged x{copies}", lambda: fresh_manager(args.embed_latency) and staged(paths))
+
+
+if __name__ == "__main__":
+    main()
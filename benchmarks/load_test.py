@@ -0,0 +1,249 @@
+"""Offline load test of the FastAPI app, compared against a stored baseline.
+
+The app runs in-process against the deterministic fakes (``llm.provider``,
+``embedding_model.provider`` and ``tools.backend`` set to ``fake``) with the
+local vector store seeded with synthetic filings, so no API keys or network
+are needed and results are repeatable. Each scenario reports p50/p95/p99
+latency and throughput; memory is reported as peak RSS and its growth over
+the run. (httpx's ASGI transport buffers response bodies, so time to first
+token comes from the server's own streaming tracker.)
+    
+    python -m benchmarks.load_test                    # compare with the baseline
+    python -m benchmarks.load_test --save-baseline    # record a new baseline
+
+Exits non-zero when a scenario's p95 latency, throughput or peak RSS regresses by more
+than ``--tolerance`` against ``benchmarks/baselines/load_test.json``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import yaml
+
+REPO_ROOT = Path(__file__).parent.parent
+BASELINE_PATH = Path(__file__).parent / "baselines" / "load_test.json"
+TICKERS = ["AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "TSLA", "JPM", "XOM", "KO", "PFE", "WMT"]
+TOPICS = ["dividend", "valuation", "momentum", "hedging", "options", "liquidity", "margin", "earnings",
+          "buyback", "leverage", "volatility", "sector", "rotation", "index", "bond", "inflation"]
+
+
+def deep_merge(base: dict, overrides: dict) -> dict:
+    merged = dict(base)
+    for key, value in overrides.items():
+        merged[key] = deep_merge(merged[key], value) if isinstance(value, dict) and isinstance(merged.get(key), dict) else value
+    return merged
+
+
+def load_test_config(workdir: Path, llm_latency: float, tool_latency: float, overrides: dict = None) -> Path:
+    """Write config.yaml with the fakes selected and all state under ``workdir``, plus ``overrides``."""
+    with open(REPO_ROOT / "config" / "config.yaml") as file:
+        config = yaml.safe_load(file)
+    config = deep_merge(config, {
+        "vector_db": {"provider": "local", "local": {"path": str(workdir / "vector_index"), "search": "exact"}},
+        "retriever": {"mode": "hybrid", "bm25": {"enabled": True, "path": str(workdir / "bm25.sqlite")}},
+        "embedding_model": {"provider": "fake", "cache": {"enabled": False}},
+        "llm": {"provider": "fake", "fake": {"latency_seconds": llm_latency}},
+        "tools": {"backend": "fake", "fake": {"latency_seconds": tool_latency}, "cache": {"disk": {"enabled": False}}},
+        # Hashed bag-of-words embeddings make templated questions look alike
+        "response_cache": {"semantic": {"enabled": False}},
+        "sessions": {"checkpointer": "memory"},
+        "tracing": {"enabled": True, "sample_rate": 0.0},
+    })
+    config = deep_merge(config, overrides or {})
+    path = workdir / "config.yaml"
+    path.write_text(yaml.safe_dump(config))
+    return path
+
+
+def seed_knowledge_base(documents: int) -> None:
+    from vectorstore import get_vector_store_manager
+    
+    rng = random.Random(0)
+    texts = [
+        f"{rng.choice(TOPICS).title()} note {i}: " + " ".join(rng.choice(TOPICS + TICKERS) for _ in range(120))
+        for i in range(documents)
+    ]
+    ids = [f"seed-{i}" for i in range(documents)]
+    manager = get_vector_store_manager()
+    manager.get_vector_store().add_texts(texts, ids=ids)
+    keyword_index = manager.get_keyword_index()
+    if keyword_index is not None:
+        keyword_index.add(ids, texts, [{} for _ in ids])
+
+
+def question(i: int) -> str:
+    rng = random.Random(i)
+    kind = i % 3
+    if kind == 0:
+        return f"Compare the fundamentals of {' and '.join(rng.sample(TICKERS, 2))} for request {i}"
+    if kind == 1:
+        return f"What is the latest news on {rng.choice(TICKERS)} {rng.choice(TOPICS)} ({i})?"
+    return f"Explain {rng.choice(TOPICS)} and {rng.choice(TOPICS)} strategy number {i}"
+
+
+def current_rss_mb() -> float:
+    with open("/proc/self/statm") as file:
+        return int(file.read().split()[1]) * resource.getpagesize() / 2**20
+
+
+def summarize(name: str, latencies: list, elapsed: float, errors: int, extra: dict = None) -> dict:
+    values = np.array(latencies) if latencies else np.zeros(1)
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p95_ms": round(float(np.percentile(values, 95)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        **(extra or {}),
+    }
+
+
+async def closed_loop(name: str, requests: int, concurrency: int, send) -> dict:
+    """Run ``requests`` calls of ``send(i)`` with ``concurrency`` callers; ``send`` returns latency in ms or None."""
+    counter = iter(range(requests))
+    latencies, errors = [], 0
+    
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            latency = await send(i)
+            if latency is None:
+                errors += 1
+            else:
+                latencies.append(latency)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(name, latencies, time.perf_counter() - start, errors)
+
+
+async def run_scenarios(client, args) -> list:
+    async def query(i, text=None):
+        start = time.perf_counter()
+        response = await client.post("/query", json={"question": text or question(i)})
+        return (time.perf_counter() - start) * 1000 if response.status_code == 200 and "answer" in response.json() else None
+    
+    async def stream(i):
+        start = time.perf_counter()
+        async with client.stream("POST", "/query/stream", json={"question": question(100_000 + i)}) as response:
+            async for line in response.aiter_lines():
+                if line.startswith("data: ") and json.loads(line[len("data: "):])["type"] == "error":
+                    return None
+        return (time.perf_counter() - start) * 1000
+    
+    results = [
+        await closed_loop("query_unique", args.requests, args.concurrency, query),
+        await closed_loop("query_cached", args.requests, args.concurrency, lambda i: query(i, question(0))),
+    ]
+    streamed = await closed_loop("query_stream", args.requests, args.concurrency, stream)
+    ttft = (await client.get("/stats")).json()["streaming"]["time_to_first_token"]
+    streamed["ttft_p50_ms"], streamed["ttft_p95_ms"] = ttft.get("p50_ms", 0.0), ttft.get("p95_ms", 0.0)
+    results.append(streamed)
+    
+    questions = [question(200_000 + i) for i in range(args.batch_size)]
+    start = time.perf_counter()
+    latencies, errors = [], 0
+    async with client.stream("POST", "/query/batch", json={"questions": questions}) as response:
+        async for line in response.aiter_lines():
+            item = json.loads(line)
+            if item["type"] == "result":
+                if "error" in item:
+                    errors += 1
+                else:
+                    latencies.append(item["queued_ms"] + item["elapsed_ms"])
+    results.append(summarize("query_batch", latencies, time.perf_counter() - start, errors))
+    return results
+
+
+async def run(args) -> list:
+    import httpx
+    from main import app
+    
+    seed_knowledge_base(args.documents)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=120) as client:
+            await client.post("/query", json={"question": "warm up"})
+            rss_before = current_rss_mb()
+            results = await run_scenarios(client, args)
+            stats = (await client.get("/stats")).json()
+    
+    memory = {
+        "scenario": "memory",
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "rss_growth_mb": round(current_rss_mb() - rss_before, 1),
+    }
+    print(f"tool cache hit rate {stats['tool_cache'].get('hit_rate')}, "
+          f"active sessions {stats['sessions']['active_sessions']}")
+    return results + [memory]
+
+
+def compare(results: list, baseline: list, tolerance: float) -> list:
+    """Return regressions beyond ``tolerance`` (fractional) vs. the baseline."""
+    previous = {item["scenario"]: item for item in baseline}
+    regressions = []
+    for item in results:
+        old = previous.get(item["scenario"])
+        if old is None:
+            continue
+        for metric, worse_if_higher in [("p95_ms", True), ("throughput_rps", False), ("peak_rss_mb", True)]:
+            if metric not in item or not old.get(metric):
+                continue
+            change = (item[metric] - old[metric]) / old[metric]
+            # Sub-millisecond cache hits jitter by more than any sane tolerance
+            if metric == "p95_ms" and item[metric] - old[metric] < 5:
+                continue
+            if (change if worse_if_higher else -change) > tolerance:
+                regressions.append(f"{item['scenario']}.{metric}: {old[metric]} -> {item[metric]} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--documents", type=int, default=500, help="synthetic chunks seeded into the local store")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="fake LLM time to first token (s)")
+    parser.add_argument("--tool-latency", type=float, default=0.05, help="fake search/financials latency (s)")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        # Must be set before anything imports core.config_loader
+        os.environ["STOCKSAGE_CONFIG"] = str(load_test_config(Path(workdir), args.llm_latency, args.tool_latency))
+        results = asyncio.run(run(args))
+    
+    for item in results:
+        print(json.dumps(item))
+    
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --save-baseline first")
+        return
+    regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
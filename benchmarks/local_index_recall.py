@@ -0,0 +1,73 @@
+"""Recall@k vs. latency of LocalVectorIndex IVF search against exact search.
+
+Vectors are drawn from Gaussian clusters (like topic-clustered document
+chunks); queries are perturbed copies of stored vectors.
+
+    python -m benchmarks.local_index_recall --vectors 100000 --dimension 768
+"""
+import argparse
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from vectorstore import LocalVectorIndex
+
+
+def clustered_vectors(n: int, dimension: int, clusters: int, rng) -> np.ndarray:
+    centers = rng.normal(size=(clusters, dimension))
+    return centers[rng.integers(0, clusters, size=n)] + 0.5 * rng.normal(size=(n, dimension))
+
+
+def timed_search(index: LocalVectorIndex, queries: np.ndarray, k: int, exact: bool):
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append({vector_id for vector_id, _, _ in index.search(query, k, exact=exact)})
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    vectors = clustered_vectors(args.vectors, args.dimension, args.clusters, rng)
+    queries = vectors[rng.integers(0, args.vectors, size=args.queries)] + 0.1 * rng.normal(
+        size=(args.queries, args.dimension))
+    
+    with tempfile.TemporaryDirectory() as path:
+        index = LocalVectorIndex(path, args.dimension, search="ivf", min_train_size=args.vectors + 1)
+        start = time.perf_counter()
+        for i in range(0, args.vectors, 10000):
+            batch = vectors[i:i + 10000]
+            index.add([str(j) for j in range(i, i + len(batch))], batch, [{} for _ in batch])
+        print(f"indexed {args.vectors} x {args.dimension} in {time.perf_counter() - start:.2f}s")
+        
+        start = time.perf_counter()
+        index.train()
+        print(f"trained IVF ({len(index._centroids)} lists) in {time.perf_counter() - start:.2f}s\n")
+        
+        truth, exact_latencies = timed_search(index, queries, args.k, exact=True)
+        print(f"{'mode':<12} {'recall@' + str(args.k):>10} {'p50 ms':>8} {'p95 ms':>8}")
+        p95 = statistics.quantiles(exact_latencies, n=20)[18]
+        print(f"{'exact':<12} {1.0:>10.3f} {statistics.median(exact_latencies):>8.2f} {p95:>8.2f}")
+        
+        for nprobe in args.nprobe:
+            index.nprobe = nprobe
+            found, latencies = timed_search(index, queries, args.k, exact=False)
+            recall = statistics.mean(len(f & t) / len(t) for f, t in zip(found, truth))
+            p95 = statistics.quantiles(latencies, n=20)[18]
+            print(f"{'ivf/' + str(nprobe):<12} {recall:>10.3f} {statistics.median(latencies):>8.2f} {p95:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Wall-clock of one agent turn that fans out to several tools.
+
+The stub LLM asks for financials on three tickers, a web search and a
+knowledge-base lookup in a single turn, plus one call to a tool that hangs past
+its timeout. The sequential baseline is the old ToolNode-style behaviour (calls
+awaited one after another, no timeouts); the parallel mode is the graph's
+ParallelToolExecutor, where the hung call becomes an error ToolMessage instead
+of blocking the turn.
+
+    python -m benchmarks.parallel_tools --tool-latency 0.3
+"""
+import argparse
+import asyncio
+import time
+from unittest.mock import patch
+
+from langchain_core.tools import StructuredTool
+
+from benchmarks.stubs import ToolCallingStubLLM
+from agent import TradingAgent
+from core import ModelLoader
+
+
+def latency_tool(name: str, latency: float) -> StructuredTool:
+    async def call(query: str) -> str:
+        await asyncio.sleep(latency)
+        return f"{name} result for {query}"
+    
+    def call_sync(query: str) -> str:
+        time.sleep(latency)
+        return f"{name} result for {query}"
+    
+    return StructuredTool.from_function(func=call_sync, coroutine=call, name=name, description=f"Stub {name}.")
+
+
+TOOL_CALLS = [
+    {"name": "polygon_financials", "args": {"query": "AAPL"}},
+    {"name": "polygon_financials", "args": {"query": "MSFT"}},
+    {"name": "polygon_financials", "args": {"query": "NVDA"}},
+    {"name": "web_search", "args": {"query": "semiconductor news"}},
+    {"name": "retriever_tool", "args": {"query": "AAPL margins"}},
+    {"name": "slow_tool", "args": {"query": "hangs"}},
+]
+
+
+def build_graph(tool_latency: float, slow_latency: float, timeout: float):
+    tools = [latency_tool(name, tool_latency) for name in ["polygon_financials", "web_search", "retriever_tool"]]
+    tools.append(latency_tool("slow_tool", slow_latency))
+    settings = {
+        "default_timeout_seconds": timeout,
+        "default_max_concurrency": 4,
+        "per_tool": {"polygon_financials": {"max_concurrency": 2}},
+    }
+    llm = ToolCallingStubLLM(latency_seconds=0.0, tool_calls=TOOL_CALLS)
+    with patch.object(ModelLoader, "load_llm", return_value=llm), \
+            patch("agent.workflow.all_tools", tools), \
+            patch("agent.tool_executor.load_config", return_value={"tools": {"execution": settings}}):
+        agent = TradingAgent()
+        agent.build()
+    return agent.get_graph(), {tool.name: tool for tool in tools}
+
+
+async def run_sequential(tools: dict) -> float:
+    start = time.perf_counter()
+    for call in TOOL_CALLS:
+        await tools[call["name"]].ainvoke(call["args"])
+    return time.perf_counter() - start
+
+
+async def run_parallel(graph) -> tuple:
+    start = time.perf_counter()
+    result = await graph.ainvoke({"messages": ["Compare AAPL, MSFT and NVDA"]})
+    elapsed = time.perf_counter() - start
+    errors = [m for m in result["messages"] if getattr(m, "status", None) == "error"]
+    return elapsed, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tool-latency", type=float, default=0.3)
+    parser.add_argument("--slow-latency", type=float, default=3.0)
+    parser.add_argument("--timeout", type=float, default=1.0)
+    args = parser.parse_args()
+    
+    graph, tools = build_graph(args.tool_latency, args.slow_latency, args.timeout)
+    
+    sequential = asyncio.run(run_sequential(tools))
+    parallel, errors = asyncio.run(run_parallel(graph))
+    print(f"{'sequential':<11} {sequential:6.2f}s  ({len(TOOL_CALLS)} calls, no timeouts)")
+    print(f"{'parallel':<11} {parallel:6.2f}s  ({len(errors)} failed: "
+          f"{', '.join(m.content for m in errors) or 'none'})")
+    print(f"speedup     {sequential / parallel:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Cost of re-uploading a document after a small edit vs. ingesting it fresh.
+
+A synthetic multi-page PDF is ingested into a temporary local index, then
+re-uploaded under the same name with ``--modified`` of its pages rewritten,
+then re-uploaded unchanged. Embedding calls are counted, so the cost of an
+update is visible independent of the (fake) embedding latency.
+
+    python -m benchmarks.reingest --pages 200 --modified 0.01
+"""
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from benchmarks.stubs import CountingEmbeddings, write_text_pdf
+
+import ingestion.manifest
+import vectorstore.manager
+from core import load_config
+from ingestion import DataIngestion, DocumentManifest
+from vectorstore import VectorStoreManager
+
+WORDS = ["revenue", "margin", "guidance", "segment", "liquidity", "dividend", "capex", "backlog", "hedging",
+         "inventory", "impairment", "buyback", "leverage", "covenant", "goodwill", "deferred", "tax", "lease"]
+
+
+def page_text(seed: int, words: int = 260) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(WORDS) for _ in range(words)) + f" (page {seed})"
+
+
+def upload(path: Path, filename: str) -> dict:
+    with open(path, "rb") as file:
+        return DataIngestion().run_pipeline([SimpleNamespace(filename=filename, file=file)])
+
+
+def run(label: str, path: Path, embeddings: CountingEmbeddings, manager: VectorStoreManager) -> dict:
+    embedded_before = embeddings.embedded
+    start = time.perf_counter()
+    result = upload(path, "annual_report.pdf")
+    elapsed = time.perf_counter() - start
+    document = result["documents"][0]
+    print(f"{label:<12} {elapsed:6.2f}s  chunks {result['chunks']:5d}  embedded {embeddings.embedded - embedded_before:5d}  "
+          f"deleted {result['chunks_deleted']:4d}  version {document['version']}  status {document['status']:<9}  "
+          f"index size {len(manager.get_index())}")
+    return {"seconds": elapsed, "embedded": embeddings.embedded - embedded_before}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--modified", type=float, default=0.01, help="fraction of pages rewritten")
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="seconds per embedding call")
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        workdir = Path(workdir)
+        config = load_config()
+        config["vector_db"].update(provider="local", local={"path": str(workdir / "index"), "dimension": 768})
+        config["retriever"]["bm25"].update(enabled=True, path=str(workdir / "bm25.sqlite"))
+        embeddings = CountingEmbeddings(dimension=768, latency_seconds=args.embed_latency)
+        manager = VectorStoreManager(config=config, embeddings_factory=lambda: embeddings)
+        vectorstore.manager._manager = manager
+        ingestion.manifest._manifest = DocumentManifest(workdir / "documents.sqlite")
+        
+        pages = [page_text(i) for i in range(args.pages)]
+        original, edited = workdir / "original.pdf", workdir / "edited.pdf"
+        write_text_pdf(str(original), pages)
+        changed = random.Random(1).sample(range(args.pages), max(1, int(args.pages * args.modified)))
+        write_text_pdf(str(edited), [page_text(10_000 + i) if i in changed else text for i, text in enumerate(pages)])
+        
+        full = run("full ingest", original, embeddings, manager)
+        update = run("1 edit" if len(changed) == 1 else f"{len(changed)} edits", edited, embeddings, manager)
+        run("unchanged", edited, embeddings, manager)
+        print(f"update cost: {update['embedded'] / full['embedded']:.1%} of the embeddings, "
+              f"{update['seconds'] / full['seconds']:.1%} of the time of a full ingest")
+
+
+if __name__ == "__main__":
+    main()
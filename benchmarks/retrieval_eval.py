@@ -0,0 +1,112 @@
+"""Offline retrieval eval: vector vs. hybrid (BM25 + RRF) vs. hybrid + rerank.
+
+Chunks from data/samples are indexed into a temporary local vector index and
+BM25 index using hashing embeddings. Two kinds of questions are generated per
+sampled chunk, and a hit means the source chunk is in the top k:
+- keyword: the chunk's rarest terms ("ticker-like" lookups)
+- sentence: a sentence copied from the chunk (semantic lookups)
+
+    python -m benchmarks.retrieval_eval --questions 100
+"""
+import argparse
+import math
+import random
+import re
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.stubs import FakeEmbeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from core import load_config
+from ingestion.pipeline import chunk_id, parse_pages
+from ingestion.uploads import UploadLimits, discard_uploads, spool_file
+from vectorstore import VectorStoreManager
+from vectorstore.bm25 import tokenize
+
+SAMPLES = Path(__file__).parent.parent / "data" / "samples"
+
+
+def build_manager(path: str, mode: str, reranker: str) -> VectorStoreManager:
+    config = load_config()
+    config["vector_db"].update(provider="local", local={"path": path, "dimension": 768, "search": "exact"})
+    config["retriever"].update(mode=mode, score_threshold=0.0)
+    config["retriever"]["hybrid"]["reranker"] = reranker
+    config["retriever"]["bm25"].update(enabled=True, path=str(Path(path) / "bm25.sqlite"))
+    return VectorStoreManager(config=config, embeddings_factory=FakeEmbeddings)
+
+
+def load_chunks() -> list:
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    documents = []
+    for path in sorted(SAMPLES.iterdir()):
+        with open(path, "rb") as file:
+            upload = spool_file(file, path.name, UploadLimits())
+        try:
+            documents.extend(parse_pages(upload))
+        finally:
+            discard_uploads([upload])
+    unique = {chunk_id(chunk.page_content, chunk.metadata["source"]): chunk for chunk in splitter.split_documents(documents)}
+    return list(unique.items())
+
+
+def generate_questions(chunks: list, count: int, rng: random.Random) -> list:
+    document_frequency = {}
+    for _, chunk in chunks:
+        for term in set(tokenize(chunk.page_content)):
+            document_frequency[term] = document_frequency.get(term, 0) + 1
+    
+    questions = []
+    for cid, chunk in rng.sample(chunks, min(count, len(chunks))):
+        terms = sorted(set(tokenize(chunk.page_content)),
+                       key=lambda t: -math.log(len(chunks) / document_frequency[t]))
+        questions.append(("keyword", "What about " + " ".join(terms[:4]) + "?", cid))
+        
+        sentences = [s for s in re.split(r"(?<=[.!?])\s+", chunk.page_content) if len(s.split()) >= 8]
+        if sentences:
+            questions.append(("sentence", rng.choice(sentences), cid))
+    return questions
+
+
+def evaluate(retriever, questions: list) -> dict:
+    hits, reciprocal_ranks, latencies = {}, [], []
+    for kind, question, target in questions:
+        start = time.perf_counter()
+        results = [chunk_id(doc.page_content, doc.metadata["source"]) for doc in retriever.invoke(question)]
+        latencies.append((time.perf_counter() - start) * 1000)
+        rank = results.index(target) + 1 if target in results else None
+        hits.setdefault(kind, []).append(rank is not None)
+        reciprocal_ranks.append(1 / rank if rank else 0.0)
+    return {
+        **{f"hit@k {kind}": statistics.mean(values) for kind, values in hits.items()},
+        "MRR": statistics.mean(reciprocal_ranks),
+        "p50 ms": statistics.median(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--questions", type=int, default=100, help="chunks to sample questions from")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    
+    chunks = load_chunks()
+    questions = generate_questions(chunks, args.questions, random.Random(args.seed))
+    print(f"{len(chunks)} chunks, {len(questions)} questions, k={load_config()['retriever']['top_k']}\n")
+    
+    with tempfile.TemporaryDirectory() as path:
+        variants = [("vector", "vector", "none"), ("hybrid", "hybrid", "none"), ("hybrid+rerank", "hybrid", "lexical")]
+        for label, mode, reranker in variants:
+            manager = build_manager(path, mode, reranker)
+            if label == "vector":
+                ids, docs = [cid for cid, _ in chunks], [doc for _, doc in chunks]
+                manager.get_vector_store().add_documents(docs, ids=ids)
+                manager.get_keyword_index().add(ids, [d.page_content for d in docs], [d.metadata for d in docs])
+            metrics = evaluate(manager.get_retriever(), questions)
+            print(f"{label:<14} " + "  ".join(f"{name}={value:.3f}" for name, value in metrics.items()))
+
+
+if __name__ == "__main__":
+    main()
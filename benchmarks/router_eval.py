@@ -0,0 +1,142 @@
+"""Query router eval: routing accuracy on a labelled question set, and latency saved.
+
+``benchmarks/data/router_eval.jsonl`` labels each question with the intent
+the router should pick (``news``, ``financials``, ``overview``) and its
+tickers, or ``null`` when it must fall back to the agent (advice, reasoning,
+comparisons, no ticker). A route counts as correct only when both intent and
+tickers match; a misroute is a question answered from the wrong tools.
+
+Every question is then run through the agent graph against the fakes
+(``llm.provider`` and ``tools.backend`` set to ``fake``), with the router on
+and off, and the LLM calls and latency per question are compared. Caches are
+disabled, so both runs do the same tool work.
+
+    python -m benchmarks.router_eval --llm-latency 0.3
+
+Exits non-zero when routing precision falls below ``--min-precision``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.load_test import load_test_config
+
+EVAL_SET = Path(__file__).parent / "data" / "router_eval.jsonl"
+
+
+def load_eval_set() -> list:
+    with open(EVAL_SET) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def evaluate_routing(router, examples: list) -> dict:
+    routed = correct = misrouted = 0
+    for example in examples:
+        decision = router.classify(example["question"])
+        expected = example["intent"]
+        if decision.intent is None:
+            if expected is not None:
+                print(f"  missed    {example['question']!r} ({decision.reason}; expected {expected})")
+            continue
+        routed += 1
+        if decision.intent == expected and sorted(decision.tickers) == sorted(example["tickers"]):
+            correct += 1
+        else:
+            misrouted += 1
+            print(f"  MISROUTED {example['question']!r} -> {decision.intent} {decision.tickers}; "
+                  f"expected {expected} {example['tickers']}")
+    routable = sum(example["intent"] is not None for example in examples)
+    return {
+        "questions": len(examples),
+        "routable": routable,
+        "routed": routed,
+        "hit_rate": routed / len(examples),
+        "precision": correct / routed if routed else 1.0,
+        "recall": correct / routable if routable else 1.0,
+        "misrouted": misrouted,
+    }
+
+
+async def run_questions(agent, examples: list, concurrency: int) -> list:
+    """Latency (ms) and LLM calls of each question, in eval-set order."""
+    from agent.router import is_routed
+    
+    graph = agent.get_graph()
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def one(example):
+        async with semaphore:
+            start = time.perf_counter()
+            result = await graph.ainvoke({"messages": [example["question"]]})
+            elapsed = (time.perf_counter() - start) * 1000
+        llm_calls = sum(type(message).__name__ == "AIMessage" and not is_routed(message) for message in result["messages"])
+        return {"ms": elapsed, "llm_calls": llm_calls, "routed": any(is_routed(m) for m in result["messages"])}
+    
+    return await asyncio.gather(*(one(example) for example in examples))
+
+
+def summarize(label: str, runs: list) -> dict:
+    latencies = [run["ms"] for run in runs]
+    summary = {
+        "mean_ms": statistics.mean(latencies),
+        "p50_ms": statistics.median(latencies),
+        "llm_calls": statistics.mean(run["llm_calls"] for run in runs),
+    }
+    print(f"  {label:<26} mean {summary['mean_ms']:7.1f}ms  p50 {summary['p50_ms']:7.1f}ms  "
+          f"LLM calls/question {summary['llm_calls']:.2f}")
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="fake LLM time to first token (s)")
+    parser.add_argument("--tool-latency", type=float, default=0.2, help="fake search/financials latency (s)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--min-precision", type=float, default=0.95)
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ["STOCKSAGE_CONFIG"] = str(load_test_config(
+            Path(workdir), llm_latency=args.llm_latency, tool_latency=args.tool_latency,
+            overrides={"response_cache": {"enabled": False}, "tools": {"cache": {"enabled": False}},
+                       "logging": {"format": "text"}},
+        ))
+        from agent.workflow import TradingAgent
+        
+        examples = load_eval_set()
+        agent = TradingAgent()
+        agent.build()
+        
+        print("Routing:")
+        routing = evaluate_routing(agent.router, examples)
+        print(f"  hit rate {routing['hit_rate']:.0%} ({routing['routed']}/{routing['questions']})  "
+              f"precision {routing['precision']:.0%}  recall {routing['recall']:.0%} of {routing['routable']} routable  "
+              f"misrouted {routing['misrouted']}")
+        
+        print("Latency:")
+        with_router = asyncio.run(run_questions(agent, examples, args.concurrency))
+        agent.router.enabled = False
+        without_router = asyncio.run(run_questions(agent, examples, args.concurrency))
+        
+        routed = [i for i, run in enumerate(with_router) if run["routed"]]
+        on = summarize("all, router on", with_router)
+        off = summarize("all, router off", without_router)
+        routed_on = summarize("routed questions, on", [with_router[i] for i in routed])
+        routed_off = summarize("routed questions, off", [without_router[i] for i in routed])
+        print(f"  saved {off['mean_ms'] - on['mean_ms']:.1f}ms per question overall, "
+              f"{routed_off['mean_ms'] - routed_on['mean_ms']:.1f}ms "
+              f"({1 - routed_on['mean_ms'] / routed_off['mean_ms']:.0%}) per routed question")
+    
+    if routing["precision"] < args.min_precision:
+        print(f"FAIL routing precision {routing['precision']:.0%} below {args.min_precision:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Stub LLM and tool backends shared by the benchmarks, built on the fakes in core/fakes.py."""
+import asyncio
+import os
+import time
+from typing import List, Optional
+from uuid import uuid4
+
+# Clients are built lazily, but ModelLoader, DataIngestion and VectorStoreManager still check the keys are set
+for _var in ["GOOGLE_API_KEY", "GROQ_API_KEY", "PINECONE_API_KEY", "POLYGON_API_KEY", "TAVILY_API_KEY"]:
+    os.environ.setdefault(_var, "benchmark-dummy-key")
+
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from langchain_core.tools import StructuredTool
+
+from core.fakes import FakeChatModel, FakeEmbeddings
+from models.schemas import RagToolInput
+
+
+class StubChatModel(FakeChatModel):
+    """Fake chat model that answers immediately and ignores bound tools."""
+    
+    latency_seconds: float = 0.0
+    seconds_per_token: float = 0.0
+    
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+def stub_llm() -> StubChatModel:
+    return StubChatModel()
+
+
+class ToolCallingStubLLM(FakeChatModel):
+    """Fake chat model with fixed latency that calls tools once, then answers.
+    
+    By default it makes a single ``tool_name`` call with the question; set
+    ``tool_calls`` to a list of ``{"name", "args"}`` dicts to emit several
+    calls in one turn. ``latency_per_token`` adds prompt-size dependent
+    latency (prefill), estimated at ~4 characters per token; the sizes seen
+    are appended to ``prompt_tokens``.
+    """
+    
+    latency_seconds: float = 0.05
+    seconds_per_token: float = 0.0
+    latency_per_token: float = 0.0
+    tool_name: str = "retriever_tool"
+    tool_calls: Optional[List[dict]] = None
+    prompt_tokens: List[int] = []
+    
+    @property
+    def _llm_type(self) -> str:
+        return "tool-calling-stub"
+    
+    def bind_tools(self, tools, **kwargs):
+        return self
+    
+    def _respond(self, messages: List[BaseMessage]) -> AIMessage:
+        tokens = sum(len(str(message.content)) for message in messages) // 4
+        self.prompt_tokens.append(tokens)
+        usage = {"input_tokens": tokens, "output_tokens": 0, "total_tokens": tokens}
+        if isinstance(messages[-1], ToolMessage):
+            return AIMessage(content=f"Answer based on: {messages[-1].content[:40]}", usage_metadata=usage)
+        calls = self.tool_calls or [{"name": self.tool_name, "args": {"question": str(messages[-1].content)}}]
+        return AIMessage(content="", usage_metadata=usage, tool_calls=[
+            {**call, "id": f"call_{uuid4().hex[:12]}"} for call in calls
+        ])
+    
+    def _duration(self, message: AIMessage) -> float:
+        return self.latency_seconds + message.usage_metadata["input_tokens"] * self.latency_per_token
+
+
+def stub_retriever_tool(latency: float = 0.02) -> StructuredTool:
+    """A retriever_tool look-alike whose backend takes ``latency`` seconds."""
+    
+    def retrieve(question: str) -> str:
+        time.sleep(latency)
+        return f"Knowledge base notes about {question}"
+    
+    async def aretrieve(question: str) -> str:
+        await asyncio.sleep(latency)
+        return f"Knowledge base notes about {question}"
+    
+    return StructuredTool.from_function(
+        func=retrieve,
+        coroutine=aretrieve,
+        name="retriever_tool",
+        description="Search the stock market knowledge base.",
+        args_schema=RagToolInput,
+    )
+
+
+class CountingEmbeddings(FakeEmbeddings):
+    """FakeEmbeddings that counts the texts it embeds."""
+    
+    embedded = 0
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.embedded += len(texts)
+        return super().embed_documents(texts)
+
+
+def write_text_pdf(path: str, pages: List[str], line_chars: int = 90, image_bytes: int = 0) -> None:
+    """Write a minimal PDF (Helvetica, one string per page) that pypdf can extract.
+    
+    ``image_bytes`` adds an undrawn grayscale image of about that size to each
+    page, so files weigh what scanned exhibits and charts make real filings weigh.
+    """
+    def escape(text: str) -> str:
+        return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        lines = [text[i:i + line_chars] for i in range(0, len(text), line_chars)]
+        stream = "BT /F1 9 Tf 11 TL 40 780 Td " + " ".join(f"({escape(line)}) '" for line in lines) + " ET"
+        stream = stream.encode("latin-1", "replace")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        contents, xobjects = len(objects), b""
+        if image_bytes:
+            side = max(1, int(image_bytes ** 0.5))
+            pixels = bytes((i * 7 + len(kids)) % 256 for i in range(side)) * side
+            objects.append(b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray "
+                           b"/BitsPerComponent 8 /Length %d >>\nstream\n%s\nendstream" % (side, side, len(pixels), pixels))
+            xobjects = b" /XObject << /Im0 %d 0 R >>" % len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+                       b"/Resources << /Font << /F1 3 0 R >>%s >> >>" % (contents, xobjects))
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{kid} 0 R" for kid in kids).encode(), len(kids))
+    
+    with open(path, "wb") as file:
+        file.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(file.tell())
+            file.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = file.tell()
+        file.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        file.write(b"".join(b"%010d 00000 n \n" % offset for offset in offsets))
+        file.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
@@ -0,0 +1,54 @@
+"""Per-query overhead of tracing: no callbacks vs. metrics only vs. every span logged.
+
+Runs the full graph (compact -> chatbot -> tools -> chatbot) with zero-latency
+stub LLM and tool, so the measured time is framework overhead plus tracing.
+
+    python -m benchmarks.tracing_overhead --queries 300
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from unittest.mock import patch
+
+from benchmarks.stubs import ToolCallingStubLLM, stub_retriever_tool
+from agent import TradingAgent
+from core import ModelLoader
+from core import tracing
+
+
+def build_graph():
+    with patch.object(ModelLoader, "load_llm", return_value=ToolCallingStubLLM(latency_seconds=0.0)), \
+            patch("agent.workflow.all_tools", [stub_retriever_tool(0.0)]):
+        agent = TradingAgent()
+        agent.build()
+    return agent.get_graph()
+
+
+async def run(graph, queries: int, sample_rate):
+    tracer = tracing.Tracer({"enabled": sample_rate is not None, "sample_rate": sample_rate or 0.0})
+    tracing._tracer = tracer
+    timings = []
+    for i in range(queries):
+        tracer.start_request()
+        start = time.perf_counter()
+        await graph.ainvoke({"messages": [f"What is the P/E of ticker {i}?"]}, {"callbacks": tracing.trace_callbacks()})
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=300)
+    args = parser.parse_args()
+    
+    graph = build_graph()
+    asyncio.run(run(graph, 20, None))  # warm-up
+    baseline = asyncio.run(run(graph, args.queries, None))
+    for label, sample_rate in [("disabled", None), ("metrics only", 0.0), ("sampled 10%", 0.1), ("sampled 100%", 1.0)]:
+        median = asyncio.run(run(graph, args.queries, sample_rate))
+        print(f"{label:<13} median {median:6.2f}ms per query  overhead {median - baseline:+6.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
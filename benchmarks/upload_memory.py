@@ -0,0 +1,202 @@
+"""Memory profile of uploading and parsing a large filing: buffered vs. streaming uploads.
+
+A synthetic ``--pages`` page PDF (``--image-kb`` of undrawn image per page,
+so it weighs what a real filing does) is uploaded as a multipart body in
+64 KB blocks and parsed to page documents, two ways:
+
+- buffered (the previous path): the body is spooled by the web framework
+  (``UploadFile``), copied block by block to a NamedTemporaryFile, and the
+  file is parsed whole with ``PyPDFLoader``, whose reader caches every
+  object it resolves and which returns every page at once
+- streaming (``/upload/stream``): ``receive_multipart`` parses the body as
+  it arrives straight into the upload spool, and the PDF is parsed
+  ``--pages-per-task`` pages at a time through a memory map of that spool
+
+Each path runs in a fresh process, with parsing in that process, so one
+peak covers what the API process and a parse worker together hold (the
+buffered path additionally pickles all pages from the worker to the API
+process, which is not counted). Peaks are measured above the process's
+size after imports: anonymous memory (heap) and total resident memory,
+which also counts the memory-mapped file pages the kernel can drop at any
+time. pypdf keeps a document's page tree in memory, so neither path is
+flat in the page count; the streaming path adds only one range on top.
+
+    python -m benchmarks.upload_memory --pages 500 --image-kb 40
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import warnings
+from pathlib import Path
+
+from benchmarks.reingest import page_text
+from benchmarks.stubs import write_text_pdf
+
+BODY_BLOCK = 64 * 1024  # what the ASGI server hands the app per message
+
+
+def memory_mb() -> dict:
+    with open("/proc/self/status") as file:
+        fields = dict(line.split(":", 1) for line in file)
+    return {"anon": int(fields["RssAnon"].split()[0]) / 1024, "rss": int(fields["VmRSS"].split()[0]) / 1024}
+
+
+class PeakSampler:
+    """Samples the process's memory every few milliseconds and keeps the peaks."""
+    
+    def __init__(self, interval: float = 0.002):
+        self.interval = interval
+        self.peak = memory_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+    
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            current = memory_mb()
+            self.peak = {key: max(self.peak[key], current[key]) for key in current}
+    
+    def __enter__(self):
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def multipart_blocks(path: str, boundary: str):
+    """The multipart body of one file upload, in BODY_BLOCK blocks, as it comes off the socket."""
+    yield (f'--{boundary}\r\nContent-Disposition: form-data; name="files"; filename="filing.pdf"\r\n'
+           f'Content-Type: application/pdf\r\n\r\n').encode()
+    with open(path, "rb") as file:
+        while block := file.read(BODY_BLOCK):
+            yield block
+    yield f"\r\n--{boundary}--\r\n".encode()
+
+
+def buffered(path: str, args) -> dict:
+    """The previous path: framework spool, copy to a temp file, PyPDFLoader over the whole file."""
+    from langchain_community.document_loaders import PyPDFLoader
+    from starlette.datastructures import UploadFile
+    
+    written = 0
+    # Starlette's multipart parser writes each file part to a SpooledTemporaryFile (1 MB in memory)
+    upload = UploadFile(tempfile.SpooledTemporaryFile(max_size=1024 * 1024), filename="filing.pdf")
+    blocks = multipart_blocks(path, uuid.uuid4().hex)
+    next(blocks)
+    for block in blocks:
+        upload.file.write(block)
+        written += len(block)
+    upload.file.seek(0)
+    
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
+        while block := upload.file.read(1024 * 1024):
+            temp_file.write(block)
+            written += len(block)
+    try:
+        documents = PyPDFLoader(temp_file.name).load()
+        digest = hashlib.sha256()
+        for document in documents:
+            digest.update(document.page_content.encode("utf-8"))
+        return {"pages": len(documents), "digest": digest.hexdigest(), "disk_mb": written / 1024 / 1024}
+    finally:
+        os.unlink(temp_file.name)
+
+
+def streaming(path: str, args) -> dict:
+    """The streaming path: receive_multipart into the spool, then page ranges through a memory map."""
+    from ingestion.pipeline import parse_pages
+    from ingestion.uploads import UploadLimits, discard_uploads, receive_multipart
+    
+    boundary = uuid.uuid4().hex
+    
+    async def body():
+        for block in multipart_blocks(path, boundary):
+            yield block
+    
+    limits = UploadLimits(spool_memory_bytes=args.spool_memory_mb * 1024 * 1024)
+    uploads = asyncio.run(receive_multipart(f"multipart/form-data; boundary={boundary}", body(), limits))
+    upload = uploads[0]
+    try:
+        digest, pages = hashlib.sha256(), 0
+        # The pipeline yields each range's pages to the splitter before parsing more
+        for start in range(0, upload.pages, args.pages_per_task):
+            for document in parse_pages(upload, start, min(start + args.pages_per_task, upload.pages)):
+                digest.update(document.page_content.encode("utf-8"))
+                pages += 1
+        return {"pages": pages, "digest": digest.hexdigest(), "disk_mb": upload.size / 1024 / 1024 if upload.path else 0.0}
+    finally:
+        discard_uploads(uploads)
+
+
+SCENARIOS = {"buffered": buffered, "streaming": streaming}
+
+
+def run_scenario(name: str, path: str, args) -> None:
+    """Child process: run one scenario and print its measurements as JSON."""
+    warnings.filterwarnings("ignore")
+    # Import everything either path needs first, so the baseline is the same
+    import langchain_community.document_loaders  # noqa: F401
+    import pypdf  # noqa: F401
+    import python_multipart  # noqa: F401
+    import starlette.datastructures  # noqa: F401
+    import ingestion.pipeline  # noqa: F401
+    
+    baseline = memory_mb()
+    start = time.perf_counter()
+    with PeakSampler() as sampler:
+        result = SCENARIOS[name](path, args)
+    result["seconds"] = time.perf_counter() - start
+    result["peak_anon_mb"] = sampler.peak["anon"] - baseline["anon"]
+    result["peak_rss_mb"] = sampler.peak["rss"] - baseline["rss"]
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--image-kb", type=int, default=40, help="undrawn image weight per page")
+    parser.add_argument("--pages-per-task", type=int, default=50)
+    parser.add_argument("--spool-memory-mb", type=int, default=1)
+    parser.add_argument("--scenario", choices=list(SCENARIOS), help=argparse.SUPPRESS)
+    parser.add_argument("--pdf", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.scenario:
+        run_scenario(args.scenario, args.pdf, args)
+        return
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        path = str(Path(workdir) / "filing.pdf")
+        write_text_pdf(path, [page_text(i) for i in range(args.pages)], image_bytes=args.image_kb * 1024)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"{args.pages}-page filing, {size_mb:.1f} MB")
+        
+        results = {}
+        for name in SCENARIOS:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.upload_memory", "--scenario", name, "--pdf", path,
+                 "--pages-per-task", str(args.pages_per_task), "--spool-memory-mb", str(args.spool_memory_mb)],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            results[name] = result = json.loads(output.strip().splitlines()[-1])
+            print(f"  {name:<10} peak heap +{result['peak_anon_mb']:6.1f} MB  peak RSS +{result['peak_rss_mb']:6.1f} MB  "
+                  f"written to disk {result['disk_mb']:5.1f} MB  {result['pages']} pages  {result['seconds']:5.1f}s")
+    
+    buffered_result, streaming_result = results["buffered"], results["streaming"]
+    print(f"streaming peak heap is {streaming_result['peak_anon_mb'] / buffered_result['peak_anon_mb']:.0%} of buffered")
+    if buffered_result["digest"] != streaming_result["digest"] or buffered_result["pages"] != streaming_result["pages"]:
+        print("FAIL the two paths extracted different text")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
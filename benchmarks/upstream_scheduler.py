@@ -0,0 +1,226 @@
+"""Simulation of the upstream scheduler against fake rate-limited providers.
+
+Each fake endpoint enforces its own token bucket and answers over-limit
+calls with a 429 carrying ``retry_after``, the way Groq, Google, Tavily and
+Polygon do; one can also be taken down to return 503s. No network is used.
+
+Scenarios:
+
+- burst: a burst of calls straight at the endpoint (many 429s) vs. through
+  the scheduler configured with the endpoint's limit (no failed calls)
+- adaptive: the scheduler is configured at twice the real limit; its bucket
+  must back off (AIMD) and retries must absorb the 429s
+- lanes: interactive, batch and ingestion calls compete for two slots;
+  interactive calls must wait far less than the others
+- breaker: the endpoint is down for a while; the circuit must open, fail
+  calls fast instead of hammering it, and close again once it is back
+
+    python -m benchmarks.upstream_scheduler
+
+Exits non-zero when a scenario misses its expectation.
+"""
+import argparse
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core import UpstreamScheduler, UpstreamUnavailable
+
+
+class RateLimited(Exception):
+    status_code = 429
+    
+    def __init__(self, retry_after: float):
+        super().__init__("429 Too Many Requests")
+        self.retry_after = retry_after
+
+
+class ServiceDown(Exception):
+    status_code = 503
+
+
+class FakeEndpoint:
+    """A provider that allows ``rate`` calls per second (bursts of ``burst``) and takes ``latency`` per call."""
+    
+    def __init__(self, rate: float, burst: float, latency: float = 0.02):
+        self.rate = rate
+        self.burst = burst
+        self.latency = latency
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.down = False
+        self.calls = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+    
+    def __call__(self) -> str:
+        with self._lock:
+            self.calls += 1
+            if self.down:
+                raise ServiceDown("503 Service Unavailable")
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                self.rejected += 1
+                raise RateLimited(retry_after=(1 - self.tokens) / self.rate)
+            self.tokens -= 1
+        time.sleep(self.latency)
+        return "ok"
+
+
+def scheduler(**policy) -> UpstreamScheduler:
+    defaults = {"max_retries": 6, "backoff_base_seconds": 0.05, "backoff_max_seconds": 1.0,
+                "breaker_failures": 5, "breaker_reset_seconds": 1.0}
+    return UpstreamScheduler({"upstream": {"queue_timeout_seconds": 60, "default": {**defaults, **policy}}})
+
+
+def fan_out(calls: int, threads: int, fn) -> dict:
+    """Run ``fn`` ``calls`` times from ``threads`` threads; count successes and failures."""
+    outcomes = {"ok": 0, "failed": 0}
+    lock = threading.Lock()
+    
+    def one(_):
+        try:
+            fn()
+            result = "ok"
+        except Exception:
+            result = "failed"
+        with lock:
+            outcomes[result] += 1
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(one, range(calls)))
+    outcomes["seconds"] = round(time.perf_counter() - start, 2)
+    return outcomes
+
+
+def burst(args) -> list:
+    direct_endpoint = FakeEndpoint(args.rate, args.burst)
+    direct = fan_out(args.calls, args.threads, direct_endpoint)
+    
+    endpoint = FakeEndpoint(args.rate, args.burst)
+    sched = scheduler(requests_per_second=args.rate, burst=args.burst)
+    paced = fan_out(args.calls, args.threads, lambda: sched.call("provider", endpoint))
+    print(f"burst      direct:    {direct['ok']:4d} ok {direct['failed']:4d} failed  {direct['seconds']:6.2f}s")
+    print(f"burst      scheduled: {paced['ok']:4d} ok {paced['failed']:4d} failed  {paced['seconds']:6.2f}s  "
+          f"429s seen {endpoint.rejected}")
+    problems = []
+    if paced["failed"]:
+        problems.append(f"burst: {paced['failed']} calls failed through the scheduler")
+    if direct["failed"] == 0:
+        problems.append("burst: the direct burst was never rate limited; raise --calls")
+    return problems
+
+
+def adaptive(args) -> list:
+    endpoint = FakeEndpoint(args.rate, args.burst)
+    sched = scheduler(requests_per_second=args.rate * 2, burst=args.burst)
+    outcome = fan_out(args.calls, args.threads, lambda: sched.call("provider", endpoint))
+    rate = sched.gate("provider").bucket.rate
+    print(f"adaptive   scheduled: {outcome['ok']:4d} ok {outcome['failed']:4d} failed  {outcome['seconds']:6.2f}s  "
+          f"429s seen {endpoint.rejected}  rate {args.rate * 2:.0f} -> {rate:.1f}/s")
+    problems = []
+    if outcome["failed"]:
+        problems.append(f"adaptive: {outcome['failed']} calls failed")
+    if rate >= args.rate * 2:
+        problems.append("adaptive: the bucket never slowed down after 429s")
+    return problems
+
+
+def lanes(args) -> list:
+    endpoint = FakeEndpoint(rate=1000, burst=1000, latency=0.05)
+    sched = scheduler(max_concurrency=2)
+    gate = sched.gate("provider")
+    background = ["ingestion"] * 30 + ["batch"] * 30
+    
+    with ThreadPoolExecutor(max_workers=len(background) + 10) as pool:
+        # Background work queues first; interactive calls arrive into the backlog
+        futures = [pool.submit(sched.call, "provider", endpoint, lane) for lane in background]
+        time.sleep(0.2)
+        futures += [pool.submit(sched.call, "provider", endpoint, "interactive") for _ in range(10)]
+        for future in futures:
+            future.result()
+    
+    waits = gate.get_stats()["queue_wait"]
+    print("lanes      " + "  ".join(f"{lane} p50 {waits[lane]['p50_ms']:.0f}ms p95 {waits[lane]['p95_ms']:.0f}ms"
+                                    for lane in ("interactive", "batch", "ingestion")))
+    problems = []
+    if waits["interactive"]["p95_ms"] >= waits["batch"]["p50_ms"]:
+        problems.append("lanes: interactive calls waited as long as batch calls")
+    if waits["batch"]["p50_ms"] >= waits["ingestion"]["p50_ms"]:
+        problems.append("lanes: batch calls did not go ahead of ingestion")
+    return problems
+
+
+def breaker(args) -> list:
+    endpoint = FakeEndpoint(rate=1000, burst=1000, latency=0.01)
+    sched = scheduler(max_retries=0, breaker_failures=5, breaker_reset_seconds=0.5)
+    outcomes = {"ok": 0, "failed": 0, "fast_failed": 0}
+    lock = threading.Lock()
+    stop = threading.Event()
+    
+    def caller():
+        while not stop.is_set():
+            try:
+                sched.call("provider", endpoint)
+                result = "ok"
+            except UpstreamUnavailable:
+                result = "fast_failed"
+            except Exception:
+                result = "failed"
+            with lock:
+                outcomes[result] += 1
+            time.sleep(0.01)
+    
+    threads = [threading.Thread(target=caller) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.5)
+    endpoint.down = True
+    calls_before = endpoint.calls
+    time.sleep(args.outage)
+    hits_during_outage = endpoint.calls - calls_before
+    endpoint.down = False
+    time.sleep(0.5)
+    ok_before_recovery = outcomes["ok"]
+    time.sleep(1.0)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    
+    recovered = outcomes["ok"] - ok_before_recovery
+    # Without the breaker ~4 callers x 100 calls/s would reach the endpoint during the outage
+    allowed = 5 + int(args.outage / 0.5) + 4
+    print(f"breaker    outage {args.outage:.1f}s: endpoint hit {hits_during_outage} times, "
+          f"{outcomes['fast_failed']} calls failed fast; {recovered} ok after recovery, "
+          f"breaker {sched.gate('provider').breaker.state}")
+    problems = []
+    if hits_during_outage > allowed:
+        problems.append(f"breaker: endpoint hit {hits_during_outage} times during the outage (limit {allowed})")
+    if not recovered or sched.gate("provider").breaker.state != "closed":
+        problems.append("breaker: calls did not recover after the outage")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=80)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=20.0, help="the fake endpoint's requests per second")
+    parser.add_argument("--burst", type=float, default=5.0)
+    parser.add_argument("--outage", type=float, default=2.0, help="seconds the endpoint is down in the breaker scenario")
+    args = parser.parse_args()
+    
+    problems = burst(args) + adaptive(args) + lanes(args) + breaker(args)
+    for problem in problems:
+        print(f"FAIL {problem}")
+    if problems:
+        sys.exit(1)
+    print("All scenarios met their expectations")
+
+
+if __name__ == "__main__":
+    main()
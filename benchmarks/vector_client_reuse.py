@@ -0,0 +1,107 @@
+"""Verify VectorStoreManager reuses its clients, using an in-process fake Pinecone.
+
+The fake counts how many clients and index handles were constructed, which
+should match the manager's own ``*_created`` counters no matter how many
+retrievals and uploads run.
+
+    python -m benchmarks.vector_client_reuse --calls 500
+"""
+import argparse
+import os
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from vectorstore import VectorStoreManager
+
+constructed = Counter()
+
+
+class _DoneResult:
+    def get(self):
+        return None
+
+
+class FakeIndex:
+    """Minimal in-memory stand-in for a Pinecone index handle."""
+    
+    def __init__(self, vectors: dict):
+        constructed["index"] += 1
+        self.config = SimpleNamespace(host="fake-index.local", api_key="benchmark-dummy-key")
+        self.vectors = vectors
+    
+    def upsert(self, vectors, namespace=None, async_req=False, **kwargs):
+        for vector in vectors:
+            vector_id, values, metadata = vector if isinstance(vector, tuple) else (
+                vector["id"], vector["values"], vector.get("metadata", {}))
+            self.vectors[vector_id] = (values, metadata)
+        return _DoneResult() if async_req else None
+    
+    def fetch(self, ids, namespace=None, **kwargs):
+        return SimpleNamespace(vectors={vector_id: self.vectors[vector_id] for vector_id in ids if vector_id in self.vectors})
+    
+    def query(self, vector, top_k=4, include_metadata=True, namespace=None, filter=None, **kwargs):
+        def score(values):
+            return sum(a * b for a, b in zip(vector, values))
+        ranked = sorted(self.vectors.items(), key=lambda item: score(item[1][0]), reverse=True)[:top_k]
+        return {"matches": [
+            {"id": vector_id, "score": score(values), "metadata": dict(metadata)}
+            for vector_id, (values, metadata) in ranked
+        ]}
+
+
+class FakePinecone:
+    """Minimal in-memory stand-in for the Pinecone control-plane client."""
+    
+    def __init__(self, api_key=None, **kwargs):
+        constructed["client"] += 1
+        self._indexes = {}
+    
+    def list_indexes(self):
+        return [SimpleNamespace(name=name) for name in self._indexes]
+    
+    def create_index(self, name, **kwargs):
+        self._indexes[name] = {}
+    
+    def Index(self, name, **kwargs):
+        return FakeIndex(self._indexes.setdefault(name, {}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+    
+    os.environ.setdefault("PINECONE_API_KEY", "benchmark-dummy-key")
+    manager = VectorStoreManager(
+        pinecone_factory=FakePinecone,
+        embeddings_factory=lambda: DeterministicFakeEmbedding(size=768),
+    )
+    
+    # Two "uploads" followed by many retriever_tool-style lookups
+    for batch in range(2):
+        manager.ensure_index(dimension=768)
+        docs = [Document(page_content=f"chunk {batch}-{i} about P/E ratios") for i in range(20)]
+        manager.get_vector_store().add_documents(docs, ids=[f"{batch}-{i}" for i in range(20)])
+    
+    start = time.perf_counter()
+    for _ in range(args.calls):
+        manager.get_vector_store().similarity_search("What is a P/E ratio?", k=3)
+    elapsed = time.perf_counter() - start
+    
+    stats = manager.get_stats()
+    print(f"{args.calls} retrievals in {elapsed * 1000:.1f}ms")
+    print(f"manager stats: {stats}")
+    print(f"fake constructions: {dict(constructed)}")
+    
+    assert constructed["client"] == stats.get("client_created") == 1
+    assert constructed["index"] == 1 and stats.get("index_created") == 1
+    assert stats.get("vector_store_created") == 1 and stats.get("embeddings_created") == 1
+    print("OK: clients created once and reused")
+
+
+if __name__ == "__main__":
+    main()
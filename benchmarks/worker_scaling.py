@@ -0,0 +1,183 @@
+"""Throughput of the API as it scales across worker processes.
+
+The app runs under gunicorn (``gunicorn.conf.py``) with 1, 2, 4 ... uvicorn
+workers against the deterministic fakes, sharing state through a local
+stand-in for Redis (fakeredis' TCP server). Each worker's tool concurrency
+caps (``tools.execution.per_tool``) bound its throughput, the way upstream
+rate limits do in production, so throughput should grow close to linearly
+with workers until the machine's CPUs run out. A multi-turn session is also
+sent to the pool without keep-alive, so its turns land on different
+workers, and its history must come back whole.
+
+    python -m benchmarks.worker_scaling --workers 1 2 4
+
+Exits non-zero when scaling efficiency (throughput at N workers over N times
+the single-worker throughput) falls below ``--min-efficiency``, or when a
+session does not survive moving between workers.
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from benchmarks.load_test import TICKERS, closed_loop, load_test_config
+
+REPO_ROOT = Path(__file__).parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_redis_stand_in(port: int):
+    """A Redis-compatible server in a background thread."""
+    from fakeredis import TcpFakeServer
+    
+    server = TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def scaling_config(workdir: Path, redis_port: int, tool_latency: float, tool_concurrency: int) -> Path:
+    caps = {"max_concurrency": tool_concurrency}
+    return load_test_config(workdir, llm_latency=0.01, tool_latency=tool_latency, overrides={
+        "state": {"backend": "redis", "redis": {"url": f"redis://127.0.0.1:{redis_port}/0"}},
+        "sessions": {"checkpointer": "state"},
+        # Every request reaches the tools: throughput measures the workers, not the caches
+        "response_cache": {"enabled": False},
+        "tools": {"cache": {"enabled": False},
+                  "execution": {"per_tool": {"web_search": caps, "polygon_financials": caps}}},
+        "logging": {"format": "text"},
+    })
+
+
+def launch(workers: int, port: int, config_path: Path, launcher: str) -> subprocess.Popen:
+    env = {**os.environ, "STOCKSAGE_CONFIG": str(config_path), "WEB_CONCURRENCY": str(workers)}
+    if launcher == "gunicorn":
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-b", f"127.0.0.1:{port}", "main:app"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers)]
+    return subprocess.Popen(command, cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def wait_ready(client, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.25)
+    raise SystemExit("server did not become ready")
+
+
+async def check_session(client, turns: int = 4) -> bool:
+    """Send ``turns`` follow-ups on one session over fresh connections; its history must be intact."""
+    session_id = None
+    for turn in range(turns):
+        payload = {"question": f"What is the latest news on {TICKERS[turn]}?", "session_id": session_id}
+        response = (await client.post("/query", json=payload)).json()
+        session_id = response["session_id"]
+    session = (await client.get(f"/sessions/{session_id}")).json()
+    await client.delete(f"/sessions/{session_id}")
+    return len(session.get("turns", [])) == turns and session.get("messages", 0) >= 2 * turns
+
+
+async def measure(workers: int, args, config_path: Path) -> dict:
+    import httpx
+    
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    process = launch(workers, port, config_path, args.launcher)
+    # One keep-alive connection per caller, as a load balancer's upstream pool
+    # would hold. They are opened one at a time so the kernel spreads them over
+    # the workers instead of one worker accepting a whole burst.
+    connections = [httpx.AsyncClient(base_url=base_url, timeout=120, limits=httpx.Limits(max_connections=1))
+                   for _ in range(args.concurrency)]
+    try:
+        await wait_ready(connections[0])
+        for connection in connections:
+            await connection.get("/health")
+            await asyncio.sleep(0.05)
+        idle = asyncio.Queue()
+        for connection in connections:
+            idle.put_nowait(connection)
+        
+        async def query(i):
+            connection = await idle.get()
+            try:
+                start = time.perf_counter()
+                payload = {"question": f"What is the latest news on {TICKERS[i % len(TICKERS)]} (request {i})?"}
+                response = await connection.post("/query", json=payload)
+                return (time.perf_counter() - start) * 1000 if response.status_code == 200 else None
+            finally:
+                idle.put_nowait(connection)
+        
+        await closed_loop("warm_up", 4 * workers, args.concurrency, lambda i: query(-1 - i))
+        result = await closed_loop(f"workers_{workers}", args.requests, args.concurrency, query)
+        result["workers"] = workers
+        # No keep-alive: each turn of the session is a new connection and may land on any worker
+        async with httpx.AsyncClient(base_url=base_url, timeout=120,
+                                     limits=httpx.Limits(max_keepalive_connections=0)) as client:
+            result["session_ok"] = await check_session(client)
+    finally:
+        for connection in connections:
+            await connection.aclose()
+        process.terminate()
+        process.wait(timeout=30)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--requests", type=int, default=300, help="requests per worker count")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--tool-latency", type=float, default=0.5, help="fake search/financials latency (s)")
+    parser.add_argument("--tool-concurrency", type=int, default=2, help="per-worker cap on each tool")
+    parser.add_argument("--launcher", choices=["gunicorn", "uvicorn"], default="gunicorn")
+    parser.add_argument("--min-efficiency", type=float, default=0.8)
+    args = parser.parse_args()
+    
+    redis_port = free_port()
+    server = start_redis_stand_in(redis_port)
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        config_path = scaling_config(Path(workdir), redis_port, args.tool_latency, args.tool_concurrency)
+        for workers in args.workers:
+            results.append(asyncio.run(measure(workers, args, config_path)))
+    server.shutdown()
+    
+    base = next((r for r in results if r["workers"] == 1), results[0])
+    per_worker = base["throughput_rps"] / base["workers"]
+    problems = []
+    print(f"{'workers':>7} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>6} {'efficiency':>10} {'session':>8}")
+    for result in results:
+        efficiency = result["throughput_rps"] / (per_worker * result["workers"]) if per_worker else 0.0
+        print(f"{result['workers']:>7} {result['throughput_rps']:>8.1f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} "
+              f"{result['errors']:>6} {efficiency:>10.0%} {'ok' if result['session_ok'] else 'LOST':>8}")
+        if efficiency < args.min_efficiency:
+            problems.append(f"{result['workers']} workers: {efficiency:.0%} scaling efficiency")
+        if not result["session_ok"]:
+            problems.append(f"{result['workers']} workers: session history lost between workers")
+        if result["errors"]:
+            problems.append(f"{result['workers']} workers: {result['errors']} failed requests")
+    for problem in problems:
+        print(f"FAIL {problem}")
+    if problems:
+        sys.exit(1)
+    print(f"Scaling efficiency at or above {args.min_efficiency:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,32 @@
-from core.config_loader import load_config
+from core.config_loader import load_config, config_mtime
 from core.model_loaders import ModelLoader
-from core.exceptions import StockSageException
+from core.exceptions import StockSageException, IngestionCancelled, UpstreamUnavailable, UploadTooLarge
+from core.executor import run_in_threadpool
 from core.logger import logger
+from core.tracing import get_tracer, trace_callbacks
+from core.state import StateStore, MemoryStateStore, RedisStateStore, RateLimiter, open_state_store
+from core.upstream import UpstreamScheduler, get_upstream_scheduler, upstream_lane
+from core.tickers import extract_tickers
 
-__all__ = ["load_config", "ModelLoader", "StockSageException", "logger"]
+__all__ = [
+    "load_config",
+    "config_mtime",
+    "ModelLoader",
+    "StockSageException",
+    "IngestionCancelled",
+    "UpstreamUnavailable",
+    "UploadTooLarge",
+    "run_in_threadpool",
+    "logger",
+    "get_tracer",
+    "trace_callbacks",
+    "StateStore",
+    "MemoryStateStore",
+    "RedisStateStore",
+    "RateLimiter",
+    "open_state_store",
+    "UpstreamScheduler",
+    "get_upstream_scheduler",
+    "upstream_lane",
+    "extract_tickers",
+]
@@ -2,10 +2,14 @@ import os
 import yaml
 from pathlib import Path
 
+# Config lives in <repo>/config/config.yaml, relative to this file's location;
+# STOCKSAGE_CONFIG points at an alternative file (e.g. the load-test config)
+CONFIG_PATH = Path(os.getenv("STOCKSAGE_CONFIG") or Path(__file__).parent.parent / "config" / "config.yaml")
+
+
 def load_config() -> dict:
     """Load configuration from config.yaml using relative path resolution."""
-    # Find config relative to this file's location
-    config_path = Path(__file__).parent.parent / "config" / "config.yaml"
+    config_path = CONFIG_PATH
     
     if not config_path.exists():
         raise FileNotFoundError(f"Config file not found at: {config_path}")
@@ -14,3 +18,11 @@ def load_config() -> dict:
         config = yaml.safe_load(file)
     
     return config
+
+
+def config_mtime() -> float:
+    """Return the last modification time of config.yaml (0.0 if missing)."""
+    try:
+        return os.stat(CONFIG_PATH).st_mtime
+    except FileNotFoundError:
+        return 0.0
@@ -0,0 +1,97 @@
+import hashlib
+import sqlite3
+import threading
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+
+from langchain_core.embeddings import Embeddings
+
+from core.executor import run_in_threadpool
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper backed by a persistent SQLite cache.
+    
+    Vectors are keyed by sha256(model_name, kind, text), where kind separates
+    query and document embeddings (providers may embed them differently). Only
+    texts missing from the cache are sent to the underlying model.
+    """
+    
+    def __init__(self, underlying: Embeddings, model_name: str, path: Path):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self.stats = Counter()
+    
+    def _key(self, kind: str, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{kind}\0{text}".encode("utf-8")).hexdigest()
+    
+    def _load(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+        return found
+    
+    def _save(self, items: Dict[str, List[float]]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, array("f", vector).tobytes()) for key, vector in items.items()],
+            )
+            self._conn.commit()
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key("document", text) for text in texts]
+        vectors = self._load(list(set(keys)))
+        
+        # Embed each missing text once, even if it repeats within the batch
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        self.stats["hits"] += len(texts) - sum(1 for key in keys if key in missing)
+        self.stats["misses"] += len(missing)
+        if missing:
+            self.stats["api_calls"] += 1
+            new_vectors = dict(zip(missing, self.underlying.embed_documents(list(missing.values()))))
+            self._save(new_vectors)
+            vectors.update(new_vectors)
+        
+        return [vectors[key] for key in keys]
+    
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key("query", text)
+        cached = self._load([key])
+        if key in cached:
+            self.stats["hits"] += 1
+            return cached[key]
+        
+        self.stats["misses"] += 1
+        self.stats["api_calls"] += 1
+        vector = self.underlying.embed_query(text)
+        self._save({key: vector})
+        return vector
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await run_in_threadpool(self.embed_documents, texts)
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        return await run_in_threadpool(self.embed_query, text)
+    
+    def get_stats(self) -> dict:
+        stats = dict(self.stats)
+        lookups = stats.get("hits", 0) + stats.get("misses", 0)
+        stats["hit_rate"] = round(stats.get("hits", 0) / lookups, 4) if lookups else 0.0
+        return stats
@@ -18,3 +18,20 @@ class StockSageException(Exception):
     
     def __str__(self):
         return f"Error in [{self.file_name}] line [{self.lineno}]: {self.error_message}"
+
+
+class IngestionCancelled(Exception):
+    """Raised when an ingestion job is cancelled before it finishes."""
+
+
+class UpstreamUnavailable(Exception):
+    """Raised when a provider's circuit is open or a call waited too long for its turn."""
+    
+    def __init__(self, provider: str, reason: str, retry_after: float = 1.0):
+        super().__init__(f"{provider} unavailable: {reason}")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds a configured size or page limit."""
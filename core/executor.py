@@ -0,0 +1,33 @@
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from core.config_loader import load_config
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the shared, bounded thread pool for blocking calls."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                max_workers = load_config().get("concurrency", {}).get("thread_pool_workers", 16)
+                _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stocksage")
+    return _executor
+
+
+async def run_in_threadpool(func: Callable, *args, **kwargs):
+    """Run a blocking function in the bounded pool without blocking the event loop.
+    
+    The caller's context variables (request ID, current trace span, LangChain
+    callbacks) are carried over to the worker thread.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_executor(), functools.partial(context.run, func, *args, **kwargs))
@@ -0,0 +1,146 @@
+"""Deterministic offline stand-ins for the LLM and embedding providers.
+
+Selected with ``llm.provider: fake`` and ``embedding_model.provider: fake`` so
+the app can run (and be load-tested) without Groq or Google keys.
+"""
+import asyncio
+import hashlib
+import json
+import re
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+TICKER_PATTERN = re.compile(r"\b[A-Z]{1,5}\b")
+NEWS_WORDS = {"news", "today", "latest", "price", "current", "now", "recent"}
+NOT_TICKERS = {"I", "A", "AND", "OR", "THE", "PE", "EPS", "ETF", "CEO", "US", "USD", "AI"}
+
+
+class FakeChatModel(BaseChatModel):
+    """Tool-calling chat model with configurable latency.
+    
+    On a new question it calls tools the way the real agent tends to:
+    ``polygon_financials`` per ticker mentioned (up to three), ``web_search``
+    for news/price questions and ``retriever_tool`` otherwise. Once tool
+    results are in it answers from them. Responses, token usage and timing
+    depend only on the input, and answers stream word by word.
+    """
+    
+    latency_seconds: float = 0.2  # time to first token
+    seconds_per_token: float = 0.002
+    tool_names: List[str] = []
+    
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+    
+    def bind_tools(self, tools, **kwargs):
+        return self.model_copy(update={"tool_names": [getattr(tool, "name", str(tool)) for tool in tools]})
+    
+    def _plan_tool_calls(self, question: str) -> list:
+        calls = []
+        tickers = [t for t in dict.fromkeys(TICKER_PATTERN.findall(question)) if t not in NOT_TICKERS][:3]
+        if "polygon_financials" in self.tool_names:
+            calls += [{"name": "polygon_financials", "args": {"query": ticker}} for ticker in tickers]
+        if "web_search" in self.tool_names and NEWS_WORDS & set(question.lower().split()):
+            calls.append({"name": "web_search", "args": {"query": question}})
+        if not calls and "retriever_tool" in self.tool_names:
+            calls.append({"name": "retriever_tool", "args": {"question": question}})
+        digest = hashlib.sha1(question.encode("utf-8")).hexdigest()
+        return [{**call, "id": f"call_{digest[:8]}_{i}"} for i, call in enumerate(calls)]
+    
+    def _respond(self, messages: List[BaseMessage]) -> AIMessage:
+        prompt_tokens = sum(len(str(message.content)) for message in messages) // 4
+        last = messages[-1]
+        if isinstance(last, HumanMessage) and self.tool_names:
+            tool_calls = self._plan_tool_calls(str(last.content))
+            if tool_calls:
+                return AIMessage(content="", tool_calls=tool_calls, usage_metadata={
+                    "input_tokens": prompt_tokens, "output_tokens": 20 * len(tool_calls),
+                    "total_tokens": prompt_tokens + 20 * len(tool_calls),
+                })
+        
+        results = [message for message in messages if isinstance(message, ToolMessage)]
+        evidence = " ".join(str(message.content)[:120] for message in results[-3:]) or "general market knowledge"
+        answer = f"Based on {len(results)} tool result(s): {evidence} This is not financial advice."
+        output_tokens = len(answer) // 4
+        return AIMessage(content=answer, usage_metadata={
+            "input_tokens": prompt_tokens, "output_tokens": output_tokens,
+            "total_tokens": prompt_tokens + output_tokens,
+        })
+    
+    def _duration(self, message: AIMessage) -> float:
+        return self.latency_seconds + self.seconds_per_token * message.usage_metadata["output_tokens"]
+    
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._respond(messages)
+        time.sleep(self._duration(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+    
+    async def _agenerate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._respond(messages)
+        await asyncio.sleep(self._duration(message))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+    
+    def _chunks(self, message: AIMessage) -> List[AIMessageChunk]:
+        if message.tool_calls:
+            return [AIMessageChunk(content="", usage_metadata=message.usage_metadata, tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i}
+                for i, call in enumerate(message.tool_calls)
+            ])]
+        words = re.findall(r"\S+\s*", message.content)
+        chunks = [AIMessageChunk(content=word) for word in words]
+        chunks[-1] = AIMessageChunk(content=words[-1], usage_metadata=message.usage_metadata)
+        return chunks
+    
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        message = self._respond(messages)
+        time.sleep(self.latency_seconds)
+        for chunk in self._chunks(message):
+            time.sleep(self.seconds_per_token * max(1, len(chunk.content) // 4))
+            if run_manager and chunk.content:
+                run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+    
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        message = self._respond(messages)
+        await asyncio.sleep(self.latency_seconds)
+        for chunk in self._chunks(message):
+            await asyncio.sleep(self.seconds_per_token * max(1, len(chunk.content) // 4))
+            if run_manager and chunk.content:
+                await run_manager.on_llm_new_token(chunk.content, chunk=ChatGenerationChunk(message=chunk))
+            yield ChatGenerationChunk(message=chunk)
+
+
+class FakeEmbeddings(Embeddings):
+    """Bag-of-words embeddings via the hashing trick, with a fixed per-call latency.
+    
+    Texts sharing terms get similar vectors, so retrieval behaves plausibly.
+    """
+    
+    def __init__(self, dimension: int = 768, latency_seconds: float = 0.0):
+        self.dimension = dimension
+        self.latency_seconds = latency_seconds
+    
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for token in re.findall(r"[a-z0-9$%.]+", text.lower()):
+            digest = int.from_bytes(hashlib.md5(token.encode("utf-8")).digest()[:8], "little")
+            vector[digest % self.dimension] += 1.0 if (digest >> 63) & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        return [self._embed(text) for text in texts]
+    
+    def embed_query(self, text: str) -> List[float]:
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+        return self._embed(text)
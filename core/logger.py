@@ -1,21 +1,78 @@
+import json
 import logging
 import os
 from datetime import datetime
 from pathlib import Path
 
-# Create logs directory
-LOG_DIR = Path(__file__).parent.parent / "logs"
-LOG_DIR.mkdir(exist_ok=True)
+from core.config_loader import load_config
+from core.tracing import request_id_var
 
-# Create log file with timestamp
+# Log file with timestamp; created on the first record, not at import
+LOG_DIR = Path(__file__).parent.parent / "logs"
 LOG_FILE = f"{datetime.now().strftime('%Y_%m_%d_%H_%M_%S')}.log"
 LOG_FILE_PATH = LOG_DIR / LOG_FILE
 
+
+class LazyFileHandler(logging.FileHandler):
+    """FileHandler that creates its directory and file when the first record is written."""
+    
+    def __init__(self, path: Path):
+        super().__init__(str(path), delay=True)
+    
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+        return super()._open()
+
+
+class RequestIdFilter(logging.Filter):
+    """Attach the current request ID (if any) to every record."""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get() or "-"
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; trace spans (already JSON) are embedded as ``span``."""
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        message = record.getMessage()
+        if record.name == "stocksage.trace":
+            entry["span"] = json.loads(message)
+        else:
+            entry["message"] = message
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class ConfiguredFormatter(logging.Formatter):
+    """JSON or text lines, as ``logging.format`` says; the config is read when the first record is formatted."""
+    
+    def __init__(self):
+        super().__init__()
+        self._formatter = None
+    
+    def format(self, record: logging.LogRecord) -> str:
+        # Handlers hold their lock while formatting, so this runs once
+        if self._formatter is None:
+            if load_config().get("logging", {}).get("format", "json") == "json":
+                self._formatter = JsonFormatter()
+            else:
+                self._formatter = logging.Formatter("[%(asctime)s] %(levelname)s - %(name)s - [%(request_id)s] %(message)s")
+        return self._formatter.format(record)
+
+
 # Configure logging
-logging.basicConfig(
-    filename=str(LOG_FILE_PATH),
-    format="[%(asctime)s] %(levelname)s - %(name)s - %(message)s",
-    level=logging.INFO,
-)
+handler = LazyFileHandler(LOG_FILE_PATH)
+handler.addFilter(RequestIdFilter())
+handler.setFormatter(ConfiguredFormatter())
+logging.basicConfig(handlers=[handler], level=logging.INFO)
 
 logger = logging.getLogger("stocksage")
@@ -1,34 +1,84 @@
 import os
+from pathlib import Path
 from dotenv import load_dotenv
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_groq import ChatGroq
 from core.config_loader import load_config
+from core.embedding_cache import CachedEmbeddings
+from core.tracing import TracedEmbeddings
 
 
 class ModelLoader:
-    """Utility class to load embedding and LLM models."""
+    """Utility class to load embedding and LLM models.
+    
+    ``llm.provider`` and ``embedding_model.provider`` may be set to ``fake`` to
+    use the deterministic offline models in core.fakes (no API keys needed).
+    Provider SDKs are imported only when their model is loaded; they are slow
+    to import and only the configured one is needed. Both models are wrapped so
+    their calls go through the upstream scheduler (rate limits, retries,
+    circuit breaker); the SDKs' own retries are turned off where possible.
+    """
     
     def __init__(self):
         load_dotenv()
-        self._validate_env()
         self.config = load_config()
-
+        self._validate_env()
+    
     def _validate_env(self):
-        """Validate required environment variables."""
-        required_vars = ["GOOGLE_API_KEY", "GROQ_API_KEY"]
+        """Validate the environment variables needed by the configured providers."""
+        required_vars = []
+        if self.config["embedding_model"].get("provider", "google") != "fake":
+            required_vars.append("GOOGLE_API_KEY")
+        if self.config["llm"].get("provider", "groq") != "fake":
+            required_vars.append("GROQ_API_KEY")
         missing_vars = [var for var in required_vars if not os.getenv(var)]
         
         if missing_vars:
             raise EnvironmentError(f"Missing environment variables: {missing_vars}")
         
         self.groq_api_key = os.getenv("GROQ_API_KEY")
-
+    
     def load_embeddings(self):
         """Load and return the embedding model."""
-        model_name = self.config["embedding_model"]["model_name"]
-        return GoogleGenerativeAIEmbeddings(model=model_name)
-
+        from core.scheduled_models import ScheduledEmbeddings
+        
+        settings = self.config["embedding_model"]
+        model_name = settings["model_name"]
+        if settings.get("provider", "google") == "fake":
+            from core.fakes import FakeEmbeddings
+            
+            fake = settings.get("fake", {})
+            model_name = "fake"
+            provider = ScheduledEmbeddings(FakeEmbeddings(
+                dimension=self.config["vector_db"].get("local", {}).get("dimension", 768),
+                latency_seconds=fake.get("latency_seconds", 0.0),
+            ), "fake")
+        else:
+            from langchain_google_genai import GoogleGenerativeAIEmbeddings
+            
+            provider = ScheduledEmbeddings(GoogleGenerativeAIEmbeddings(model=model_name), "google")
+        embeddings = TracedEmbeddings(provider, model_name=model_name)
+        
+        cache_config = self.config["embedding_model"].get("cache", {})
+        if not cache_config.get("enabled", False):
+            return embeddings
+        
+        cache_path = Path(__file__).parent.parent / cache_config.get("path", ".cache/embeddings.sqlite")
+        return CachedEmbeddings(embeddings, model_name=model_name, path=cache_path)
+    
     def load_llm(self):
         """Load and return the LLM model."""
-        model_name = self.config["llm"]["model_name"]
-        return ChatGroq(model=model_name, api_key=self.groq_api_key)
+        from core.scheduled_models import ScheduledChatModel
+        
+        settings = self.config["llm"]
+        if settings.get("provider", "groq") == "fake":
+            from core.fakes import FakeChatModel
+            
+            fake = settings.get("fake", {})
+            return ScheduledChatModel(underlying=FakeChatModel(
+                latency_seconds=fake.get("latency_seconds", 0.2),
+                seconds_per_token=fake.get("seconds_per_token", 0.002),
+            ), provider="fake")
+        from langchain_groq import ChatGroq
+        
+        # Retries happen in the scheduler, which also sees the 429s
+        llm = ChatGroq(model=settings["model_name"], api_key=self.groq_api_key, max_retries=0)
+        return ScheduledChatModel(underlying=llm, provider="groq")
@@ -0,0 +1,105 @@
+from typing import AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+from core.upstream import UpstreamScheduler, get_upstream_scheduler
+
+
+class ScheduledEmbeddings(Embeddings):
+    """Embeddings wrapper whose provider calls go through the upstream scheduler."""
+    
+    def __init__(self, underlying: Embeddings, provider: str, scheduler: Optional[UpstreamScheduler] = None):
+        self.underlying = underlying
+        self.provider = provider
+        self._scheduler = scheduler
+    
+    @property
+    def scheduler(self) -> UpstreamScheduler:
+        return self._scheduler or get_upstream_scheduler()
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.scheduler.call(self.provider, lambda: self.underlying.embed_documents(texts))
+    
+    def embed_query(self, text: str) -> List[float]:
+        return self.scheduler.call(self.provider, lambda: self.underlying.embed_query(text))
+    
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.scheduler.acall(self.provider, lambda: self.underlying.aembed_documents(texts))
+    
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.scheduler.acall(self.provider, lambda: self.underlying.aembed_query(text))
+
+
+class ScheduledChatModel(BaseChatModel):
+    """Chat model wrapper whose provider calls go through the upstream scheduler.
+    
+    ``bind_tools`` binds the underlying model's tool schema to this wrapper, so
+    agent calls stay scheduled. A stream is scheduled (and retried) up to its
+    first chunk; the rest of it is read without holding a slot.
+    """
+    
+    underlying: BaseChatModel
+    provider: str
+    
+    @property
+    def _llm_type(self) -> str:
+        return f"scheduled-{self.underlying._llm_type}"
+    
+    @property
+    def _identifying_params(self) -> dict:
+        return self.underlying._identifying_params
+    
+    def _get_ls_params(self, stop: Optional[List[str]] = None, **kwargs) -> dict:
+        # Callbacks (and so traces) see the provider's model, not this wrapper
+        return {**self.underlying._get_ls_params(stop=stop, **kwargs), "ls_provider": self.provider}
+    
+    def bind_tools(self, tools, **kwargs):
+        bound = self.underlying.bind_tools(tools, **kwargs)
+        if isinstance(bound, BaseChatModel):
+            # Some models (the offline fake) return a configured copy rather than a binding
+            return self.model_copy(update={"underlying": bound})
+        return self.bind(**bound.kwargs)
+    
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs) -> ChatResult:
+        return get_upstream_scheduler().call(
+            self.provider, lambda: self.underlying._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        )
+    
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs) -> ChatResult:
+        return await get_upstream_scheduler().acall(
+            self.provider, lambda: self.underlying._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        )
+    
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        streams = []
+        
+        def first_chunk():
+            streams.append(self.underlying._stream(messages, stop=stop, run_manager=run_manager, **kwargs))
+            return next(streams[-1], None)
+        
+        first = get_upstream_scheduler().call(self.provider, first_chunk)
+        if first is not None:
+            yield first
+            yield from streams[-1]
+    
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        streams = []
+        
+        async def first_chunk():
+            streams.append(self.underlying._astream(messages, stop=stop, run_manager=run_manager, **kwargs))
+            return await anext(streams[-1], None)
+        
+        first = await get_upstream_scheduler().acall(self.provider, first_chunk)
+        if first is not None:
+            yield first
+            async for chunk in streams[-1]:
+                yield chunk
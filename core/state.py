@@ -0,0 +1,336 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, Iterator, Optional, Tuple, Union
+
+from core.config_loader import load_config
+from core.executor import run_in_threadpool
+
+Value = Union[bytes, str]
+
+
+class StateStore:
+    """Key-value state behind the response and tool caches, sessions, ingestion jobs and rate limits.
+    
+    Values are ``bytes`` or ``str`` (callers serialize); keys are scoped to the
+    store's namespace. ``shared`` is True when other worker processes see the
+    same data, which callers use to decide whether cross-process coordination
+    (locks, polling) is worth a round trip.
+    """
+    
+    shared = False
+    backend = "base"
+    
+    def get(self, key: str) -> Optional[Value]:
+        raise NotImplementedError
+    
+    def set(self, key: str, value: Value, ttl: Optional[float] = None) -> None:
+        raise NotImplementedError
+    
+    def add(self, key: str, value: Value, ttl: Optional[float] = None) -> bool:
+        """Set ``key`` only if it does not exist; True if this call set it."""
+        raise NotImplementedError
+    
+    def touch(self, key: str, ttl: Optional[float] = None) -> bool:
+        """Mark ``key`` as recently used and restart its TTL; False if it does not exist."""
+        raise NotImplementedError
+    
+    def delete(self, *keys: str) -> int:
+        raise NotImplementedError
+    
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Atomically add ``amount``; ``ttl`` applies when the counter is created."""
+        raise NotImplementedError
+    
+    def scan(self, prefix: str = "") -> Iterator[str]:
+        """Keys of this namespace starting with ``prefix``."""
+        raise NotImplementedError
+    
+    def clear(self) -> None:
+        self.delete(*self.scan())
+    
+    def size(self) -> int:
+        return sum(1 for _ in self.scan())
+    
+    def get_stats(self) -> dict:
+        return {"backend": self.backend, "entries": self.size()}
+
+
+class MemoryStateStore(StateStore):
+    """Process-local store: an LRU dict with per-key expiry.
+    
+    Beyond ``max_entries`` the least recently used keys are dropped. Expired
+    and evicted keys are passed to ``on_evict`` (outside the lock), so owners
+    can release what the key stood for.
+    """
+    
+    backend = "memory"
+    
+    def __init__(self, max_entries: Optional[int] = None, on_evict: Optional[Callable[[str], None]] = None):
+        self.max_entries = max_entries
+        self.on_evict = on_evict
+        self._entries: "OrderedDict[str, Tuple[Optional[float], Value]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = Counter()
+    
+    def _live(self, key: str, now: float, dropped: list) -> Optional[Tuple[Optional[float], Value]]:
+        """The entry for ``key`` unless it has expired. Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is not None and entry[0] <= now:
+            del self._entries[key]
+            self.stats["expired"] += 1
+            dropped.append(key)
+            return None
+        return entry
+    
+    def _put(self, key: str, value: Value, ttl: Optional[float], now: float, dropped: list) -> None:
+        """Insert as most recently used, evicting beyond ``max_entries``. Caller holds the lock."""
+        self._entries[key] = (now + ttl if ttl else None, value)
+        self._entries.move_to_end(key)
+        while self.max_entries and len(self._entries) > self.max_entries:
+            dropped.append(self._entries.popitem(last=False)[0])
+            self.stats["evictions"] += 1
+    
+    def _notify(self, dropped: list) -> None:
+        if self.on_evict is not None:
+            for key in dropped:
+                self.on_evict(key)
+    
+    def get(self, key: str) -> Optional[Value]:
+        dropped = []
+        with self._lock:
+            entry = self._live(key, time.time(), dropped)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        self._notify(dropped)
+        return entry[1] if entry is not None else None
+    
+    def set(self, key: str, value: Value, ttl: Optional[float] = None) -> None:
+        dropped = []
+        with self._lock:
+            self._put(key, value, ttl, time.time(), dropped)
+        self._notify(dropped)
+    
+    def add(self, key: str, value: Value, ttl: Optional[float] = None) -> bool:
+        dropped = []
+        now = time.time()
+        with self._lock:
+            added = self._live(key, now, dropped) is None
+            if added:
+                self._put(key, value, ttl, now, dropped)
+        self._notify(dropped)
+        return added
+    
+    def touch(self, key: str, ttl: Optional[float] = None) -> bool:
+        dropped = []
+        now = time.time()
+        with self._lock:
+            entry = self._live(key, now, dropped)
+            if entry is not None:
+                self._entries[key] = (now + ttl if ttl else entry[0], entry[1])
+                self._entries.move_to_end(key)
+        self._notify(dropped)
+        return entry is not None
+    
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            return sum(self._entries.pop(key, None) is not None for key in keys)
+    
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        dropped = []
+        now = time.time()
+        with self._lock:
+            entry = self._live(key, now, dropped)
+            value = (int(entry[1]) if entry is not None else 0) + amount
+            if entry is None:
+                self._put(key, str(value), ttl, now, dropped)
+            else:
+                self._entries[key] = (entry[0], str(value))
+        self._notify(dropped)
+        return value
+    
+    def scan(self, prefix: str = "") -> Iterator[str]:
+        dropped = []
+        now = time.time()
+        with self._lock:
+            keys = [key for key in list(self._entries) if key.startswith(prefix) and self._live(key, now, dropped)]
+        self._notify(dropped)
+        return iter(keys)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+    
+    def size(self) -> int:
+        with self._lock:
+            return len(self._entries)
+    
+    def get_stats(self) -> dict:
+        return {**super().get_stats(), **self.stats}
+
+
+class RedisStateStore(StateStore):
+    """Store on a Redis-compatible server, shared by every worker that points at it.
+    
+    Keys are ``<key_prefix><namespace>:<key>``. Size is bounded by TTLs and
+    the server's eviction policy rather than ``max_entries``. ``client`` lets
+    tests pass a client for a local stand-in server.
+    """
+    
+    shared = True
+    backend = "redis"
+    
+    def __init__(self, namespace: str, url: str = "redis://localhost:6379/0", key_prefix: str = "stocksage:",
+                 client=None, socket_timeout: float = 1.0):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise ImportError("The redis state backend needs `pip install redis`") from e
+            client = redis.Redis.from_url(url, socket_timeout=socket_timeout)
+        self.client = client
+        self.prefix = f"{key_prefix}{namespace}:"
+    
+    @staticmethod
+    def _ms(ttl: Optional[float]) -> Optional[int]:
+        return max(1, int(ttl * 1000)) if ttl else None
+    
+    def get(self, key: str) -> Optional[Value]:
+        return self.client.get(self.prefix + key)
+    
+    def set(self, key: str, value: Value, ttl: Optional[float] = None) -> None:
+        self.client.set(self.prefix + key, value, px=self._ms(ttl))
+    
+    def add(self, key: str, value: Value, ttl: Optional[float] = None) -> bool:
+        return bool(self.client.set(self.prefix + key, value, px=self._ms(ttl), nx=True))
+    
+    def touch(self, key: str, ttl: Optional[float] = None) -> bool:
+        if ttl:
+            return bool(self.client.pexpire(self.prefix + key, self._ms(ttl)))
+        return bool(self.client.exists(self.prefix + key))
+    
+    def delete(self, *keys: str) -> int:
+        return self.client.delete(*[self.prefix + key for key in keys]) if keys else 0
+    
+    def incr(self, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        full_key = self.prefix + key
+        if ttl:
+            # Create with the TTL first so a counter never outlives its window
+            self.client.set(full_key, 0, px=self._ms(ttl), nx=True)
+        return int(self.client.incrby(full_key, amount))
+    
+    def scan(self, prefix: str = "") -> Iterator[str]:
+        start = len(self.prefix)
+        for key in self.client.scan_iter(match=self.prefix + prefix + "*", count=500):
+            yield (key.decode("utf-8") if isinstance(key, bytes) else key)[start:]
+
+
+class RateLimiter:
+    """Fixed-window request limit per key, counted in a StateStore.
+    
+    With a shared store the limit holds across all workers.
+    """
+    
+    def __init__(self, store: StateStore, limit: int, window_seconds: float = 60.0):
+        self.store = store
+        self.limit = limit
+        self.window = window_seconds
+    
+    def hit(self, key: str) -> Tuple[bool, float]:
+        """Count one request; return (allowed, seconds until the window resets)."""
+        now = time.time()
+        window = int(now // self.window)
+        count = self.store.incr(f"{key}:{window}", ttl=self.window)
+        return count <= self.limit, (window + 1) * self.window - now
+
+
+
+class RateLimitMiddleware:
+    """ASGI middleware: ``rate_limit.requests_per_minute`` per client on paths under ``path_prefix``.
+    
+    The client is the first ``X-Forwarded-For`` address, else the peer. Counts
+    live in the ``rate_limit`` state store, so a shared backend enforces the
+    limit across workers. Over the limit, requests get a 429 with ``Retry-After``.
+    """
+    
+    def __init__(self, app, path_prefix: str = "/", limiter: Optional[RateLimiter] = None):
+        self.app = app
+        self.path_prefix = path_prefix
+        self._limiter = limiter
+        self._resolved = limiter is not None
+    
+    def _get_limiter(self) -> Optional[RateLimiter]:
+        if not self._resolved:
+            limit = load_config().get("rate_limit", {}).get("requests_per_minute", 0)
+            self._limiter = RateLimiter(open_state_store("rate_limit"), limit) if limit else None
+            self._resolved = True
+        return self._limiter
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            return await self.app(scope, receive, send)
+        limiter = self._get_limiter()
+        if limiter is None:
+            return await self.app(scope, receive, send)
+        
+        headers = dict(scope.get("headers") or [])
+        forwarded = headers.get(b"x-forwarded-for", b"").decode().split(",")[0].strip()
+        client = forwarded or (scope.get("client") or ("unknown",))[0]
+        if limiter.store.shared:
+            allowed, retry_after = await run_in_threadpool(limiter.hit, client)
+        else:
+            allowed, retry_after = limiter.hit(client)
+        if allowed:
+            return await self.app(scope, receive, send)
+        
+        from starlette.responses import JSONResponse
+        
+        response = JSONResponse(
+            status_code=429,
+            content={"error": "Rate limit exceeded"},
+            headers={"Retry-After": str(max(1, round(retry_after)))},
+        )
+        await response(scope, receive, send)
+
+
+_redis_client = None
+_redis_lock = threading.Lock()
+
+
+def _shared_client(settings: dict):
+    """One connection pool per process for every Redis-backed namespace."""
+    global _redis_client
+    if _redis_client is None:
+        with _redis_lock:
+            if _redis_client is None:
+                try:
+                    import redis
+                except ImportError as e:
+                    raise ImportError("The redis state backend needs `pip install redis`") from e
+                _redis_client = redis.Redis.from_url(
+                    settings.get("url", "redis://localhost:6379/0"),
+                    socket_timeout=settings.get("socket_timeout_seconds", 1.0),
+                )
+    return _redis_client
+
+
+def open_state_store(namespace: str, max_entries: Optional[int] = None,
+                     on_evict: Optional[Callable[[str], None]] = None, config: Optional[dict] = None) -> StateStore:
+    """The store for ``namespace`` on the backend named by ``state.backend``.
+    
+    With "memory" each call returns a new process-local store bounded by
+    ``max_entries``; with "redis" every namespace shares one connection pool
+    and ``max_entries`` / ``on_evict`` are left to TTLs and the server.
+    """
+    settings = (config or load_config()).get("state", {})
+    backend = settings.get("backend", "memory")
+    if backend == "memory":
+        return MemoryStateStore(max_entries=max_entries, on_evict=on_evict)
+    if backend == "redis":
+        redis_settings = settings.get("redis", {})
+        return RedisStateStore(
+            namespace,
+            key_prefix=redis_settings.get("key_prefix", "stocksage:"),
+            client=_shared_client(redis_settings),
+        )
+    raise ValueError(f"Unknown state.backend: {backend}")
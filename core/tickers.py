@@ -0,0 +1,30 @@
+import re
+from typing import Dict, List, Optional
+
+CASHTAG_PATTERN = re.compile(r"\$([A-Za-z]{1,5})\b")
+TICKER_PATTERN = re.compile(r"\b[A-Z]{2,5}\b")  # single letters only as cashtags
+
+# Upper-case words that are not tickers
+NOT_TICKERS = {
+    "I", "A", "AN", "AND", "OR", "THE", "OF", "ON", "IN", "TO", "AT", "IS", "IT", "BE", "DO", "MY", "ME", "WE",
+    "FOR", "NOW", "ALL", "NEW", "HOW", "WHAT", "WHY", "PE", "EPS", "ETF", "CEO", "CFO", "US", "USA", "USD", "AI",
+    "IPO", "GDP", "FED", "SEC", "YOY", "QOQ", "TTM", "ROE", "ROI", "API", "EV", "FY", "Q",
+}
+COMPANIES = {
+    "apple": "AAPL", "microsoft": "MSFT", "nvidia": "NVDA", "amazon": "AMZN", "alphabet": "GOOGL",
+    "google": "GOOGL", "meta": "META", "facebook": "META", "tesla": "TSLA", "netflix": "NFLX",
+    "intel": "INTC", "amd": "AMD", "jpmorgan": "JPM", "exxon": "XOM", "walmart": "WMT", "pfizer": "PFE",
+    "disney": "DIS", "coca-cola": "KO", "berkshire": "BRK.B", "salesforce": "CRM", "oracle": "ORCL",
+}
+
+
+def extract_tickers(question: str, companies: Optional[Dict[str, str]] = None) -> List[str]:
+    """Tickers a question names: cashtags, upper-case symbols and well-known company names, in order."""
+    companies = COMPANIES if companies is None else companies
+    tickers = [match.upper() for match in CASHTAG_PATTERN.findall(question)]
+    # In an all-caps question every word looks like a symbol; trust only cashtags and names
+    if any(char.islower() for char in question):
+        tickers += [match for match in TICKER_PATTERN.findall(question) if match not in NOT_TICKERS]
+    lowered = question.lower()
+    tickers += [ticker for name, ticker in companies.items() if re.search(rf"\b{re.escape(name)}\b", lowered)]
+    return list(dict.fromkeys(tickers))
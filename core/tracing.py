@@ -0,0 +1,352 @@
+import bisect
+import contextvars
+import json
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+
+from core.config_loader import load_config
+
+# Latency histogram bucket bounds, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+_sampled_var: contextvars.ContextVar[bool] = contextvars.ContextVar("trace_sampled", default=False)
+_span_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_span", default=None)
+
+_span_log = logging.getLogger("stocksage.trace")
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus layout."""
+    
+    __slots__ = ("counts", "total", "count")
+    
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+    
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+
+class Tracer:
+    """Spans for graph nodes, LLM and tool calls, embeddings and vector queries.
+    
+    Every span updates in-process metrics (latency histograms and token
+    counters per span kind and name), which are rendered for ``/metrics``.
+    Spans of sampled requests are additionally written as JSON log lines with
+    the request ID, span ID and parent span ID, so one request's latency can
+    be broken down after the fact. Sampling is decided once per request.
+    """
+    
+    def __init__(self, settings: Optional[dict] = None):
+        settings = settings if settings is not None else load_config().get("tracing", {})
+        self.enabled = settings.get("enabled", False)
+        self.sample_rate = settings.get("sample_rate", 0.1)
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str], Histogram] = defaultdict(Histogram)
+        self._errors: Dict[Tuple[str, str], int] = defaultdict(int)
+        self._tokens: Dict[Tuple[str, str, str], int] = defaultdict(int)
+    
+    # ---- Requests ------------------------------------------------------------
+    
+    def start_request(self, request_id: Optional[str] = None) -> str:
+        """Bind a request ID and sampling decision to the current context."""
+        request_id = request_id or uuid.uuid4().hex
+        request_id_var.set(request_id)
+        _sampled_var.set(self.enabled and random.random() < self.sample_rate)
+        _span_var.set(None)
+        return request_id
+    
+    # ---- Spans ---------------------------------------------------------------
+    
+    def record(
+        self,
+        kind: str,
+        name: str,
+        seconds: float,
+        span_id: Optional[str] = None,
+        parent_id: Optional[str] = None,
+        error: Optional[str] = None,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        **attributes: Any,
+    ) -> None:
+        """Account a finished span in the metrics and, if sampled, the trace log."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._histograms[(kind, name)].observe(seconds)
+            if error:
+                self._errors[(kind, name)] += 1
+            if input_tokens:
+                self._tokens[(kind, name, "input")] += input_tokens
+            if output_tokens:
+                self._tokens[(kind, name, "output")] += output_tokens
+        
+        if _sampled_var.get():
+            entry = {
+                "request_id": request_id_var.get(),
+                "span_id": span_id or uuid.uuid4().hex[:16],
+                "parent_id": parent_id,
+                "kind": kind,
+                "name": name,
+                "duration_ms": round(seconds * 1000, 3),
+            }
+            if error:
+                entry["error"] = error
+            if input_tokens or output_tokens:
+                entry.update(input_tokens=input_tokens, output_tokens=output_tokens)
+            entry.update(attributes)
+            _span_log.info(json.dumps(entry, default=str))
+    
+    @contextmanager
+    def span(self, kind: str, name: str, **attributes: Any):
+        """Time the enclosed block as a span nested under the current one.
+        
+        Yields a dict whose ``name`` the block may replace, e.g. once a request
+        has been routed.
+        """
+        labels = {"name": name}
+        if not self.enabled:
+            yield labels
+            return
+        span_id = uuid.uuid4().hex[:16]
+        parent_id = _span_var.get()
+        token = _span_var.set(span_id)
+        start = time.perf_counter()
+        error = None
+        try:
+            yield labels
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _span_var.reset(token)
+            self.record(kind, labels["name"], time.perf_counter() - start, span_id, parent_id, error, **attributes)
+    
+    # ---- Metrics -------------------------------------------------------------
+    
+    def render_metrics(self) -> str:
+        """Metrics in the Prometheus text exposition format."""
+        with self._lock:
+            histograms = {key: (list(h.counts), h.total, h.count) for key, h in self._histograms.items()}
+            errors = dict(self._errors)
+            tokens = dict(self._tokens)
+        
+        lines = [
+            "# HELP stocksage_span_duration_seconds Latency of traced spans.",
+            "# TYPE stocksage_span_duration_seconds histogram",
+        ]
+        for (kind, name), (counts, total, count) in sorted(histograms.items()):
+            labels = f'kind="{kind}",name="{_escape(name)}"'
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS, counts):
+                cumulative += bucket_count
+                lines.append(f'stocksage_span_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'stocksage_span_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"stocksage_span_duration_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"stocksage_span_duration_seconds_count{{{labels}}} {count}")
+        
+        lines += ["# HELP stocksage_span_errors_total Spans that raised.", "# TYPE stocksage_span_errors_total counter"]
+        for (kind, name), count in sorted(errors.items()):
+            lines.append(f'stocksage_span_errors_total{{kind="{kind}",name="{_escape(name)}"}} {count}')
+        
+        lines += ["# HELP stocksage_tokens_total LLM tokens by span.", "# TYPE stocksage_tokens_total counter"]
+        for (kind, name, direction), count in sorted(tokens.items()):
+            lines.append(f'stocksage_tokens_total{{kind="{kind}",name="{_escape(name)}",direction="{direction}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+def _short_id(run_id) -> str:
+    # Run IDs are time-ordered UUIDs; the tail holds the random bits
+    return str(run_id).replace("-", "")[-16:]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """LangChain callback handler that turns graph runs into tracer spans.
+    
+    Graph nodes (``node``), chat model calls (``llm``, with token usage, named
+    ``<provider>/<model>``), tool calls (``tool``) and retriever calls
+    (``retriever``) are timed from their start/end callbacks and parented by
+    LangChain run IDs. A tool wrapped in layers (lazy loading, scheduling,
+    caching) emits a run per layer with the same name; only the outermost is
+    recorded, and likewise a node's function running inside its node.
+    """
+    
+    run_inline = True  # avoid hopping to an executor for every callback
+    
+    def __init__(self, tracer: "Tracer"):
+        self.tracer = tracer
+        self._runs: Dict[Any, Tuple[str, str, float]] = {}
+        self._parents: Dict[Any, Optional[Any]] = {}
+        self._lock = threading.Lock()
+    
+    def _inside(self, parent_run_id, kind: str, name: str) -> bool:
+        """Whether an ancestor run is already traced as ``kind`` ``name``. Caller holds the lock."""
+        while parent_run_id is not None:
+            run = self._runs.get(parent_run_id)
+            if run is not None and run[:2] == (kind, name):
+                return True
+            parent_run_id = self._parents.get(parent_run_id)
+        return False
+    
+    def _start(self, run_id, parent_run_id, kind: Optional[str] = None, name: str = "") -> None:
+        with self._lock:
+            self._parents[run_id] = parent_run_id
+            if kind is not None and not self._inside(parent_run_id, kind, name):
+                self._runs[run_id] = (kind, name, time.perf_counter())
+    
+    def _end(self, run_id, error: Optional[BaseException] = None, **extra) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+            parent = self._parents.pop(run_id, None)
+            if run is None:
+                return
+            # Report the closest traced ancestor as the parent, skipping untraced runnables
+            while parent is not None and parent not in self._runs:
+                parent = self._parents.get(parent)
+        kind, name, start = run
+        self.tracer.record(
+            kind, name, time.perf_counter() - start,
+            span_id=_short_id(run_id),
+            parent_id=_short_id(parent) if parent is not None else _span_var.get(),
+            error=f"{type(error).__name__}: {error}" if error else None,
+            **extra,
+        )
+    
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        name = kwargs.get("name")
+        if parent_run_id is None:
+            self._start(run_id, None, "graph", name or "graph")
+        elif metadata and name and name == metadata.get("langgraph_node"):
+            self._start(run_id, parent_run_id, "node", name)
+        else:
+            self._start(run_id, parent_run_id)
+    
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+    
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+    
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        metadata = metadata or {}
+        name = "/".join(filter(None, (metadata.get("ls_provider"), metadata.get("ls_model_name"))))
+        self._start(run_id, parent_run_id, "llm", name or kwargs.get("name") or (serialized or {}).get("name", "chat_model"))
+    
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+        self._end(run_id, input_tokens=input_tokens, output_tokens=output_tokens)
+    
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+    
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, "tool", kwargs.get("name") or (serialized or {}).get("name", "tool"))
+    
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+    
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+    
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, "retriever", kwargs.get("name") or (serialized or {}).get("name", "retriever"))
+    
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        self._end(run_id, documents=len(documents))
+    
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+
+class TracingMiddleware:
+    """ASGI middleware: one request ID (from ``X-Request-ID`` or generated) and ``http`` span per request.
+    
+    The span is named by the matched route's path template (``GET /jobs/{job_id}``),
+    or ``unmatched``, so IDs in paths don't each become a metrics series.
+    """
+    
+    def __init__(self, app, tracer: Optional["Tracer"] = None):
+        self.app = app
+        self._tracer = tracer
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        tracer = self._tracer or get_tracer()
+        headers = dict(scope.get("headers") or [])
+        request_id = tracer.start_request(headers.get(b"x-request-id", b"").decode() or None)
+        
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode())]
+            await send(message)
+        
+        with tracer.span("http", f"{scope['method']} unmatched") as span:
+            try:
+                await self.app(scope, receive, send_with_request_id)
+            finally:
+                # The router records the matched route in the shared scope
+                route = getattr(scope.get("route"), "path", None)
+                if route is not None:
+                    span["name"] = f"{scope['method']} {route}"
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """Return the process-wide Tracer, creating it on first use."""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer()
+    return _tracer
+
+
+def trace_callbacks() -> List[BaseCallbackHandler]:
+    """Callbacks to pass in a graph run's config; empty when tracing is disabled."""
+    tracer = get_tracer()
+    return [TracingCallbackHandler(tracer)] if tracer.enabled else []
+
+
+class TracedEmbeddings(Embeddings):
+    """Embeddings wrapper that records an ``embedding`` span per provider call."""
+    
+    def __init__(self, underlying: Embeddings, model_name: str):
+        self.underlying = underlying
+        self.model_name = model_name
+    
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with get_tracer().span("embedding", self.model_name, texts=len(texts)):
+            return self.underlying.embed_documents(texts)
+    
+    def embed_query(self, text: str) -> List[float]:
+        with get_tracer().span("embedding", self.model_name, texts=1):
+            return self.underlying.embed_query(text)
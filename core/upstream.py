@@ -0,0 +1,425 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import random
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Iterator, List, Optional, Tuple
+
+from core.config_loader import load_config
+from core.exceptions import UpstreamUnavailable
+from core.logger import logger
+
+# Waiting calls are served lane by lane: interactive queries first, then batch, then ingestion
+LANES = ["interactive", "batch", "ingestion"]
+_lane: contextvars.ContextVar[str] = contextvars.ContextVar("upstream_lane", default="interactive")
+
+RATE_LIMIT_MARKERS = ("429", "rate limit", "too many requests", "exceeded the maximum requests", "resource has been exhausted")
+TRANSIENT_NAMES = ("Timeout", "ConnectionError", "APIConnectionError", "TransportError", "ServiceUnavailable",
+                   "InternalServerError", "RemoteProtocolError")
+
+
+@contextmanager
+def upstream_lane(name: str) -> Iterator[None]:
+    """Run the block's upstream calls (including those in tasks and pool threads it starts) in lane ``name``."""
+    token = _lane.set(name)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def current_lane() -> str:
+    return _lane.get()
+
+
+def classify_error(error: BaseException) -> Tuple[bool, bool, Optional[float]]:
+    """Return (retryable, rate_limited, retry_after seconds) for a provider error."""
+    response = getattr(error, "response", None)
+    status = getattr(error, "status_code", None) or getattr(response, "status_code", None) or getattr(error, "code", None)
+    try:
+        status = int(status)
+    except (TypeError, ValueError):
+        status = None
+    
+    retry_after = None
+    headers = getattr(response, "headers", None) or {}
+    try:
+        retry_after = float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError, AttributeError):
+        retry_after = getattr(error, "retry_after", None)
+    
+    message = str(error).lower()
+    if status == 429 or any(marker in message for marker in RATE_LIMIT_MARKERS):
+        return True, True, retry_after
+    if (status is not None and status >= 500) or isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True, False, retry_after
+    return any(name in type(error).__name__ for name in TRANSIENT_NAMES), False, retry_after
+
+
+class TokenBucket:
+    """Token bucket whose rate adapts to the provider (AIMD).
+    
+    A 429 halves the rate (down to ``min_rate_fraction`` of the configured
+    one) and, with ``Retry-After``, withholds tokens until it has passed;
+    every success adds back ``recovery`` of the configured rate. A rate of
+    0 means unlimited.
+    """
+    
+    def __init__(self, rate: float, burst: float, min_rate_fraction: float = 0.1, recovery: float = 0.05):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.min_rate = rate * min_rate_fraction
+        self.recovery = recovery
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+    
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available (0 if one is)."""
+        if not self.rate:
+            return 0.0
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+    
+    def take(self) -> None:
+        if self.rate:
+            self.tokens -= 1
+    
+    def throttle(self, retry_after: Optional[float]) -> None:
+        if not self.rate:
+            return
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = min(self.tokens, 0.0, -(retry_after or 0.0) * self.rate)
+    
+    def recover(self) -> None:
+        if self.rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * self.recovery)
+
+
+class CircuitBreaker:
+    """Fails calls fast after ``failure_threshold`` consecutive transient failures.
+    
+    After ``reset_seconds`` one trial call is let through (half-open); its
+    success closes the breaker, its failure opens it again.
+    """
+    
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_running = False
+        self.trial_started = 0.0
+    
+    def allow(self, now: float) -> Optional[float]:
+        """None if a call may proceed, else seconds until the breaker half-opens. Caller holds the lock."""
+        if self.state == "closed":
+            return None
+        if self.state == "open" and now - self.opened_at >= self.reset_seconds:
+            self.state = "half_open"
+        # A trial that never reported back (e.g. it timed out in the queue) is replaced
+        if self.state == "half_open" and (not self.trial_running or now - self.trial_started > self.reset_seconds):
+            self.trial_running, self.trial_started = True, now
+            return None
+        return max(0.0, self.opened_at + self.reset_seconds - now) or 1.0
+    
+    def record_success(self) -> None:
+        self.state, self.failures, self.trial_running = "closed", 0, False
+    
+    def record_failure(self, now: float) -> None:
+        self.failures += 1
+        self.trial_running = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning(f"Circuit breaker opened after {self.failures} consecutive failures")
+            self.state, self.opened_at = "open", now
+
+
+class _Waiter:
+    """A queued call; wakes a thread or a coroutine on whatever loop it waits on."""
+    
+    def __init__(self, priority: int, seq: int, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.priority = priority
+        self.seq = seq
+        self.loop = loop
+        self.event = asyncio.Event() if loop is not None else threading.Event()
+    
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+    
+    def wake(self) -> None:
+        if self.loop is None:
+            self.event.set()
+        else:
+            try:
+                self.loop.call_soon_threadsafe(self.event.set)
+            except RuntimeError:
+                pass  # its loop has closed; nothing is waiting any more
+
+
+class ProviderGate:
+    """Rate, concurrency and circuit-breaker state of one upstream provider.
+    
+    Calls queue in lane priority order (FIFO within a lane); the head of the
+    queue takes a token and a concurrency slot as soon as both are free. A
+    ``max_concurrency`` of 0 means no cap.
+    """
+    
+    def __init__(self, name: str, policy: dict, lanes: List[str]):
+        self.name = name
+        self.policy = policy
+        self.lanes = lanes
+        self.max_concurrency = policy.get("max_concurrency", 0)
+        self.bucket = TokenBucket(policy.get("requests_per_second", 0), policy.get("burst", 10))
+        self.breaker = CircuitBreaker(policy.get("breaker_failures", 5), policy.get("breaker_reset_seconds", 30))
+        self.active = 0
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.stats = Counter()
+        self._waits = {lane: deque(maxlen=1000) for lane in lanes}
+    
+    def _priority(self, lane: str) -> int:
+        return self.lanes.index(lane) if lane in self.lanes else len(self.lanes)
+    
+    def _try_grant(self, waiter: _Waiter) -> Optional[float]:
+        """0 if ``waiter`` got a slot, else seconds to wait (None: until woken). Caller holds the lock."""
+        if not self._waiters or self._waiters[0] is not waiter or 0 < self.max_concurrency <= self.active:
+            return None
+        delay = self.bucket.wait_time(time.monotonic())
+        if delay > 0:
+            return delay
+        self.bucket.take()
+        self.active += 1
+        heapq.heappop(self._waiters)
+        if self._waiters:
+            self._waiters[0].wake()
+        return 0.0
+    
+    def _remove(self, waiter: _Waiter) -> None:
+        with self._lock:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+                if self._waiters:
+                    self._waiters[0].wake()
+    
+    def _enqueue(self, lane: str, loop=None) -> _Waiter:
+        waiter = _Waiter(self._priority(lane), next(self._seq), loop)
+        with self._lock:
+            heapq.heappush(self._waiters, waiter)
+        return waiter
+    
+    def _record_wait(self, lane: str, started: float) -> None:
+        self._waits.setdefault(lane, deque(maxlen=1000)).append((time.monotonic() - started) * 1000)
+    
+    def acquire(self, lane: str, timeout: float) -> None:
+        started = time.monotonic()
+        waiter = self._enqueue(lane)
+        try:
+            while True:
+                with self._lock:
+                    delay = self._try_grant(waiter)
+                if delay == 0:
+                    self._record_wait(lane, started)
+                    return
+                remaining = started + timeout - time.monotonic()
+                if remaining <= 0:
+                    self.stats["queue_timeouts"] += 1
+                    raise UpstreamUnavailable(self.name, f"queued longer than {timeout}s", retry_after=timeout)
+                waiter.event.wait(min(delay or remaining, remaining))
+                waiter.event.clear()
+        except BaseException:
+            self._remove(waiter)
+            raise
+    
+    async def aacquire(self, lane: str, timeout: float) -> None:
+        started = time.monotonic()
+        waiter = self._enqueue(lane, asyncio.get_running_loop())
+        try:
+            while True:
+                with self._lock:
+                    delay = self._try_grant(waiter)
+                if delay == 0:
+                    self._record_wait(lane, started)
+                    return
+                remaining = started + timeout - time.monotonic()
+                if remaining <= 0:
+                    self.stats["queue_timeouts"] += 1
+                    raise UpstreamUnavailable(self.name, f"queued longer than {timeout}s", retry_after=timeout)
+                try:
+                    await asyncio.wait_for(waiter.event.wait(), min(delay or remaining, remaining))
+                except asyncio.TimeoutError:
+                    pass
+                waiter.event.clear()
+        except BaseException:
+            self._remove(waiter)
+            raise
+    
+    def release(self) -> None:
+        with self._lock:
+            self.active -= 1
+            if self._waiters:
+                self._waiters[0].wake()
+    
+    def check_breaker(self) -> None:
+        with self._lock:
+            wait = self.breaker.allow(time.monotonic())
+        if wait is not None:
+            self.stats["rejected_open"] += 1
+            raise UpstreamUnavailable(self.name, "circuit open", retry_after=wait)
+    
+    def record(self, error: Optional[BaseException]) -> Tuple[bool, Optional[float]]:
+        """Update bucket and breaker after an attempt; return (retryable, retry_after)."""
+        with self._lock:
+            if error is None:
+                self.breaker.record_success()
+                self.bucket.recover()
+                return False, None
+            retryable, rate_limited, retry_after = classify_error(error)
+            if rate_limited:
+                self.stats["rate_limited"] += 1
+                self.bucket.throttle(retry_after)
+            if retryable:
+                self.breaker.record_failure(time.monotonic())
+            else:
+                # The provider answered; a bad request says nothing about its health
+                self.breaker.record_success()
+            return retryable, retry_after
+    
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = {
+                **self.stats,
+                "active": self.active,
+                "queued": len(self._waiters),
+                "rate": round(self.bucket.rate, 3),
+                "breaker": self.breaker.state,
+            }
+        waits = {}
+        for lane, samples in self._waits.items():
+            samples = sorted(samples)
+            if samples:
+                waits[lane] = {
+                    "count": len(samples),
+                    "p50_ms": round(samples[len(samples) // 2], 2),
+                    "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+                }
+        stats["queue_wait"] = waits
+        return stats
+
+
+class UpstreamScheduler:
+    """Central gate for calls to LLM, embedding and tool providers.
+    
+    Each provider (``upstream.providers.<name>``, falling back to
+    ``upstream.default``) gets a token bucket, a concurrency cap and a circuit
+    breaker. Rate-limited and transient failures are retried up to
+    ``max_retries`` times with full-jitter exponential backoff (at least the
+    provider's ``Retry-After``); other errors are raised at once. Calls wait in
+    lane priority order (see ``upstream_lane``). Limits are per process.
+    """
+    
+    def __init__(self, config: Optional[dict] = None):
+        settings = (config or load_config()).get("upstream", {})
+        self.enabled = settings.get("enabled", True)
+        self.lanes = settings.get("lanes", LANES)
+        self.queue_timeout = settings.get("queue_timeout_seconds", 60)
+        self.default = settings.get("default", {})
+        self.providers = settings.get("providers", {})
+        self._gates = {}
+        self._lock = threading.Lock()
+    
+    def gate(self, provider: str) -> ProviderGate:
+        gate = self._gates.get(provider)
+        if gate is None:
+            with self._lock:
+                gate = self._gates.get(provider)
+                if gate is None:
+                    policy = {**self.default, **self.providers.get(provider, {})}
+                    gate = self._gates[provider] = ProviderGate(provider, policy, self.lanes)
+        return gate
+    
+    def backoff(self, gate: ProviderGate, attempt: int, retry_after: Optional[float]) -> float:
+        base = gate.policy.get("backoff_base_seconds", 0.5)
+        cap = gate.policy.get("backoff_max_seconds", 20)
+        return max(random.uniform(0, min(cap, base * 2 ** attempt)), retry_after or 0.0)
+    
+    def call(self, provider: str, fn: Callable[[], Any], lane: Optional[str] = None) -> Any:
+        """Run ``fn()`` against ``provider`` under its limits, retrying transient failures."""
+        if not self.enabled:
+            return fn()
+        gate, lane = self.gate(provider), lane or current_lane()
+        max_retries = gate.policy.get("max_retries", 3)
+        for attempt in itertools.count():
+            gate.check_breaker()
+            gate.acquire(lane, self.queue_timeout)
+            gate.stats["attempts"] += 1
+            try:
+                result = fn()
+            except Exception as e:
+                retryable, retry_after = gate.record(e)
+                if not retryable or attempt >= max_retries:
+                    gate.stats["failures"] += 1
+                    raise
+                gate.stats["retries"] += 1
+                delay = self.backoff(gate, attempt, retry_after)
+                logger.info(f"{provider}: {type(e).__name__} on attempt {attempt + 1}, retrying in {delay:.2f}s")
+            else:
+                gate.record(None)
+                return result
+            finally:
+                gate.release()
+            time.sleep(delay)
+    
+    async def acall(self, provider: str, fn: Callable[[], Awaitable[Any]], lane: Optional[str] = None) -> Any:
+        """Async variant of :meth:`call`; ``fn`` returns a fresh awaitable per attempt."""
+        if not self.enabled:
+            return await fn()
+        gate, lane = self.gate(provider), lane or current_lane()
+        max_retries = gate.policy.get("max_retries", 3)
+        for attempt in itertools.count():
+            gate.check_breaker()
+            await gate.aacquire(lane, self.queue_timeout)
+            gate.stats["attempts"] += 1
+            try:
+                result = await fn()
+            except Exception as e:
+                retryable, retry_after = gate.record(e)
+                if not retryable or attempt >= max_retries:
+                    gate.stats["failures"] += 1
+                    raise
+                gate.stats["retries"] += 1
+                delay = self.backoff(gate, attempt, retry_after)
+                logger.info(f"{provider}: {type(e).__name__} on attempt {attempt + 1}, retrying in {delay:.2f}s")
+            else:
+                gate.record(None)
+                return result
+            finally:
+                gate.release()
+            await asyncio.sleep(delay)
+    
+    def get_stats(self) -> dict:
+        with self._lock:
+            gates = dict(self._gates)
+        return {name: gate.get_stats() for name, gate in gates.items()}
+
+
+_scheduler: Optional[UpstreamScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_upstream_scheduler() -> UpstreamScheduler:
+    """Return the process-wide UpstreamScheduler, creating it on first use."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = UpstreamScheduler()
+    return _scheduler
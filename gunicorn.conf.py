@@ -0,0 +1,26 @@
+"""Gunicorn settings: the API behind several uvicorn worker processes.
+
+    gunicorn -c gunicorn.conf.py main:app
+
+Workers, bind address and timeout come from the ``server`` section of
+config.yaml (``WEB_CONCURRENCY`` overrides the worker count). Workers share
+caches, sessions and job status only with ``state.backend: "redis"``.
+"""
+import os
+
+from core.config_loader import load_config
+
+_config = load_config()
+_server = _config.get("server", {})
+
+bind = f"{_server.get('host', '0.0.0.0')}:{_server.get('port', 8000)}"
+workers = int(os.getenv("WEB_CONCURRENCY") or _server.get("workers", 1))
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = _server.get("timeout_seconds", 120)
+graceful_timeout = 30
+keepalive = 5
+
+
+def when_ready(server):
+    if workers > 1 and _config.get("state", {}).get("backend", "memory") == "memory":
+        server.log.warning("state.backend is 'memory': each worker keeps its own caches, sessions and jobs")
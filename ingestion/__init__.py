@@ -1,3 +1,19 @@
-from ingestion.pipeline import DataIngestion
+from ingestion.pipeline import DataIngestion, IngestionProgress
+from ingestion.jobs import IngestionJob, IngestionJobManager
+from ingestion.manifest import DocumentManifest, document_id, get_document_manifest
+from ingestion.uploads import SpooledUpload, UploadLimits, UploadSpool, receive_multipart, spool_file
 
-__all__ = ["DataIngestion"]
+__all__ = [
+    "DataIngestion",
+    "IngestionProgress",
+    "IngestionJob",
+    "IngestionJobManager",
+    "DocumentManifest",
+    "document_id",
+    "get_document_manifest",
+    "SpooledUpload",
+    "UploadLimits",
+    "UploadSpool",
+    "receive_multipart",
+    "spool_file",
+]
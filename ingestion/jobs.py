@@ -0,0 +1,209 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from uuid import uuid4
+
+from core import load_config, IngestionCancelled, logger, open_state_store
+from ingestion.pipeline import DataIngestion, IngestionProgress
+from ingestion.uploads import SpooledUpload, UploadLimits, discard_uploads
+
+# Job lifecycle: queued -> running -> completed | failed | cancelled
+FINISHED_STATES = {"completed", "failed", "cancelled"}
+
+
+@dataclass
+class IngestionJob:
+    """State of one background ingestion job."""
+    job_id: str
+    filenames: List[str]
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    progress: IngestionProgress = field(default_factory=IngestionProgress)
+    
+    def to_dict(self) -> dict:
+        stats = self.progress.snapshot()
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "files": self.filenames,
+            "files_total": len(self.filenames),
+            "files_parsed": stats["files_parsed"],
+            "files_unchanged": stats["files_unchanged"],
+            "pages": stats["pages"],
+            "chunks": stats["chunks"],
+            "chunks_embedded": stats["embedded"],
+            "vectors_upserted": stats["stored"],
+            "already_stored": stats["already_stored"],
+            "elapsed_seconds": round(elapsed, 2),
+            "chunks_per_second": round(stats["chunks"] / elapsed, 1) if elapsed else 0.0,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class IngestionJobManager:
+    """Runs DataIngestion in a worker pool and tracks job progress.
+    
+    Uploads are spooled by ``submit`` (while the request's files are still
+    open), or arrive spooled already through ``submit_spooled``, so the HTTP
+    request returns immediately with a job ID. Jobs
+    run in the worker that accepted the upload; their status is published to
+    the ``ingestion_jobs`` state store, so with a shared backend any worker
+    can report on a job or cancel it.
+    """
+    
+    def __init__(self, max_workers: Optional[int] = None, max_finished_jobs: int = 200, config: Optional[dict] = None):
+        config = config or load_config()
+        settings = config.get("ingestion", {})
+        self.limits = UploadLimits.from_settings(settings.get("uploads", {}))
+        self.keyword_index_enabled = config["retriever"].get("bm25", {}).get("enabled", False)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or settings.get("job_workers", 2), thread_name_prefix="ingestion-job"
+        )
+        self._jobs: Dict[str, IngestionJob] = {}
+        self._lock = threading.Lock()
+        self.max_finished_jobs = max_finished_jobs
+        
+        self.job_ttl = settings.get("job_ttl_seconds", 86400)
+        self.publish_interval = settings.get("job_publish_seconds", 1.0)
+        self._store = open_state_store("ingestion_jobs", max_entries=max_finished_jobs, config=config)
+        self._stopped = threading.Event()
+        if self._store.shared:
+            threading.Thread(target=self._publish_loop, name="ingestion-job-publisher", daemon=True).start()
+    
+    def _publish(self, job: IngestionJob) -> None:
+        if self._store.shared:
+            self._store.set(job.job_id, json.dumps(job.to_dict()), ttl=self.job_ttl)
+    
+    def _publish_loop(self) -> None:
+        """Publish running jobs' progress and pick up cancellations requested through other workers."""
+        while not self._stopped.wait(self.publish_interval):
+            for job in self.list():
+                if job.status in FINISHED_STATES:
+                    continue
+                try:
+                    if self._store.get(f"cancel:{job.job_id}") is not None:
+                        job.progress.cancel_event.set()
+                    self._publish(job)
+                except Exception as e:
+                    logger.warning(f"Could not publish ingestion job {job.job_id}: {e}")
+    
+    def submit(self, uploaded_files) -> IngestionJob:
+        """Spool uploads and queue a job to ingest them."""
+        ingestion = DataIngestion()
+        return self.submit_spooled(ingestion.spool_uploads(uploaded_files), ingestion)
+    
+    def submit_spooled(self, spooled: List[SpooledUpload], ingestion: Optional[DataIngestion] = None) -> IngestionJob:
+        """Queue a job for uploads already spooled (e.g. by ``receive_multipart``); the job deletes them."""
+        try:
+            ingestion = ingestion or DataIngestion()
+        except Exception:
+            discard_uploads(spooled)
+            raise
+        job = IngestionJob(job_id=uuid4().hex, filenames=[upload.filename for upload in spooled])
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._prune()
+        self._publish(job)
+        self._executor.submit(self._run, job, ingestion, spooled)
+        logger.info(f"Queued ingestion job {job.job_id} for {job.filenames}")
+        return job
+    
+    def _run(self, job: IngestionJob, ingestion: DataIngestion, spooled: List[SpooledUpload]) -> None:
+        if job.progress.cancel_event.is_set():
+            ingestion._cleanup(spooled)
+            job.status, job.finished_at = "cancelled", time.time()
+            self._publish(job)
+            return
+        
+        job.status, job.started_at = "running", time.time()
+        try:
+            job.result = ingestion.run_spooled(spooled, job.progress)
+            job.status = "completed"
+        except IngestionCancelled:
+            job.status = "cancelled"
+            logger.info(f"Ingestion job {job.job_id} cancelled and rolled back")
+        except Exception as e:
+            job.status, job.error = "failed", str(e)
+            logger.error(f"Ingestion job {job.job_id} failed: {e}")
+        finally:
+            job.finished_at = time.time()
+            self._publish(job)
+    
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        """A job running (or run) in this process."""
+        with self._lock:
+            return self._jobs.get(job_id)
+    
+    def list(self) -> List[IngestionJob]:
+        with self._lock:
+            return list(self._jobs.values())
+    
+    def status(self, job_id: str) -> Optional[dict]:
+        """Progress of a job, wherever it runs; None if unknown."""
+        job = self.get(job_id)
+        if job is not None:
+            return job.to_dict()
+        value = self._store.get(job_id) if self._store.shared else None
+        return json.loads(value) if value is not None else None
+    
+    def statuses(self) -> List[dict]:
+        """Progress of this process's jobs plus those other workers published."""
+        jobs = {job.job_id: job.to_dict() for job in self.list()}
+        if self._store.shared:
+            for job_id in self._store.scan():
+                if job_id not in jobs and not job_id.startswith("cancel:"):
+                    status = self.status(job_id)
+                    if status is not None:
+                        jobs[job_id] = status
+        return list(jobs.values())
+    
+    def cancel(self, job_id: str) -> Optional[dict]:
+        """Request cancellation; the job rolls back its vectors before stopping.
+        
+        A job running in another worker is flagged in the state store and stops
+        within ``job_publish_seconds``. Returns the job's status, or None if unknown.
+        """
+        job = self.get(job_id)
+        if job is not None:
+            if job.status not in FINISHED_STATES:
+                job.progress.cancel_event.set()
+            return job.to_dict()
+        status = self.status(job_id)
+        if status is not None and status["status"] not in FINISHED_STATES:
+            self._store.set(f"cancel:{job_id}", "1", ttl=self.job_ttl)
+            status["cancel_requested"] = True
+        return status
+    
+    def backfill_keyword_index(self) -> None:
+        """Index stored chunks the BM25 index lacks, in the background; a no-op with BM25 off."""
+        if self.keyword_index_enabled:
+            self._executor.submit(self._backfill)
+    
+    @staticmethod
+    def _backfill() -> None:
+        try:
+            DataIngestion().backfill_keyword_index()
+        except Exception as e:
+            logger.warning(f"BM25 backfill failed: {e}")
+    
+    def _prune(self) -> None:
+        """Drop the oldest finished jobs beyond ``max_finished_jobs``. Caller holds the lock."""
+        finished = [job for job in self._jobs.values() if job.status in FINISHED_STATES]
+        for job in sorted(finished, key=lambda j: j.created_at)[:-self.max_finished_jobs or None]:
+            del self._jobs[job.job_id]
+    
+    def shutdown(self) -> None:
+        self._stopped.set()
+        for job in self.list():
+            self.cancel(job.job_id)
+        self._executor.shutdown(wait=True)
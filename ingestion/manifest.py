@@ -0,0 +1,179 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from core import load_config
+
+
+def document_id(filename: str) -> str:
+    """Stable ID of a document: uploads with the same filename are versions of it."""
+    return hashlib.sha256(filename.encode("utf-8")).hexdigest()[:16]
+
+
+class DocumentManifest:
+    """Local record of ingested documents: file hash, version and chunk IDs.
+    
+    Chunk IDs are a content hash followed by the document ID, so a chunk is
+    shared by the versions of one document; it is only deleted from the index
+    once no version references it. Ingestion runs ``reserve`` the chunk IDs
+    they are about to rely on before checking the index, so a concurrent
+    update or delete never removes a chunk another run is still counting on.
+    """
+    
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._reserved = Counter()
+        
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " document_id TEXT PRIMARY KEY, filename TEXT NOT NULL, file_hash TEXT NOT NULL,"
+            " version INTEGER NOT NULL, pages INTEGER NOT NULL, chunks INTEGER NOT NULL,"
+            " created_at REAL NOT NULL, updated_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS document_chunks ("
+            " document_id TEXT NOT NULL, chunk_id TEXT NOT NULL, PRIMARY KEY (document_id, chunk_id));"
+            "CREATE INDEX IF NOT EXISTS document_chunks_by_chunk ON document_chunks (chunk_id);"
+        )
+        self._conn.commit()
+    
+    @staticmethod
+    def _row(row) -> dict:
+        keys = ["document_id", "filename", "file_hash", "version", "pages", "chunks", "created_at", "updated_at"]
+        return dict(zip(keys, row))
+    
+    def get(self, doc_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM documents WHERE document_id = ?", (doc_id,)).fetchone()
+        return self._row(row) if row else None
+    
+    def list(self) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM documents ORDER BY updated_at DESC").fetchall()
+        return [self._row(row) for row in rows]
+    
+    def find_by_content(self, content_hashes: Iterable[str]) -> Dict[str, str]:
+        """A committed chunk ID per content hash that some document stores, keyed by the hash."""
+        found = {}
+        with self._lock:
+            for digest in content_hashes:
+                # IDs start with the content hash, and "-" < "." ends the range
+                row = self._conn.execute(
+                    "SELECT chunk_id FROM document_chunks WHERE chunk_id >= ? AND chunk_id < ? LIMIT 1",
+                    (digest, digest + "."),
+                ).fetchone()
+                if row is not None:
+                    found[digest] = row[0]
+        return found
+    
+    def chunk_ids(self, doc_id: str) -> Set[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT chunk_id FROM document_chunks WHERE document_id = ?", (doc_id,))
+            return {chunk_id for chunk_id, in rows}
+    
+    def all_chunk_ids(self) -> Set[str]:
+        """Chunk IDs of every committed document."""
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT chunk_id FROM document_chunks")
+            return {chunk_id for chunk_id, in rows}
+    
+    def reserve(self, chunk_ids: Iterable[str]) -> None:
+        """Protect chunks a running ingestion depends on from being garbage-collected."""
+        with self._lock:
+            self._reserved.update(chunk_ids)
+    
+    def release(self, chunk_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._reserved.subtract(chunk_ids)
+            self._reserved += Counter()  # drop zero counts
+    
+    def _orphans(self, chunk_ids: Set[str]) -> List[str]:
+        """Chunks of ``chunk_ids`` referenced by no document and no running ingestion. Caller holds the lock."""
+        orphans = []
+        for chunk_id in chunk_ids:
+            if self._reserved[chunk_id]:
+                continue
+            if self._conn.execute("SELECT 1 FROM document_chunks WHERE chunk_id = ? LIMIT 1", (chunk_id,)).fetchone() is None:
+                orphans.append(chunk_id)
+        return orphans
+    
+    def discard(self, chunk_ids: Iterable[str], delete_chunks, release: Iterable[str] = ()) -> int:
+        """Delete chunks a cancelled ingestion wrote that no document references and no other ingestion reserved.
+        
+        ``release`` are the cancelled run's own reservations; they are dropped
+        under the same lock as the orphan check. Returns the chunks deleted.
+        """
+        with self._lock:
+            self.release(release)
+            orphans = self._orphans(set(chunk_ids))
+            if orphans:
+                delete_chunks(orphans)
+            return len(orphans)
+    
+    def commit(self, filename: str, file_hash: str, chunk_ids: Set[str], pages: int, delete_chunks) -> dict:
+        """Record a new version of ``filename`` and delete chunks only its old version used.
+        
+        ``delete_chunks(ids)`` removes vectors from the index; it runs under the
+        manifest lock so the orphan check and the delete are atomic. Returns the
+        document plus ``chunks_added`` / ``chunks_removed`` / ``chunks_deleted``.
+        """
+        doc_id = document_id(filename)
+        now = time.time()
+        with self._lock:
+            previous = self.get(doc_id)
+            old_ids = self.chunk_ids(doc_id) if previous else set()
+            removed, added = old_ids - chunk_ids, chunk_ids - old_ids
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (doc_id, filename, file_hash, previous["version"] + 1 if previous else 1, pages, len(chunk_ids),
+                 previous["created_at"] if previous else now, now),
+            )
+            self._conn.executemany(
+                "DELETE FROM document_chunks WHERE document_id = ? AND chunk_id = ?", [(doc_id, cid) for cid in removed]
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO document_chunks VALUES (?, ?)", [(doc_id, cid) for cid in added]
+            )
+            self._conn.commit()
+            orphans = self._orphans(removed)
+            if orphans:
+                delete_chunks(orphans)
+            return {**self.get(doc_id), "chunks_added": len(added), "chunks_removed": len(removed),
+                    "chunks_deleted": len(orphans)}
+    
+    def delete(self, doc_id: str, delete_chunks) -> Optional[dict]:
+        """Forget a document and delete the chunks no other document uses. None if unknown."""
+        with self._lock:
+            document = self.get(doc_id)
+            if document is None:
+                return None
+            chunk_ids = self.chunk_ids(doc_id)
+            self._conn.execute("DELETE FROM document_chunks WHERE document_id = ?", (doc_id,))
+            self._conn.execute("DELETE FROM documents WHERE document_id = ?", (doc_id,))
+            self._conn.commit()
+            orphans = self._orphans(chunk_ids)
+            if orphans:
+                delete_chunks(orphans)
+            return {**document, "chunks_deleted": len(orphans)}
+
+
+_manifest: Optional[DocumentManifest] = None
+_manifest_lock = threading.Lock()
+
+
+def get_document_manifest() -> DocumentManifest:
+    """Return the process-wide DocumentManifest, creating it on first use."""
+    global _manifest
+    if _manifest is None:
+        with _manifest_lock:
+            if _manifest is None:
+                settings = load_config().get("ingestion", {})
+                path = Path(__file__).parent.parent / settings.get("manifest_path", ".cache/documents.sqlite")
+                _manifest = DocumentManifest(path)
+    return _manifest
@@ -1,35 +1,200 @@
+import gc
+import hashlib
+import multiprocessing
 import os
 import sys
-import tempfile
-from typing import List
-from uuid import uuid4
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Tuple
 
 from dotenv import load_dotenv
 from langchain_core.documents import Document
-from langchain_community.document_loaders import PyPDFLoader, Docx2txtLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_pinecone import PineconeVectorStore
-from pinecone import ServerlessSpec, Pinecone
 
-from core import load_config, ModelLoader, StockSageException, logger
+from core import load_config, StockSageException, IngestionCancelled, UploadTooLarge, logger, upstream_lane
+from ingestion.manifest import document_id, get_document_manifest
+from ingestion.uploads import SUPPORTED_EXTENSIONS, SpooledUpload, UploadLimits, discard_uploads, open_buffer, spool_file
+from vectorstore import get_vector_store_manager
+
+PROGRESS_KEYS = ["files_parsed", "files_unchanged", "pages", "chunks", "duplicate_chunks", "already_stored", "stored",
+                 "embedded"]
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_lock = threading.Lock()
+# In parse workers: (upload key, PdfReader, ExitStack closing its buffer) of the PDF being parsed
+_open_pdf = None
+_pdf_lock = threading.Lock()
+
+
+def content_hash(text: str) -> str:
+    """Hash of a chunk's text; chunks with the same text share one embedding."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(text: str, source: str) -> str:
+    """Deterministic vector ID for a chunk: the hash of its content, then the ID of its document.
+    
+    A chunk two documents share is stored once per document, so the source
+    and page kept with each copy, and the citations built from them, always
+    name a document that still has it.
+    """
+    return f"{content_hash(text)}-{document_id(source)}"
+
+
+def _pdf_reader(upload: SpooledUpload):
+    """A PdfReader over the upload, kept open across the page ranges this process parses."""
+    global _open_pdf
+    key = (upload.path, upload.file_hash)
+    if _open_pdf is not None and _open_pdf[0] == key:
+        return _open_pdf[1]
+    _close_pdf()
+    from pypdf import PdfReader
+    
+    stack = ExitStack()
+    try:
+        reader = PdfReader(stack.enter_context(open_buffer(upload)))
+    except BaseException:
+        stack.close()
+        raise
+    _open_pdf = (key, reader, stack)
+    return reader
+
+
+def _close_pdf() -> None:
+    global _open_pdf
+    if _open_pdf is not None:
+        _, _, stack = _open_pdf
+        _open_pdf = None
+        stack.close()
+        gc.collect()  # pypdf's object graph is cyclic
+
+
+def parse_pages(upload: SpooledUpload, start: int = 0, stop: Optional[int] = None) -> List[Document]:
+    """Parse pages ``start:stop`` of one upload into page documents. Runs inside the parse process pool.
+    
+    The PDF is read through a memory map of its spool file (or the bytes of a
+    small upload). A worker keeps the reader, and so its page tree, for the
+    file's next range, but drops the objects each range resolved, so it holds
+    one range's pages at a time rather than the whole document. The reader is
+    closed after the file's last page, or when a range of another file comes.
+    """
+    if upload.file_ext == ".pdf":
+        with _pdf_lock:
+            try:
+                reader = _pdf_reader(upload)
+                pages = reader.pages
+                # The last range runs to the real end, in case the page tree's /Count was off
+                stop = len(pages) if stop is None or stop >= (upload.pages or 0) else min(stop, len(pages))
+                documents = [
+                    Document(page_content=pages[page].extract_text(), metadata={"source": upload.filename, "page": page})
+                    for page in range(start, stop)
+                ]
+            except BaseException:
+                _close_pdf()
+                raise
+            if stop == len(pages):
+                _close_pdf()
+            else:
+                reader.resolved_objects.clear()  # re-read on demand; pages keep their own dictionaries
+                gc.collect()
+            return documents
+    if upload.file_ext == ".docx":
+        import docx2txt
+        
+        with open_buffer(upload) as buffer:
+            return [Document(page_content=docx2txt.process(buffer), metadata={"source": upload.filename})]
+    return []
+
+
+def get_parse_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Return the shared process pool used to parse uploads."""
+    global _parse_pool
+    if _parse_pool is None:
+        with _parse_pool_lock:
+            if _parse_pool is None:
+                # spawn: forking a process that already runs thread pools is unsafe
+                _parse_pool = ProcessPoolExecutor(
+                    max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+    return _parse_pool
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    """Yield lists of up to ``size`` items from ``iterable``."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+@dataclass
+class IngestionProgress:
+    """Live counters for one ingestion run, readable from other threads.
+    
+    ``stored_ids`` records vectors written by this run so a cancelled run can
+    remove what it added and nothing else relies on.
+    """
+    stats: Counter = field(default_factory=lambda: Counter({key: 0 for key in PROGRESS_KEYS}))
+    stored_ids: List[str] = field(default_factory=list)
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    
+    def add(self, key: str, amount: int = 1) -> None:
+        with self.lock:
+            self.stats[key] += amount
+    
+    def record_batch(self, counts: Counter, ids: List[str]) -> None:
+        with self.lock:
+            self.stats.update(counts)
+            self.stored_ids.extend(ids)
+    
+    def check_cancelled(self) -> None:
+        if self.cancel_event.is_set():
+            raise IngestionCancelled("Ingestion cancelled")
+    
+    def snapshot(self) -> dict:
+        with self.lock:
+            return dict(self.stats)
 
 
 class DataIngestion:
-    """Handle document loading, processing, and storage in Pinecone."""
+    """Handle document loading, processing, and storage in Pinecone.
+    
+    Ingestion runs as a staged pipeline: uploads are spooled (in memory, or to a
+    temp file once they pass ``uploads.spool_memory_mb``), parsed a range of
+    pages at a time in a process pool, split into a stream of chunks, and
+    embedded/upserted in concurrent batches. At most ``max_in_flight_batches``
+    batches are pending at once, so memory stays bounded however many files,
+    or pages, are uploaded.
+    
+    Uploaded files are documents in the DocumentManifest, keyed by filename.
+    Re-uploading an unchanged file is skipped; a changed file only embeds its
+    new chunks and deletes the chunks its previous version alone used.
+    """
     
     def __init__(self):
         try:
             logger.info("Initializing DataIngestion pipeline...")
             load_dotenv()
-            self._validate_env()
             self.config = load_config()
-            self.model_loader = ModelLoader()
+            self._validate_env()
+            self.settings = self.config.get("ingestion", {})
+            self.limits = UploadLimits.from_settings(self.settings.get("uploads", {}))
+            self.vector_store_manager = get_vector_store_manager()
         except Exception as e:
             raise StockSageException(e, sys)
     
     def _validate_env(self):
         """Validate required environment variables."""
-        required_vars = ["GOOGLE_API_KEY", "PINECONE_API_KEY"]
+        required_vars = []
+        if self.config["embedding_model"].get("provider", "google") != "fake":
+            required_vars.append("GOOGLE_API_KEY")
+        if self.config["vector_db"].get("provider", "pinecone") == "pinecone":
+            required_vars.append("PINECONE_API_KEY")
         missing_vars = [var for var in required_vars if not os.getenv(var)]
         
         if missing_vars:
@@ -37,90 +202,325 @@ class DataIngestion:
         
         self.pinecone_api_key = os.getenv("PINECONE_API_KEY")
     
-    def load_documents(self, uploaded_files) -> List[Document]:
-        """Load documents from uploaded files."""
+    def _spool_uploads(self, uploaded_files) -> List[SpooledUpload]:
+        """Spool file-like uploads in fixed-size blocks, enforcing the upload limits."""
+        spooled = []
         try:
-            documents = []
-            
             for uploaded_file in uploaded_files:
                 file_ext = os.path.splitext(uploaded_file.filename)[1].lower()
-                suffix = file_ext if file_ext in [".pdf", ".docx"] else ".tmp"
-                
-                with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-                    temp_file.write(uploaded_file.file.read())
-                    temp_path = temp_file.name
-                
-                if file_ext == ".pdf":
-                    loader = PyPDFLoader(temp_path)
-                    documents.extend(loader.load())
-                elif file_ext == ".docx":
-                    loader = Docx2txtLoader(temp_path)
-                    documents.extend(loader.load())
-                else:
+                if file_ext not in SUPPORTED_EXTENSIONS:
                     logger.warning(f"Unsupported file type: {uploaded_file.filename}")
+                    continue
+                received = sum(upload.size for upload in spooled)
+                spooled.append(spool_file(uploaded_file.file, uploaded_file.filename, self.limits, received))
+        except BaseException:
+            discard_uploads(spooled)
+            raise
+        return spooled
+    
+    def _parse_tasks(self, spooled: List[SpooledUpload]) -> List[Tuple[int, SpooledUpload, int, Optional[int]]]:
+        """(file index, upload, start page, stop page) per parse task; PDFs split into page ranges."""
+        per_task = self.settings.get("pdf_pages_per_task", 50)
+        tasks = []
+        for index, upload in enumerate(spooled):
+            if upload.pages:
+                tasks += [(index, upload, start, min(start + per_task, upload.pages)) for start in range(0, upload.pages, per_task)]
+            else:
+                tasks.append((index, upload, 0, None))
+        return tasks
+    
+    def iter_documents(self, spooled: List[SpooledUpload], progress: IngestionProgress = None) -> Iterator[Document]:
+        """Parse spooled files in the process pool, yielding pages as page ranges finish."""
+        progress = progress or IngestionProgress()
+        workers = self.settings.get("parse_workers", 2)
+        pool = get_parse_pool(workers)
+        tasks = self._parse_tasks(spooled)
+        remaining = Counter(index for index, _, _, _ in tasks)
+        pending = {}  # future -> file index
+        tasks = iter(tasks)
+        
+        try:
+            while True:
+                progress.check_cancelled()
+                # Keep at most 2 page ranges per worker in flight
+                for index, upload, start, stop in islice(tasks, 2 * workers - len(pending)):
+                    pending[pool.submit(parse_pages, upload, start, stop)] = index
+                if not pending:
+                    return
                 
-                # Cleanup temp file
-                os.unlink(temp_path)
-            
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    documents = future.result()
+                    remaining[index] -= 1
+                    if not remaining[index]:
+                        progress.add("files_parsed")
+                    progress.add("pages", len(documents))
+                    yield from documents
+        finally:
+            for future in pending:
+                future.cancel()
+    
+    def iter_chunks(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """Split documents lazily, one page at a time."""
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.settings.get("chunk_size", 1000),
+            chunk_overlap=self.settings.get("chunk_overlap", 200),
+            length_function=len
+        )
+        for document in documents:
+            yield from text_splitter.split_documents([document])
+    
+    def load_documents(self, uploaded_files) -> List[Document]:
+        """Load documents from uploaded files."""
+        spooled = []
+        try:
+            spooled = self._spool_uploads(uploaded_files)
+            documents = list(self.iter_documents(spooled))
             logger.info(f"Loaded {len(documents)} documents")
             return documents
-            
+        
         except Exception as e:
             raise StockSageException(e, sys)
+        finally:
+            self._cleanup(spooled)
+    
+    def _store_batch(self, batch: List[Tuple[str, Document]], progress: IngestionProgress) -> None:
+        """Embed and upsert one batch of (chunk_id, chunk), skipping stored chunks.
+        
+        A text some committed document already stored, or that repeats within
+        the batch, is embedded once: its copies reuse that vector.
+        """
+        progress.check_cancelled()
+        existing = self.vector_store_manager.existing_ids([cid for cid, _ in batch])
+        new_chunks = [(cid, chunk) for cid, chunk in batch if cid not in existing]
+        new_ids = [cid for cid, _ in new_chunks]
+        texts = {}
+        if new_chunks:
+            hashes = [content_hash(chunk.page_content) for _, chunk in new_chunks]
+            stored_as = get_document_manifest().find_by_content(set(hashes))
+            stored = self.vector_store_manager.get_vectors(list(stored_as.values()))
+            vectors = {digest: stored[cid] for digest, cid in stored_as.items() if cid in stored}
+            texts = {digest: chunk.page_content for digest, (_, chunk) in zip(hashes, new_chunks) if digest not in vectors}
+            if texts:
+                # Embedding calls yield to interactive queries when the provider is busy
+                with upstream_lane("ingestion"):
+                    embedded = self.vector_store_manager.get_embeddings().embed_documents(list(texts.values()))
+                vectors.update(zip(texts, embedded))
+            self.vector_store_manager.add_vectors(new_ids, [vectors[digest] for digest in hashes],
+                                                  [chunk for _, chunk in new_chunks])
+        keyword_index = self.vector_store_manager.get_keyword_index()
+        if keyword_index is not None:
+            # Stored chunks too, if they were stored before the keyword index was enabled
+            indexed = set(keyword_index.contains([cid for cid, _ in batch]))
+            unindexed = [(cid, chunk) for cid, chunk in batch if cid not in indexed]
+            if unindexed:
+                keyword_index.add([cid for cid, _ in unindexed], [chunk.page_content for _, chunk in unindexed],
+                                  [chunk.metadata for _, chunk in unindexed])
+        progress.record_batch(Counter(already_stored=len(existing), stored=len(new_chunks), embedded=len(texts)), new_ids)
+    
+    def backfill_keyword_index(self, batch_size: int = 100) -> int:
+        """Add committed chunks the BM25 index lacks (e.g. after enabling it on an existing store); return how many."""
+        keyword_index = self.vector_store_manager.get_keyword_index()
+        if keyword_index is None:
+            return 0
+        chunk_ids = list(get_document_manifest().all_chunk_ids())
+        indexed = set(keyword_index.contains(chunk_ids))
+        missing = sorted(cid for cid in chunk_ids if cid not in indexed)
+        added = 0
+        for i in range(0, len(missing), batch_size):
+            documents = self.vector_store_manager.get_documents(missing[i:i + batch_size])
+            keyword_index.add([doc.id for doc in documents], [doc.page_content for doc in documents],
+                              [doc.metadata for doc in documents])
+            added += len(documents)
+        if missing:
+            logger.info(f"Backfilled the BM25 index with {added} of {len(missing)} stored chunks")
+        return added
+    
+    def rollback(self, progress: IngestionProgress, reserved: Iterable[str] = ()) -> None:
+        """Delete the vectors a cancelled or failed run wrote, releasing its ``reserved`` chunk IDs.
+        
+        Versions of a document share chunk IDs, so a vector this run wrote may
+        also belong to the committed version or to another running ingestion
+        of the same file that reserved it; the manifest keeps those.
+        """
+        with progress.lock:
+            ids = list(progress.stored_ids)
+        deleted = get_document_manifest().discard(ids, self.vector_store_manager.delete_ids, release=reserved)
+        if ids:
+            logger.info(f"Rolled back {deleted} of the {len(ids)} vectors this run wrote")
     
-    def store_in_vector_db(self, documents: List[Document]):
+    def store_chunks(self, chunks: Iterable[Document], progress: IngestionProgress = None) -> dict:
+        """Embed and upsert a stream of chunks in concurrent, bounded batches.
+        
+        Chunk IDs hash the content and the document, so chunks already in the
+        index are skipped and re-ingesting the same file is a no-op. Returns
+        ingestion statistics.
+        """
+        progress = progress or IngestionProgress()
+        start = time.perf_counter()
+        
+        # Reuse the shared Pinecone client; the index is created if missing
+        self.vector_store_manager.ensure_index(dimension=768)
+        embeddings = self.vector_store_manager.get_embeddings()
+        cache_before = dict(getattr(embeddings, "stats", {}))
+        
+        seen = set()
+        
+        def unique_chunks():
+            for chunk in chunks:
+                progress.add("chunks")
+                cid = chunk_id(chunk.page_content, chunk.metadata["source"])
+                if cid in seen:
+                    progress.add("duplicate_chunks")
+                    continue
+                seen.add(cid)
+                yield cid, chunk
+        
+        # Backpressure: the splitter only runs ahead of the upserts by max_in_flight batches
+        in_flight = threading.BoundedSemaphore(self.settings.get("max_in_flight_batches", 8))
+        futures = []
+        with ThreadPoolExecutor(max_workers=self.settings.get("embed_concurrency", 4)) as pool:
+            for batch in batched(unique_chunks(), self.settings.get("embed_batch_size", 64)):
+                in_flight.acquire()
+                progress.check_cancelled()
+                future = pool.submit(self._store_batch, batch, progress)
+                future.add_done_callback(lambda _: in_flight.release())
+                futures.append(future)
+            for future in futures:
+                future.result()
+        
+        stats = progress.snapshot()
+        result = {key: stats.get(key, 0) for key in ["chunks", "duplicate_chunks", "already_stored", "stored", "embedded"]}
+        if stats.get("files_parsed"):
+            result["files_parsed"] = stats["files_parsed"]
+            result["pages"] = stats["pages"]
+        if hasattr(embeddings, "stats"):
+            hits = embeddings.stats["hits"] - cache_before.get("hits", 0)
+            misses = embeddings.stats["misses"] - cache_before.get("misses", 0)
+            result["embedding_cache"] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            }
+        # Every chunk not sent to the embedding API is a saved embedding
+        result["embeddings_saved"] = result["chunks"] - result.get("embedding_cache", {}).get("misses", result["embedded"])
+        
+        elapsed = time.perf_counter() - start
+        result["seconds"] = round(elapsed, 3)
+        result["chunks_per_second"] = round(result["chunks"] / elapsed, 1) if elapsed else 0.0
+        
+        logger.info(f"Stored {result['stored']} new chunks in Pinecone: {result}")
+        return result
+    
+    def store_in_vector_db(self, documents: List[Document]) -> dict:
         """Chunk and store documents in Pinecone."""
         try:
-            # Split documents into chunks
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=1000,
-                chunk_overlap=200,
-                length_function=len
-            )
-            chunks = text_splitter.split_documents(documents)
-            logger.info(f"Split into {len(chunks)} chunks")
-            
-            # Initialize Pinecone
-            pc = Pinecone(api_key=self.pinecone_api_key)
-            index_name = self.config["vector_db"]["index_name"]
-            
-            # Create index if it doesn't exist
-            existing_indexes = [idx.name for idx in pc.list_indexes()]
-            if index_name not in existing_indexes:
-                logger.info(f"Creating Pinecone index: {index_name}")
-                pc.create_index(
-                    name=index_name,
-                    dimension=768,
-                    metric="cosine",
-                    spec=ServerlessSpec(cloud="aws", region="us-east-1"),
-                )
-            
-            # Store documents
-            index = pc.Index(index_name)
-            vector_store = PineconeVectorStore(
-                index=index,
-                embedding=self.model_loader.load_embeddings()
-            )
-            
-            uuids = [str(uuid4()) for _ in range(len(chunks))]
-            vector_store.add_documents(documents=chunks, ids=uuids)
-            
-            logger.info(f"Stored {len(chunks)} chunks in Pinecone")
-            
+            return self.store_chunks(self.iter_chunks(documents))
         except Exception as e:
             raise StockSageException(e, sys)
     
-    def run_pipeline(self, uploaded_files):
-        """Run the complete ingestion pipeline."""
+    def _cleanup(self, spooled: List[SpooledUpload]) -> None:
+        discard_uploads(spooled)
+    
+    def spool_uploads(self, uploaded_files) -> List[SpooledUpload]:
+        """Spool uploads so they can be ingested after the request ends."""
         try:
-            documents = self.load_documents(uploaded_files)
-            
-            if not documents:
+            return self._spool_uploads(uploaded_files)
+        except UploadTooLarge:
+            raise
+        except Exception as e:
+            raise StockSageException(e, sys)
+    
+    def _plan_files(self, spooled: List[SpooledUpload], progress: IngestionProgress):
+        """Split uploads into files to parse and manifest outcomes that need no parsing.
+        
+        A file whose document already has this content is unchanged. A copy of
+        another document is parsed, but its chunks reuse that document's vectors.
+        """
+        manifest = get_document_manifest()
+        to_parse, outcomes = [], []
+        for entry in spooled:
+            filename, file_hash = entry.filename, entry.file_hash
+            current = manifest.get(document_id(filename))
+            if current is not None and current["file_hash"] == file_hash:
+                progress.add("files_unchanged")
+                outcomes.append({**current, "status": "unchanged"})
+                continue
+            to_parse.append(entry)
+        return to_parse, outcomes
+    
+    def run_spooled(self, spooled: List[SpooledUpload], progress: IngestionProgress = None) -> dict:
+        """Ingest already spooled files, record them in the manifest, then delete them.
+        
+        If ``progress.cancel_event`` is set midway, in-flight batches finish, the
+        vectors this run wrote are deleted and IngestionCancelled is raised. A
+        run that fails deletes them as well.
+        """
+        progress = progress or IngestionProgress()
+        manifest = get_document_manifest()
+        members = {}  # filename -> chunk IDs of this version
+        pages = Counter()
+        reserved = set()
+        
+        def count_pages(documents):
+            for document in documents:
+                pages[document.metadata["source"]] += 1
+                yield document
+        
+        def roll_back():
+            self.rollback(progress, reserved)
+            reserved.clear()  # released by the rollback
+        
+        def track(chunks):
+            for chunk in chunks:
+                cid = chunk_id(chunk.page_content, chunk.metadata["source"])
+                members.setdefault(chunk.metadata["source"], set()).add(cid)
+                if cid not in reserved:
+                    reserved.add(cid)
+                    manifest.reserve([cid])
+                yield chunk
+        
+        try:
+            if not spooled:
                 logger.warning("No valid documents found")
-                return
+                return {"chunks": 0, "stored": 0}
             
-            self.store_in_vector_db(documents)
-            logger.info("Ingestion pipeline completed successfully")
+            to_parse, documents = self._plan_files(spooled, progress)
+            if to_parse:
+                chunks = track(self.iter_chunks(count_pages(self.iter_documents(to_parse, progress))))
+                result = self.store_chunks(chunks, progress)
+            else:
+                result = {key: 0 for key in ["chunks", "duplicate_chunks", "already_stored", "stored", "embedded"]}
             
+            for upload in to_parse:
+                document = manifest.commit(
+                    upload.filename, upload.file_hash, members.get(upload.filename, set()), pages[upload.filename],
+                    self.vector_store_manager.delete_ids,
+                )
+                documents.append({**document, "status": "updated" if document["version"] > 1 else "created"})
+            result["files_unchanged"] = progress.snapshot()["files_unchanged"]
+            result["chunks_deleted"] = sum(document.get("chunks_deleted", 0) for document in documents)
+            result["documents"] = documents
+            logger.info("Ingestion pipeline completed successfully")
+            return result
+        
+        except IngestionCancelled:
+            roll_back()
+            raise
         except Exception as e:
+            roll_back()
+            if progress.cancel_event.is_set():
+                raise IngestionCancelled("Ingestion cancelled")
             raise StockSageException(e, sys)
+        finally:
+            manifest.release(reserved)
+            self._cleanup(spooled)
+    
+    def delete_document(self, doc_id: str) -> Optional[dict]:
+        """Remove a document from the manifest and its chunks from the index. None if unknown."""
+        return get_document_manifest().delete(doc_id, self.vector_store_manager.delete_ids)
+    
+    def run_pipeline(self, uploaded_files, progress: IngestionProgress = None) -> dict:
+        """Run the complete ingestion pipeline and return its statistics."""
+        return self.run_spooled(self.spool_uploads(uploaded_files), progress)
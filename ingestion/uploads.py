@@ -0,0 +1,250 @@
+import hashlib
+import io
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import AsyncIterable, BinaryIO, Iterator, List, NamedTuple, Optional
+
+from core import UploadTooLarge, logger, run_in_threadpool
+
+SUPPORTED_EXTENSIONS = [".pdf", ".docx"]
+BLOCK_SIZE = 1024 * 1024
+MB = 1024 * 1024
+
+
+@dataclass
+class UploadLimits:
+    """Limits enforced while uploads arrive (``ingestion.uploads`` in config.yaml)."""
+    max_file_bytes: int = 100 * MB
+    max_total_bytes: int = 500 * MB  # per request
+    max_pages: int = 2000  # per PDF
+    spool_memory_bytes: int = 1 * MB
+    spool_dir: Optional[str] = None
+    
+    @classmethod
+    def from_settings(cls, settings: dict) -> "UploadLimits":
+        return cls(
+            max_file_bytes=int(settings.get("max_file_mb", 100) * MB),
+            max_total_bytes=int(settings.get("max_total_mb", 500) * MB),
+            max_pages=settings.get("max_pages", 2000),
+            spool_memory_bytes=int(settings.get("spool_memory_mb", 1) * MB),
+            spool_dir=settings.get("spool_dir"),
+        )
+
+
+class SpooledUpload(NamedTuple):
+    """One received upload: its bytes in memory (``data``) when small, else in the temp file at ``path``."""
+    filename: str
+    file_ext: str
+    file_hash: str
+    size: int
+    path: Optional[str] = None
+    data: Optional[bytes] = None
+    pages: Optional[int] = None  # PDFs whose page tree could be read
+
+
+@contextmanager
+def open_buffer(upload: SpooledUpload) -> Iterator[BinaryIO]:
+    """A read-only view of the upload's bytes: its in-memory data, or a memory map of its temp file."""
+    if upload.path is None:
+        yield io.BytesIO(upload.data or b"")  # shares the bytes until written to
+        return
+    with open(upload.path, "rb") as file:
+        if upload.size == 0:
+            yield io.BytesIO(b"")
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            yield buffer
+
+
+def count_pdf_pages(upload: SpooledUpload) -> int:
+    """Pages of a PDF upload, as its page tree's /Count records; reads no page objects."""
+    from pypdf import PdfReader
+    
+    with open_buffer(upload) as buffer:
+        return int(PdfReader(buffer).trailer["/Root"]["/Pages"]["/Count"])
+
+
+def discard_uploads(uploads: List[SpooledUpload]) -> None:
+    """Delete the temp files of spooled uploads."""
+    for upload in uploads:
+        if upload.path is None:
+            continue
+        try:
+            os.unlink(upload.path)
+        except FileNotFoundError:
+            pass
+
+
+class UploadSpool:
+    """Receives one upload block by block: hashes it and enforces the limits as bytes arrive.
+    
+    Bytes stay in memory up to ``spool_memory_bytes``; past that the spool
+    moves to a temp file, which is written once and later parsed through a
+    memory map. ``received`` counts earlier files of the same request
+    against ``max_total_bytes``.
+    """
+    
+    def __init__(self, filename: str, limits: UploadLimits, received: int = 0):
+        self.filename = filename
+        self.file_ext = os.path.splitext(filename)[1].lower()
+        self.limits = limits
+        self.received = received
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._buffer = io.BytesIO()
+        self._file = None
+    
+    def write(self, block) -> None:
+        self.size += len(block)
+        if self.size > self.limits.max_file_bytes:
+            raise UploadTooLarge(f"{self.filename} is larger than the {self.limits.max_file_bytes / MB:g} MB limit")
+        if self.received + self.size > self.limits.max_total_bytes:
+            raise UploadTooLarge(f"Upload is larger than the {self.limits.max_total_bytes / MB:g} MB limit")
+        self._hash.update(block)
+        if self._file is None and self.size > self.limits.spool_memory_bytes:
+            self._file = tempfile.NamedTemporaryFile(delete=False, suffix=self.file_ext, dir=self.limits.spool_dir)
+            self._file.write(self._buffer.getbuffer())
+            self._buffer = None
+        (self._file or self._buffer).write(block)
+    
+    def finish(self) -> SpooledUpload:
+        """Close the spool; PDFs over ``max_pages`` are rejected."""
+        if self._file is None:
+            upload = SpooledUpload(self.filename, self.file_ext, self._hash.hexdigest(), self.size,
+                                   data=self._buffer.getvalue())
+        else:
+            self._file.close()
+            upload = SpooledUpload(self.filename, self.file_ext, self._hash.hexdigest(), self.size, path=self._file.name)
+        if upload.file_ext != ".pdf":
+            return upload
+        
+        try:
+            pages = count_pdf_pages(upload)
+        except Exception as e:
+            # Parsing reports the problem; the page count only splits the work
+            logger.warning(f"Could not count the pages of {self.filename}: {e}")
+            return upload
+        if pages > self.limits.max_pages:
+            discard_uploads([upload])
+            raise UploadTooLarge(f"{self.filename} has {pages} pages, more than the {self.limits.max_pages} page limit")
+        return upload._replace(pages=pages)
+    
+    def discard(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            discard_uploads([SpooledUpload(self.filename, self.file_ext, "", self.size, path=self._file.name)])
+        self._buffer = None
+
+
+def spool_file(file: BinaryIO, filename: str, limits: UploadLimits, received: int = 0) -> SpooledUpload:
+    """Spool an open file-like upload (e.g. ``UploadFile.file``) in fixed-size blocks."""
+    spool = UploadSpool(filename, limits, received)
+    try:
+        while block := file.read(BLOCK_SIZE):
+            spool.write(block)
+        return spool.finish()
+    except BaseException:
+        spool.discard()
+        raise
+
+
+class _MultipartReceiver:
+    """python-multipart callbacks that write each file part into its own UploadSpool."""
+    
+    def __init__(self, limits: UploadLimits):
+        self.limits = limits
+        self.uploads: List[SpooledUpload] = []
+        self.spool: Optional[UploadSpool] = None
+        self._headers = {}
+        self._field = self._value = b""
+    
+    @property
+    def received(self) -> int:
+        return sum(upload.size for upload in self.uploads)
+    
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+        }
+    
+    def on_part_begin(self) -> None:
+        self._headers = {}
+    
+    def on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._field += data[start:end]
+    
+    def on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._value += data[start:end]
+    
+    def on_header_end(self) -> None:
+        self._headers[self._field.lower()] = self._value
+        self._field = self._value = b""
+    
+    def on_headers_finished(self) -> None:
+        from python_multipart.multipart import parse_options_header
+        
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        filename = options.get(b"filename")
+        if not filename:
+            return  # a form field, not a file
+        filename = filename.decode("utf-8", "replace")
+        if os.path.splitext(filename)[1].lower() not in SUPPORTED_EXTENSIONS:
+            logger.warning(f"Unsupported file type: {filename}")
+            return
+        self.spool = UploadSpool(filename, self.limits, self.received)
+    
+    def on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self.spool is not None:
+            self.spool.write(memoryview(data)[start:end])
+    
+    def on_part_end(self) -> None:
+        if self.spool is not None:
+            self.uploads.append(self.spool.finish())
+            self.spool = None
+    
+    def discard(self) -> None:
+        if self.spool is not None:
+            self.spool.discard()
+        discard_uploads(self.uploads)
+
+
+async def receive_multipart(content_type: str, body: AsyncIterable[bytes], limits: UploadLimits,
+                            content_length: Optional[int] = None) -> List[SpooledUpload]:
+    """Spool the files of a multipart/form-data body as it arrives.
+    
+    Each block of the body is parsed and written to its file's spool before
+    the next is read, so neither the body nor a whole file is ever held in
+    memory (beyond ``spool_memory_bytes``) and nothing is copied twice. Parts
+    without a filename or of unsupported types are skipped. Raises
+    UploadTooLarge as soon as a limit is crossed.
+    """
+    from python_multipart.multipart import MultipartParser, parse_options_header
+    
+    if content_length is not None and content_length > limits.max_total_bytes:
+        raise UploadTooLarge(f"Upload is larger than the {limits.max_total_bytes / MB:g} MB limit")
+    media_type, options = parse_options_header(content_type)
+    if media_type != b"multipart/form-data" or not options.get(b"boundary"):
+        raise ValueError("Expected a multipart/form-data body")
+    
+    receiver = _MultipartReceiver(limits)
+    parser = MultipartParser(options[b"boundary"], receiver.callbacks())
+    try:
+        async for block in body:
+            # Parsing is cheap, but a spool past spool_memory_bytes writes to disk
+            await run_in_threadpool(parser.write, block)
+        parser.finalize()
+        if receiver.spool is not None:
+            raise ValueError(f"Upload of {receiver.spool.filename} ended before the file was complete")
+    except BaseException:
+        receiver.discard()
+        raise
+    return receiver.uploads
@@ -1,17 +1,70 @@
+import asyncio
+import json
+import time
+import uuid
+from contextlib import asynccontextmanager
 from typing import List
 
-from fastapi import FastAPI, UploadFile, File
+from fastapi import FastAPI, Request, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+from agent import (
+    AgentRegistry,
+    ResponseCache,
+    SessionManager,
+    ToolCallMemo,
+    get_budget_stats,
+    get_router_stats,
+    stream_agent_events,
+    to_sse,
+    tools_used,
+    ttft_tracker,
+    stream_total_tracker,
+)
+from core import (
+    UploadTooLarge,
+    UpstreamUnavailable,
+    get_tracer,
+    get_upstream_scheduler,
+    load_config,
+    logger,
+    run_in_threadpool,
+    trace_callbacks,
+    upstream_lane,
+)
+from core.state import RateLimitMiddleware
+from core.tracing import TracingMiddleware
+from ingestion import DataIngestion, IngestionJobManager, get_document_manifest, receive_multipart
+from models import QuestionRequest, BatchQuestionRequest
+from tools import get_tool_cache
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build the agent once at startup and share it for the app's lifetime."""
+    app.state.sessions = SessionManager()
+    app.state.agent_registry = AgentRegistry(checkpointer=app.state.sessions.checkpointer)
+    app.state.response_cache = ResponseCache()
+    app.state.ingestion_jobs = IngestionJobManager()
+    # Documents stored before BM25 was enabled
+    app.state.ingestion_jobs.backfill_keyword_index()
+    app.state.batch_settings = load_config().get("batch", {})
+    try:
+        await app.state.agent_registry.aget_agent()
+    except Exception as e:
+        # Keep serving /health; the registry retries the build on first query
+        logger.error(f"Agent warm-up failed: {e}")
+    yield
+    app.state.ingestion_jobs.shutdown()
+    app.state.agent_registry.close()
 
-from agent import TradingAgent
-from ingestion import DataIngestion
-from models import QuestionRequest
 
 app = FastAPI(
     title="StockSage AI",
     description="Intelligent stock market AI chatbot",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -20,39 +73,348 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
+app.add_middleware(TracingMiddleware)
+app.add_middleware(RateLimitMiddleware, path_prefix="/query")
+
 
 
-@app.post("/upload", summary="Upload documents to knowledge base")
-async def upload_files(files: List[UploadFile] = File(...)):
-    """Upload PDF or DOCX files to create the stock market knowledge base."""
+def _run_config(http_request: Request, session_id: str) -> dict:
+    """Graph config for one run: the session's checkpointer thread plus tracing callbacks."""
+    config = http_request.app.state.sessions.graph_config(session_id)
+    config["callbacks"] = trace_callbacks()
+    return config
+
+
+@app.post("/upload", summary="Upload documents to knowledge base", status_code=202)
+async def upload_files(http_request: Request, files: List[UploadFile] = File(...)):
+    """Upload PDF or DOCX files; ingestion runs in the background. Poll /jobs/{job_id} for progress."""
+    try:
+        job = await run_in_threadpool(http_request.app.state.ingestion_jobs.submit, files)
+        return {"message": "Files queued for processing.", "job_id": job.job_id, "status": job.status}
+    except UploadTooLarge as e:
+        return JSONResponse(status_code=413, content={"error": str(e)})
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+@app.post("/upload/stream", summary="Stream documents to the knowledge base", status_code=202)
+async def upload_stream(http_request: Request):
+    """Like /upload, but the multipart body is parsed as it arrives and each file written once, straight to its spool.
+    
+    Size limits (``ingestion.uploads``) are checked as bytes arrive, so an
+    oversized upload is refused with 413 without being stored first.
+    """
+    jobs = http_request.app.state.ingestion_jobs
+    content_length = http_request.headers.get("content-length")
     try:
-        ingestion = DataIngestion()
-        ingestion.run_pipeline(files)
-        return {"message": "Files successfully processed and stored."}
+        spooled = await receive_multipart(
+            http_request.headers.get("content-type", ""),
+            http_request.stream(),
+            jobs.limits,
+            int(content_length) if content_length else None,
+        )
+        job = await run_in_threadpool(jobs.submit_spooled, spooled)
+        return {"message": "Files queued for processing.", "job_id": job.job_id, "status": job.status}
+    except UploadTooLarge as e:
+        return JSONResponse(status_code=413, content={"error": str(e)})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
 
+@app.get("/jobs", summary="List ingestion jobs")
+async def list_jobs(http_request: Request):
+    """List recent ingestion jobs and their progress."""
+    jobs = http_request.app.state.ingestion_jobs
+    return {"jobs": await run_in_threadpool(jobs.statuses)}
+
+
+@app.get("/jobs/{job_id}", summary="Ingestion job progress")
+async def get_job(job_id: str, http_request: Request):
+    """Report files parsed, chunks embedded, vectors upserted and throughput for a job."""
+    job = await run_in_threadpool(http_request.app.state.ingestion_jobs.status, job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": f"Job not found: {job_id}"})
+    return job
+
+
+@app.delete("/jobs/{job_id}", summary="Cancel an ingestion job")
+async def cancel_job(job_id: str, http_request: Request):
+    """Cancel a job; vectors it already wrote are removed."""
+    job = await run_in_threadpool(http_request.app.state.ingestion_jobs.cancel, job_id)
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": f"Job not found: {job_id}"})
+    return job
+
+
+@app.get("/documents", summary="List ingested documents")
+async def list_documents():
+    """Documents in the knowledge base with their current version, file hash and chunk count."""
+    return {"documents": await run_in_threadpool(get_document_manifest().list)}
+
+
+@app.get("/documents/{document_id}", summary="Ingested document details")
+async def get_document(document_id: str):
+    document = await run_in_threadpool(get_document_manifest().get, document_id)
+    if document is None:
+        return JSONResponse(status_code=404, content={"error": f"Document not found: {document_id}"})
+    return document
+
+
+@app.delete("/documents/{document_id}", summary="Remove a document from the knowledge base")
+async def delete_document(document_id: str, http_request: Request):
+    """Delete a document's chunks (those no other document shares) and its manifest entry."""
+    try:
+        document = await run_in_threadpool(lambda: DataIngestion().delete_document(document_id))
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+    if document is None:
+        return JSONResponse(status_code=404, content={"error": f"Document not found: {document_id}"})
+    # Cached answers may quote the removed document
+    document["cached_answers_dropped"] = await run_in_threadpool(
+        http_request.app.state.response_cache.invalidate_tool, "retriever_tool"
+    )
+    return document
+
+
+async def _lookup_cache(http_request: Request, request: QuestionRequest, session_id: str):
+    """Check the response cache, unless the question follows earlier turns of the session."""
+    if request.session_id and await http_request.app.state.sessions.has_history(session_id):
+        return None, None, False
+    answer, embedding = await http_request.app.state.response_cache.lookup(request.question)
+    return answer, embedding, True
+
+
+async def _finish_turn(http_request: Request, graph, session_id: str, started: float) -> dict:
+    """Record token counts and latency for the session's latest turn."""
+    sessions = http_request.app.state.sessions
+    state = await graph.aget_state(sessions.graph_config(session_id))
+    return await sessions.arecord_turn(
+        session_id,
+        state.values.get("messages", []),
+        state.values.get("summary", ""),
+        (time.perf_counter() - started) * 1000,
+    )
+
+
+def _upstream_unavailable(e: UpstreamUnavailable) -> JSONResponse:
+    """503 with Retry-After when a provider's circuit is open or its queue is backed up."""
+    return JSONResponse(
+        status_code=503,
+        content={"error": str(e), "provider": e.provider},
+        headers={"Retry-After": str(max(1, round(e.retry_after)))},
+    )
+
+
 @app.post("/query", summary="Query the trading assistant")
-async def query_chatbot(request: QuestionRequest):
-    """Send a question to the StockSage AI trading assistant."""
+async def query_chatbot(request: QuestionRequest, http_request: Request):
+    """Send a question to the StockSage AI trading assistant; pass session_id to continue a conversation."""
     try:
-        agent = TradingAgent()
-        agent.build()
-        graph = agent.get_graph()
+        started = time.perf_counter()
+        sessions = http_request.app.state.sessions
+        session_id = await sessions.aopen(request.session_id)
+        
+        cache = http_request.app.state.response_cache
+        cached_answer, embedding, cacheable = await _lookup_cache(http_request, request, session_id)
+        if cached_answer is not None:
+            return {"answer": cached_answer, "cached": True, "session_id": session_id}
+        
+        graph = await http_request.app.state.agent_registry.aget_graph()
         
         messages = {"messages": [request.question]}
-        result = graph.invoke(messages)
+        result = await graph.ainvoke(messages, _run_config(http_request, session_id))
         
         # Extract the final response
         if isinstance(result, dict) and "messages" in result:
             final_output = result["messages"][-1].content
+            if cacheable:
+                await cache.astore(request.question, final_output, tools_used(result["messages"]), embedding)
         else:
             final_output = str(result)
         
-        return {"answer": final_output}
-        
+        turn = await _finish_turn(http_request, graph, session_id, started)
+        return {"answer": final_output, "cached": False, "session_id": session_id, "turn": turn}
+    
+    except UpstreamUnavailable as e:
+        return _upstream_unavailable(e)
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+
+
+@app.post("/query/stream", summary="Stream the trading assistant's answer")
+async def query_chatbot_stream(request: QuestionRequest, http_request: Request):
+    """Stream tokens, tool-call events and the final answer as Server-Sent Events."""
+    try:
+        graph = await http_request.app.state.agent_registry.aget_graph()
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+    cache = http_request.app.state.response_cache
+    sessions = http_request.app.state.sessions
+    session_id = await sessions.aopen(request.session_id)
+    
+    async def event_stream():
+        try:
+            started = time.perf_counter()
+            cached_answer, embedding, cacheable = await _lookup_cache(http_request, request, session_id)
+            if cached_answer is not None:
+                yield to_sse({"type": "final", "answer": cached_answer, "cached": True, "session_id": session_id})
+                return
+            
+            inputs = {"messages": [request.question]}
+            async for event in stream_agent_events(graph, inputs, _run_config(http_request, session_id)):
+                if event["type"] == "final":
+                    if cacheable:
+                        await cache.astore(request.question, event["answer"], event["tools"], embedding)
+                    event["session_id"] = session_id
+                    event["turn"] = await _finish_turn(http_request, graph, session_id, started)
+                yield to_sse(event)
+        except UpstreamUnavailable as e:
+            yield to_sse({"type": "error", "error": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            yield to_sse({"type": "error", "error": str(e)})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/query/batch", summary="Answer many questions in one request")
+async def query_batch(request: BatchQuestionRequest, http_request: Request):
+    """Run questions through the shared graph with bounded concurrency.
+    
+    Streams one NDJSON line per question in completion order (index, answer or
+    error, queue and run time), then a summary line. Identical tool calls made
+    by different questions in the batch are executed once.
+    """
+    settings = http_request.app.state.batch_settings
+    max_questions = settings.get("max_questions", 500)
+    if len(request.questions) > max_questions:
+        return JSONResponse(status_code=413, content={"error": f"At most {max_questions} questions per batch"})
+    try:
+        graph = await http_request.app.state.agent_registry.aget_graph()
+    except Exception as e:
+        return JSONResponse(status_code=500, content={"error": str(e)})
+    
+    cache = http_request.app.state.response_cache
+    sessions = http_request.app.state.sessions
+    memo = ToolCallMemo()
+    max_concurrency = settings.get("max_concurrency", 8)
+    semaphore = asyncio.Semaphore(min(request.max_concurrency or max_concurrency, max_concurrency))
+    batch_started = time.perf_counter()
+    
+    async def answer(index: int, question: str) -> dict:
+        queued = time.perf_counter()
+        async with semaphore:
+            started = time.perf_counter()
+            item = {"type": "result", "index": index, "question": question, "cached": False}
+            # Items are stateless: each runs on a throwaway checkpointer thread
+            thread_id = f"batch-{uuid.uuid4().hex}"
+            try:
+                # Batch work queues behind interactive queries for provider capacity
+                with upstream_lane("batch"):
+                    cached_answer, embedding = await cache.lookup(question)
+                    if cached_answer is not None:
+                        item.update(answer=cached_answer, cached=True)
+                    else:
+                        config = _run_config(http_request, thread_id)
+                        config["configurable"]["tool_memo"] = memo
+                        result = await graph.ainvoke({"messages": [question]}, config)
+                        item["answer"] = result["messages"][-1].content
+                        await cache.astore(question, item["answer"], tools_used(result["messages"]), embedding)
+            except Exception as e:
+                item["error"] = str(e)
+            finally:
+                await sessions.checkpointer.adelete_thread(thread_id)
+            item["queued_ms"] = round((started - queued) * 1000, 2)
+            item["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            return item
+    
+    async def ndjson_stream():
+        tasks = [asyncio.ensure_future(answer(i, question)) for i, question in enumerate(request.questions)]
+        errors = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item = await next_done
+                errors += "error" in item
+                yield json.dumps(item, default=str) + "\n"
+            yield json.dumps({
+                "type": "summary",
+                "count": len(tasks),
+                "errors": errors,
+                "elapsed_ms": round((time.perf_counter() - batch_started) * 1000, 2),
+                "tool_calls": memo.get_stats(),
+            }) + "\n"
+        finally:
+            # Client went away: stop the questions that haven't finished
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+
+@app.get("/sessions/{session_id}", summary="Conversation session details")
+async def get_session(session_id: str, http_request: Request):
+    """Per-turn token counts and latency for a session, plus its current summary."""
+    sessions = http_request.app.state.sessions
+    turns = await sessions.aturns(session_id)
+    if turns is None:
+        return JSONResponse(status_code=404, content={"error": f"Session not found: {session_id}"})
+    graph = await http_request.app.state.agent_registry.aget_graph()
+    state = await graph.aget_state(sessions.graph_config(session_id))
+    return {
+        "session_id": session_id,
+        "turns": turns,
+        "messages": len(state.values.get("messages", [])),
+        "summary": state.values.get("summary", ""),
+    }
+
+
+@app.delete("/sessions/{session_id}", summary="End a conversation session")
+async def delete_session(session_id: str, http_request: Request):
+    """Drop a session's history."""
+    await http_request.app.state.sessions.delete(session_id)
+    return {"message": "Session deleted.", "session_id": session_id}
+
+
+@app.get("/stats", summary="Runtime statistics")
+async def stats(http_request: Request):
+    """Response and tool cache counters and latency statistics."""
+    
+    def collect() -> dict:
+        return {
+            "response_cache": http_request.app.state.response_cache.get_stats(),
+            "tool_cache": get_tool_cache().get_stats(),
+            "sessions": http_request.app.state.sessions.get_stats(),
+            "context_budget": get_budget_stats(),
+            "router": get_router_stats(),
+            "upstream": get_upstream_scheduler().get_stats(),
+            "streaming": {
+                "time_to_first_token": ttft_tracker.summary(),
+                "total": stream_total_tracker.summary(),
+            },
+        }
+    
+    # Store sizes are read from the shared store, if there is one
+    return await run_in_threadpool(collect)
+
+
+@app.get("/metrics", summary="Prometheus metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Span latency histograms, error counts and LLM token counts in the Prometheus text format."""
+    return PlainTextResponse(get_tracer().render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.post("/agent/reload", summary="Rebuild the trading agent")
+async def reload_agent(http_request: Request):
+    """Rebuild the shared agent (LLM clients and graph) from the current config."""
+    try:
+        await http_request.app.state.agent_registry.arebuild()
+        return {"message": "Agent rebuilt.", "builds": http_request.app.state.agent_registry.build_count}
     except Exception as e:
         return JSONResponse(status_code=500, content={"error": str(e)})
 
@@ -1,3 +1,17 @@
-from models.schemas import QuestionRequest, RagToolInput
+from models.schemas import (
+    QuestionRequest,
+    BatchQuestionRequest,
+    RagToolInput,
+    WebSearchInput,
+    FinancialsInput,
+    FinancialAnalyticsInput,
+)
 
-__all__ = ["QuestionRequest", "RagToolInput"]
+__all__ = [
+    "QuestionRequest",
+    "BatchQuestionRequest",
+    "RagToolInput",
+    "WebSearchInput",
+    "FinancialsInput",
+    "FinancialAnalyticsInput",
+]
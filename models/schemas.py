@@ -1,11 +1,50 @@
-from pydantic import BaseModel
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field
 
 
 class QuestionRequest(BaseModel):
     """Request model for chat queries."""
     question: str
+    session_id: Optional[str] = None  # continue a conversation; omitted starts a new one
+
+
+class BatchQuestionRequest(BaseModel):
+    """Request model for bulk queries; each question is answered independently."""
+    questions: List[str] = Field(min_length=1)
+    max_concurrency: Optional[int] = Field(None, ge=1)  # capped by batch.max_concurrency in config
 
 
 class RagToolInput(BaseModel):
     """Input schema for the RAG retriever tool."""
     question: str
+
+
+class WebSearchInput(BaseModel):
+    """Input schema for the web search tool."""
+    query: str = Field(description="search query to look up")
+
+
+class FinancialsInput(BaseModel):
+    """Input schema for the Polygon financials tool."""
+    query: str = Field(description="The ticker symbol to fetch financials for.")
+
+
+class FinancialAnalyticsInput(BaseModel):
+    """Input schema for the financial analytics tool."""
+    tickers: List[str] = Field(description="Ticker symbols to analyze or compare, e.g. ['NVDA', 'AMD', 'INTC'].")
+    metrics: List[str] = Field(
+        default=["revenue", "net_margin"],
+        description="Statement items (revenue, gross_profit, operating_income, net_income, eps, assets, "
+                    "current_assets, liabilities, current_liabilities, equity, operating_cash_flow) or ratios "
+                    "(gross_margin, operating_margin, net_margin, roe, debt_to_equity, current_ratio, cash_conversion).",
+    )
+    quarters: int = Field(default=4, description="How many recent quarters to average over or list.")
+    view: Literal["summary", "series"] = Field(
+        default="summary",
+        description="summary: latest value, average and year-over-year change per ticker; series: value per quarter.",
+    )
+    sort_by: Optional[str] = Field(
+        default=None,
+        description="Rank tickers on this summary column, highest first, e.g. 'net_margin', 'net_margin_avg' or 'revenue_yoy'.",
+    )
@@ -1,11 +1,34 @@
-import sys
+import json
+import time
+import uuid
 import requests
 import streamlit as st
 
-from core import StockSageException
+# The UI only talks to the API over HTTP; it deliberately imports nothing from the backend
 
 BASE_URL = "http://localhost:8000"
 
+
+def iter_sse_events(response):
+    """Yield decoded event payloads from a Server-Sent Events response."""
+    for line in response.iter_lines(decode_unicode=True):
+        if line and line.startswith("data: "):
+            yield json.loads(line[len("data: "):])
+
+
+def iter_multipart(files, boundary: str, block_size: int = 1024 * 1024):
+    """Yield a multipart/form-data body for uploaded files block by block, without copying whole files."""
+    for f in files:
+        filename = f.name.replace('"', "%22")
+        yield (f'--{boundary}\r\nContent-Disposition: form-data; name="files"; filename="{filename}"\r\n'
+               f'Content-Type: {f.type or "application/octet-stream"}\r\n\r\n').encode("utf-8")
+        f.seek(0)
+        while block := f.read(block_size):
+            yield block
+        yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode("utf-8")
+
+
 # Page config
 st.set_page_config(
     page_title="StockSage AI",
@@ -38,9 +61,31 @@ st.markdown("""
 st.title("📈 StockSage AI")
 st.caption("Your intelligent stock market assistant")
 
-# Initialize chat history
+def poll_ingestion_job(job_id: str, interval: float = 1.0) -> dict:
+    """Poll an ingestion job, showing progress, until it finishes."""
+    progress_bar = st.progress(0.0, text="Queued...")
+    details = st.empty()
+    while True:
+        job = requests.get(f"{BASE_URL}/jobs/{job_id}", timeout=10).json()
+        files_total = max(job["files_total"], 1)
+        progress_bar.progress(
+            min(job["files_parsed"] / files_total, 1.0),
+            text=f"{job['status'].capitalize()}: {job['files_parsed']}/{job['files_total']} files parsed",
+        )
+        details.caption(
+            f"{job['chunks']} chunks · {job['vectors_upserted']} vectors upserted · "
+            f"{job['chunks_per_second']} chunks/s"
+        )
+        if job["status"] in ("completed", "failed", "cancelled"):
+            return job
+        time.sleep(interval)
+
+
+# Initialize chat history; the backend keeps the conversation under session_id
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "session_id" not in st.session_state:
+    st.session_state.session_id = None
 
 # Sidebar: Document Upload
 with st.sidebar:
@@ -56,25 +101,36 @@ with st.sidebar:
     
     if st.button("📤 Upload & Process", use_container_width=True):
         if uploaded_files:
-            files = []
-            for f in uploaded_files:
-                file_data = f.read()
-                if file_data:
-                    files.append(("files", (f.name, file_data, f.type)))
+            files = [f for f in uploaded_files if f.size]
             
             if files:
                 try:
-                    with st.spinner("Processing documents..."):
-                        response = requests.post(f"{BASE_URL}/upload", files=files)
-                        
-                    if response.status_code == 200:
-                        st.success("✅ Documents processed successfully!")
+                    with st.spinner("Uploading documents..."):
+                        # Streamed (chunked) to /upload/stream, which spools each file as it arrives
+                        boundary = uuid.uuid4().hex
+                        response = requests.post(
+                            f"{BASE_URL}/upload/stream",
+                            data=iter_multipart(files, boundary),
+                            headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+                            timeout=60,
+                        )
+                    
+                    if response.status_code == 413:
+                        st.error(f"❌ Too large: {response.json().get('error')}")
+                    elif response.status_code in (200, 202):
+                        job = poll_ingestion_job(response.json()["job_id"])
+                        if job["status"] == "completed":
+                            st.success(f"✅ Documents processed: {job['vectors_upserted']} new chunks stored.")
+                        elif job["status"] == "cancelled":
+                            st.warning("⚠️ Processing was cancelled.")
+                        else:
+                            st.error(f"❌ Error: {job.get('error')}")
                     else:
                         st.error(f"❌ Error: {response.text}")
                 except requests.ConnectionError:
                     st.error("❌ Cannot connect to backend. Is the server running?")
                 except Exception as e:
-                    raise StockSageException(e, sys)
+                    st.exception(e)
             else:
                 st.warning("⚠️ Files appear to be empty.")
         else:
@@ -83,6 +139,16 @@ with st.sidebar:
     st.divider()
     st.markdown("### 🔧 Settings")
     st.caption(f"Backend: `{BASE_URL}`")
+    
+    if st.button("🆕 New conversation", use_container_width=True):
+        if st.session_state.session_id:
+            try:
+                requests.delete(f"{BASE_URL}/sessions/{st.session_state.session_id}", timeout=10)
+            except requests.RequestException:
+                pass  # the server evicts idle sessions on its own
+        st.session_state.messages = []
+        st.session_state.session_id = None
+        st.rerun()
 
 # Display chat history
 st.header("💬 Chat")
@@ -103,27 +169,48 @@ if prompt := st.chat_input("Ask about stocks, trading strategies, market analysi
     with st.chat_message("user"):
         st.write(prompt)
     
-    # Get bot response
+    # Stream bot response
     with st.chat_message("assistant"):
-        with st.spinner("Analyzing..."):
-            try:
-                response = requests.post(
-                    f"{BASE_URL}/query",
-                    json={"question": prompt},
-                    timeout=60
-                )
-                
-                if response.status_code == 200:
-                    answer = response.json().get("answer", "No response received.")
-                    st.write(answer)
-                    st.session_state.messages.append({"role": "assistant", "content": answer})
+        status = st.empty()
+        placeholder = st.empty()
+        status.caption("Analyzing...")
+        try:
+            answer = ""
+            with requests.post(
+                f"{BASE_URL}/query/stream",
+                json={"question": prompt, "session_id": st.session_state.session_id},
+                stream=True,
+                timeout=(10, 60),
+            ) as response:
+                if response.status_code != 200:
+                    st.error(f"Error: {response.text}")
                 else:
-                    error_msg = f"Error: {response.text}"
-                    st.error(error_msg)
+                    for event in iter_sse_events(response):
+                        if event["type"] == "token":
+                            answer += event["content"]
+                            placeholder.markdown(answer + "▌")
+                        elif event["type"] == "tool_start":
+                            status.caption(f"🔧 Using `{event['name']}`...")
+                        elif event["type"] == "tool_end":
+                            status.caption(f"✅ `{event['name']}` finished")
+                        elif event["type"] == "final":
+                            answer = event["answer"] or answer
+                            st.session_state.session_id = event.get("session_id") or st.session_state.session_id
+                            if event.get("cached"):
+                                status.caption("⚡ Answered from cache")
+                            elif event.get("ttft_ms") is not None:
+                                status.caption(f"First token in {event['ttft_ms'] / 1000:.1f}s · "
+                                               f"total {event['total_ms'] / 1000:.1f}s")
+                        elif event["type"] == "error":
+                            st.error(f"Error: {event['error']}")
                     
-            except requests.ConnectionError:
-                st.error("❌ Cannot connect to backend. Please ensure the server is running.")
-            except requests.Timeout:
-                st.error("❌ Request timed out. The query may be too complex.")
-            except Exception as e:
-                raise StockSageException(e, sys)
+                    if answer:
+                        placeholder.markdown(answer)
+                        st.session_state.messages.append({"role": "assistant", "content": answer})
+        
+        except requests.ConnectionError:
+            st.error("❌ Cannot connect to backend. Please ensure the server is running.")
+        except requests.Timeout:
+            st.error("❌ Request timed out. The query may be too complex.")
+        except Exception as e:
+            st.exception(e)
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from tools.fakes import fake_statements
+from tools.financial_analytics import metric_values, quarter_cube, summary_table
+from tools.financials_store import FinancialsStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = FinancialsStore(tmp_path)
+    # Eight quarters, 2024Q4 back to 2023Q1, without 2024Q2
+    results = [result for result in fake_statements("AAPL", 8)
+               if (result["fiscal_year"], result["fiscal_period"]) != ("2024", "Q2")]
+    store.upsert({"AAPL": results})
+    return store, {(result["fiscal_year"], result["fiscal_period"]): result for result in results}
+
+
+def revenue(result):
+    return result["financials"]["income_statement"]["revenues"]["value"]
+
+
+def test_missing_quarter_leaves_a_gap_in_the_cube(store):
+    store, results = store
+    cube, latest = quarter_cube(store.table(), ["AAPL"], 5)
+    values = metric_values(cube, "revenue")[0]
+    assert latest[0] == 2024 * 4 + 3
+    assert np.isnan(values[2])
+    assert values[4] == revenue(results[("2023", "Q4")])
+
+
+def test_year_over_year_compares_the_same_quarter_despite_a_gap(store):
+    store, results = store
+    table = summary_table(store.table(), ["AAPL"], ["revenue"], 4)
+    cells = dict(zip(*(line.split(" | ") for line in table.splitlines())))
+    latest, year_ago = revenue(results[("2024", "Q4")]), revenue(results[("2023", "Q4")])
+    average = np.mean([revenue(results[period]) for period in [("2024", "Q4"), ("2024", "Q3"), ("2024", "Q1")]])
+    assert cells["revenue_yoy"] == f"{(latest - year_ago) / abs(year_ago) * 100:+.1f}%"
+    assert cells["revenue_avg4q"] == f"{average / 1e9:.2f}B"
@@ -0,0 +1,19 @@
+import numpy as np
+
+from tools.fakes import fake_statements
+from tools.financials_store import FinancialsStore
+
+
+def test_writers_sharing_a_path_keep_each_others_tickers(tmp_path):
+    # Two stores on one path stand in for two worker processes
+    first, second = FinancialsStore(tmp_path), FinancialsStore(tmp_path)
+    first.upsert({"AAPL": fake_statements("AAPL", 8)})
+    second.upsert({"MSFT": fake_statements("MSFT", 8)})
+    
+    reopened = FinancialsStore(tmp_path)
+    table = reopened.table()
+    assert reopened.tickers() == ["AAPL", "MSFT"]
+    assert sorted(set(table.tickers)) == ["AAPL", "MSFT"]
+    assert table.values.shape == (len(table.periods), second.table().values.shape[1])
+    np.testing.assert_array_equal(table.values, second.table().values)
+    assert len(list(tmp_path.glob("generation-*"))) == 1
@@ -0,0 +1,53 @@
+import pytest
+from langchain_core.documents import Document
+
+from vectorstore.bm25 import BM25Index, tokenize
+from vectorstore.hybrid import lexical_rerank
+
+
+def rerank_scores(question, texts):
+    reranked = lexical_rerank(question, [(Document(page_content=text), 1.0) for text in texts])
+    return {document.page_content: score for document, score in reranked}
+
+
+def coverage(question, text):
+    terms = set(tokenize(question))
+    return len(terms & set(tokenize(text))) / len(terms)
+
+
+def test_common_upper_case_words_get_no_ticker_bonus():
+    question = "What did I learn about AAPL?"
+    text = "I think A CEO reporting EPS is what Q said."
+    scores = rerank_scores(question, [text])
+    assert scores[text] == pytest.approx(0.5 + 0.5 * coverage(question, text))
+
+
+def test_chunk_naming_the_ticker_ranks_first():
+    question = "What did I learn about AAPL?"
+    ticker_text = "AAPL guidance was raised."
+    word_text = "I guidance was raised."
+    scores = rerank_scores(question, [word_text, ticker_text])
+    assert scores[ticker_text] == pytest.approx(0.5 + 0.5 * coverage(question, ticker_text) + 0.2)
+    assert scores[ticker_text] > scores[word_text]
+
+
+def test_company_names_count_as_tickers():
+    text = "AAPL guidance was raised."
+    scores = rerank_scores("How is Apple doing?", [text])
+    assert scores[text] == pytest.approx(0.5 + 0.5 * coverage("How is Apple doing?", text) + 0.2)
+
+
+def test_keyword_hits_need_a_minimum_share_of_the_question(tmp_path):
+    index = BM25Index(tmp_path / "bm25.sqlite")
+    texts = {
+        "margins": "Apple's gross margin expanded on services revenue.",
+        "capital": "Working capital needs rose as inventories grew.",
+        "dividends": "The dividend yield compares the annual payout with the share price.",
+    }
+    # "capital" is a common word in a finance corpus
+    texts.update({f"note-{i}": f"Capital spending note {i} on {topic} demand."
+                  for i, topic in enumerate(["chip", "cloud", "auto", "retail", "energy", "travel"])})
+    index.add(list(texts), list(texts.values()))
+    assert "capital" in [hit[0] for hit in index.search("What is the capital of Australia?")]
+    assert index.search("What is the capital of Australia?", min_score=0.3) == []
+    assert [hit[0] for hit in index.search("How is the dividend yield computed?", min_score=0.3)] == ["dividends"]
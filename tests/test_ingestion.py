@@ -0,0 +1,65 @@
+from types import SimpleNamespace
+
+import pytest
+
+import ingestion.manifest
+import vectorstore.manager
+from benchmarks.load_test import load_test_config
+from benchmarks.stubs import CountingEmbeddings, write_text_pdf
+from core import StockSageException, config_loader
+from ingestion import DataIngestion, DocumentManifest
+from ingestion.manifest import document_id
+from vectorstore import VectorStoreManager
+
+
+def upload(path, filename):
+    with open(path, "rb") as file:
+        return DataIngestion().run_pipeline([SimpleNamespace(filename=filename, file=file)])
+
+
+def test_shared_chunks_keep_the_source_of_each_document(tmp_path, monkeypatch):
+    monkeypatch.setattr(config_loader, "CONFIG_PATH", load_test_config(tmp_path, 0.0, 0.0))
+    embeddings = CountingEmbeddings(dimension=768)
+    manager = VectorStoreManager(embeddings_factory=lambda: embeddings)
+    monkeypatch.setattr(vectorstore.manager, "_manager", manager)
+    monkeypatch.setattr(ingestion.manifest, "_manifest", DocumentManifest(tmp_path / "documents.sqlite"))
+    
+    shared = "Risk factors: rising rates compress valuation multiples across the sector."
+    write_text_pdf(str(tmp_path / "old.pdf"), [shared, "Old outlook: guidance was cut for the year."])
+    write_text_pdf(str(tmp_path / "new.pdf"), [shared, "New outlook: guidance was raised for the year."])
+    upload(tmp_path / "old.pdf", "2023_report.pdf")
+    result = upload(tmp_path / "new.pdf", "2024_report.pdf")
+    # The shared page reuses the stored vector instead of being embedded again
+    assert result["stored"] == 2 and result["embedded"] == 1
+    
+    assert DataIngestion().delete_document(document_id("2023_report.pdf"))["chunks_deleted"] == 2
+    hits = manager.get_vector_store().similarity_search(shared, k=4)
+    assert [hit.metadata["source"] for hit in hits] == ["2024_report.pdf", "2024_report.pdf"]
+    assert hits[0].page_content == shared
+
+
+class FailingEmbeddings(CountingEmbeddings):
+    """Fails on the embedding call after ``calls`` succeeded."""
+    
+    calls = 1
+    
+    def embed_documents(self, texts):
+        if not self.calls:
+            raise ConnectionError("embedding provider unavailable")
+        self.calls -= 1
+        return super().embed_documents(texts)
+
+
+def test_failed_run_deletes_the_vectors_it_wrote(tmp_path, monkeypatch):
+    overrides = {"ingestion": {"embed_batch_size": 1, "embed_concurrency": 1}}
+    monkeypatch.setattr(config_loader, "CONFIG_PATH", load_test_config(tmp_path, 0.0, 0.0, overrides))
+    embeddings = FailingEmbeddings(dimension=768)
+    manager = VectorStoreManager(embeddings_factory=lambda: embeddings)
+    monkeypatch.setattr(vectorstore.manager, "_manager", manager)
+    monkeypatch.setattr(ingestion.manifest, "_manifest", DocumentManifest(tmp_path / "documents.sqlite"))
+    
+    write_text_pdf(str(tmp_path / "report.pdf"), ["Revenue grew on services.", "Margins narrowed on costs."])
+    with pytest.raises(StockSageException):
+        upload(tmp_path / "report.pdf", "report.pdf")
+    assert embeddings.embedded == 1
+    assert len(manager.get_index()) == 0
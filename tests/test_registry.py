@@ -0,0 +1,46 @@
+import asyncio
+import threading
+
+import agent.registry
+from agent.registry import AgentRegistry
+
+
+class SlowAgent:
+    """Stands in for TradingAgent; builds after the first wait until ``release`` is set."""
+    
+    release = threading.Event()
+    building = threading.Event()
+    builds = 0
+    
+    def build(self, checkpointer=None):
+        SlowAgent.builds += 1
+        if SlowAgent.builds > 1:
+            SlowAgent.building.set()
+            SlowAgent.release.wait(5)
+    
+    def get_graph(self):
+        return self
+    
+    def close(self):
+        pass
+
+
+def test_requests_keep_the_current_agent_while_it_is_rebuilt(monkeypatch):
+    mtime = [1.0]
+    monkeypatch.setattr(agent.registry, "config_mtime", lambda: mtime[0])
+    registry = AgentRegistry(agent_factory=SlowAgent)
+    first = asyncio.run(registry.aget_agent())
+    
+    mtime[0] = 2.0
+    rebuilt = []
+    rebuilding = threading.Thread(target=lambda: rebuilt.append(registry.get_agent()))
+    rebuilding.start()
+    assert SlowAgent.building.wait(5)
+    # The config changed, but the rebuild is running elsewhere: no waiting for it
+    assert asyncio.run(registry.aget_graph()) is first
+    
+    SlowAgent.release.set()
+    rebuilding.join(5)
+    assert rebuilt[0] is not first
+    assert registry.get_agent() is rebuilt[0]
+    assert registry.build_count == 2
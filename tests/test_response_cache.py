@@ -0,0 +1,33 @@
+import asyncio
+
+from agent.cache import ResponseCache
+from core.fakes import FakeEmbeddings
+from core.state import MemoryStateStore
+
+CONFIG = {"response_cache": {"semantic": {"similarity_threshold": 0.8}}}
+CACHED = "What was Apple's total revenue in Q3 2024 compared with analyst expectations?"
+
+
+def lookup_after_storing(question: str):
+    cache = ResponseCache(CONFIG, embeddings=FakeEmbeddings(), store=MemoryStateStore())
+    
+    async def run():
+        _, embedding = await cache.lookup(CACHED)
+        cache.store(CACHED, "Q3 answer", ["polygon_financials"], embedding)
+        answer, _ = await cache.lookup(question)
+        return answer
+    
+    return asyncio.run(run())
+
+
+def test_rephrased_question_hits_the_semantic_tier():
+    assert lookup_after_storing("Compared with analyst expectations, what was Apple's total revenue in Q3 2024?") == "Q3 answer"
+
+
+def test_other_quarter_or_year_misses():
+    assert lookup_after_storing("What was Apple's total revenue in Q2 2024 compared with analyst expectations?") is None
+    assert lookup_after_storing("What was Apple's total revenue in Q3 2023 compared with analyst expectations?") is None
+
+
+def test_other_ticker_misses():
+    assert lookup_after_storing("What was Microsoft's total revenue in Q3 2024 compared with analyst expectations?") is None
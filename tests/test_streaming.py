@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+from langgraph.checkpoint.memory import MemorySaver
+
+from agent.streaming import stream_agent_events
+from agent.workflow import TradingAgent
+from benchmarks.load_test import load_test_config
+from core import config_loader
+
+
+@pytest.fixture
+def fake_config(tmp_path, monkeypatch):
+    # A two-message window, so every follow-up turn folds the previous one into a summary
+    path = load_test_config(tmp_path, llm_latency=0.0, tool_latency=0.0, overrides={
+        "sessions": {"max_messages": 2, "summarize": True},
+        "router": {"enabled": False},
+        "context_budget": {"enabled": False},
+        "tools": {"cache": {"enabled": False}},
+        "logging": {"format": "text"},
+    })
+    monkeypatch.setattr(config_loader, "CONFIG_PATH", path)
+    return path
+
+
+async def stream_turn(graph, question: str, config: dict):
+    tokens, final = [], None
+    async for event in stream_agent_events(graph, {"messages": [question]}, config):
+        if event["type"] == "token":
+            tokens.append(event["content"])
+        elif event["type"] == "final":
+            final = event
+    return "".join(tokens), final
+
+
+def test_compacting_turn_streams_only_the_answer(fake_config):
+    agent = TradingAgent()
+    agent.build(checkpointer=MemorySaver())
+    graph = agent.get_graph()
+    config = {"configurable": {"thread_id": "session"}}
+    
+    async def conversation():
+        first = await stream_turn(graph, "What is the outlook for semiconductors?", config)
+        second = await stream_turn(graph, "And what about the risks?", config)
+        state = await graph.aget_state(config)
+        return first, second, state.values.get("summary")
+    
+    try:
+        (first_text, first), (second_text, second), summary = asyncio.run(conversation())
+    finally:
+        agent.close()
+    
+    assert summary, "the second turn should have compacted the first"
+    assert first_text == first["answer"]
+    assert second_text == second["answer"]
+    assert second["ttft_ms"] is not None
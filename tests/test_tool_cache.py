@@ -0,0 +1,28 @@
+import asyncio
+
+from core.state import MemoryStateStore
+from tools.tool_cache import ToolResultCache
+
+CONFIG = {"tools": {"cache": {"enabled": True}}}
+
+
+def test_follower_outlives_a_leader_that_times_out():
+    cache = ToolResultCache(CONFIG, store=MemoryStateStore())
+    fetches = []
+    
+    async def fetch():
+        fetches.append(1)
+        await asyncio.sleep(0.2)
+        return "AAPL financials"
+    
+    async def calls():
+        leader = asyncio.ensure_future(asyncio.wait_for(cache.acall("polygon_financials", {"query": "AAPL"}, fetch), 0.05))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(asyncio.wait_for(cache.acall("polygon_financials", {"query": "AAPL"}, fetch), 1.0))
+        return await asyncio.gather(leader, follower, return_exceptions=True)
+    
+    leader, follower = asyncio.run(calls())
+    assert isinstance(leader, asyncio.TimeoutError)
+    assert follower == "AAPL financials"
+    assert len(fetches) == 1
+    assert cache.get(cache.key("polygon_financials", {"query": "AAPL"})) == (True, "AAPL financials")
@@ -0,0 +1,20 @@
+from langchain_core.messages import AIMessage
+from langchain_core.tools import StructuredTool
+
+from agent.tool_executor import ParallelToolExecutor
+
+
+def quote(ticker: str) -> str:
+    """Latest price of ``ticker``."""
+    return f"{ticker}: 100"
+
+
+def test_calls_after_shutdown_fail_without_a_new_pool():
+    executor = ParallelToolExecutor([StructuredTool.from_function(quote)], settings={})
+    state = {"messages": [AIMessage(content="", tool_calls=[{"name": "quote", "args": {"ticker": "AAPL"}, "id": "1"}])]}
+    assert executor.invoke(state)["messages"][0].content == "AAPL: 100"
+    
+    executor.shutdown()
+    message = executor.invoke(state)["messages"][0]
+    assert message.status == "error" and "shut down" in message.content
+    assert executor._executor is None
@@ -1,3 +1,13 @@
-from tools.trading_tools import retriever_tool, financials_tool, tavily_tool, all_tools
+from tools.trading_tools import retriever_tool, financials_tool, tavily_tool, analytics_tool, all_tools
+from tools.tool_cache import ToolResultCache, cached_tool, get_tool_cache
 
-__all__ = ["retriever_tool", "financials_tool", "tavily_tool", "all_tools"]
+__all__ = [
+    "retriever_tool",
+    "financials_tool",
+    "tavily_tool",
+    "analytics_tool",
+    "all_tools",
+    "ToolResultCache",
+    "cached_tool",
+    "get_tool_cache",
+]
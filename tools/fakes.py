@@ -0,0 +1,96 @@
+"""Offline stand-ins for the Tavily and Polygon tools, selected with ``tools.backend: fake``."""
+import asyncio
+import hashlib
+import json
+import random
+import time
+
+from langchain_core.tools import StructuredTool
+
+
+def _rng(*parts: str) -> random.Random:
+    return random.Random(hashlib.sha1("\0".join(parts).encode("utf-8")).hexdigest())
+
+
+def _search(query: str) -> list:
+    rng = _rng("search", query)
+    return [
+        {
+            "url": f"https://news.example.com/{hashlib.sha1(f'{query}{i}'.encode()).hexdigest()[:10]}",
+            "content": f"Result {i + 1} for '{query}': shares moved {rng.uniform(-5, 5):+.2f}% "
+                       f"on volume of {rng.randint(1, 90)}M as analysts revisited guidance.",
+        }
+        for i in range(5)
+    ]
+
+
+def fake_statements(ticker: str, quarters: int = 4) -> list:
+    """Polygon-shaped quarterly statements (``/vX/reference/financials`` results), newest first."""
+    rng = _rng("financials", ticker.upper())
+    revenue = rng.uniform(1e9, 1e11)
+    periods = []
+    for quarter in range(quarters):
+        revenue *= rng.uniform(0.95, 1.1)
+        net_income = revenue * rng.uniform(0.05, 0.3)
+        assets = revenue * rng.uniform(2, 5)
+        liabilities = revenue * rng.uniform(1, 3)
+        equity = revenue * rng.uniform(0.5, 2)
+        detail = _rng("statements", ticker.upper(), str(quarter))
+        gross_profit = revenue * detail.uniform(0.3, 0.75)
+        operating_income = net_income * detail.uniform(1.1, 1.4)
+        year, number = 2024 - quarter // 4, 4 - quarter % 4
+        periods.append({
+            "tickers": [ticker.upper()],
+            "fiscal_period": f"Q{number}",
+            "fiscal_year": str(year),
+            "timeframe": "quarterly",
+            "end_date": f"{year}-{3 * number:02d}-{30 if number in (2, 3) else 31}",
+            "financials": {
+                "income_statement": {
+                    "revenues": {"value": round(revenue), "unit": "USD"},
+                    "gross_profit": {"value": round(gross_profit), "unit": "USD"},
+                    "operating_income_loss": {"value": round(operating_income), "unit": "USD"},
+                    "net_income_loss": {"value": round(net_income), "unit": "USD"},
+                    "diluted_earnings_per_share": {"value": round(net_income / 1.5e9, 2), "unit": "USD / shares"},
+                },
+                "balance_sheet": {
+                    "assets": {"value": round(assets), "unit": "USD"},
+                    "current_assets": {"value": round(assets * detail.uniform(0.2, 0.5)), "unit": "USD"},
+                    "liabilities": {"value": round(liabilities), "unit": "USD"},
+                    "current_liabilities": {"value": round(liabilities * detail.uniform(0.2, 0.5)), "unit": "USD"},
+                    "equity": {"value": round(equity), "unit": "USD"},
+                },
+                "cash_flow_statement": {
+                    "net_cash_flow_from_operating_activities": {
+                        "value": round(net_income * detail.uniform(0.8, 1.6)), "unit": "USD",
+                    },
+                },
+            },
+        })
+    return periods
+
+
+def _financials(ticker: str) -> str:
+    return json.dumps(fake_statements(ticker))
+
+
+def _fake_tool(name: str, description: str, fn, latency: float) -> StructuredTool:
+    def run(query: str):
+        time.sleep(latency)
+        return fn(query)
+    
+    async def arun(query: str):
+        await asyncio.sleep(latency)
+        return fn(query)
+    
+    return StructuredTool.from_function(func=run, coroutine=arun, name=name, description=description)
+
+
+def fake_search_tool(description: str, latency: float = 0.3) -> StructuredTool:
+    """``web_search`` returning Tavily-shaped deterministic results."""
+    return _fake_tool("web_search", description, _search, latency)
+
+
+def fake_financials_tool(description: str, latency: float = 0.3) -> StructuredTool:
+    """``polygon_financials`` returning Polygon-shaped deterministic quarterly financials."""
+    return _fake_tool("polygon_financials", description, _financials, latency)
@@ -0,0 +1,209 @@
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core import logger
+from tools.financials_store import COLUMNS, FinancialsStore, FinancialsTable, period_label
+
+# Ratio -> (numerator, denominator)
+RATIOS = {
+    "gross_margin": ("gross_profit", "revenue"),
+    "operating_margin": ("operating_income", "revenue"),
+    "net_margin": ("net_income", "revenue"),
+    "roe": ("net_income", "equity"),
+    "debt_to_equity": ("liabilities", "equity"),
+    "current_ratio": ("current_assets", "current_liabilities"),
+    "cash_conversion": ("operating_cash_flow", "net_income"),
+}
+METRICS = COLUMNS + list(RATIOS)
+PERCENT_METRICS = {"gross_margin", "operating_margin", "net_margin", "roe"}
+MULTIPLE_METRICS = {"debt_to_equity", "current_ratio", "cash_conversion"}
+COLUMN_INDEX = {name: i for i, name in enumerate(COLUMNS)}
+
+
+def quarter_cube(table: FinancialsTable, tickers: Sequence[str], quarters: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Values as [ticker, quarter, column] (quarter 0 = each ticker's latest) and each ticker's latest period.
+    
+    Quarter ``q`` is the fiscal quarter ``q`` periods before the latest, so
+    missing quarters, including gaps in a ticker's history, are NaN; a latest
+    period of -1 means no data.
+    """
+    cube = np.full((len(tickers), quarters, len(COLUMNS)), np.nan)
+    latest = np.full(len(tickers), -1, dtype=np.int32)
+    rows = np.flatnonzero(np.isin(table.tickers, tickers))
+    if len(rows) == 0:
+        return cube, latest
+    # The store keeps each ticker's quarters contiguous, newest first: the
+    # first row of each run is the latest, and the quarter index is the
+    # distance in periods from it
+    selected = table.tickers[rows]
+    starts = np.flatnonzero(np.r_[True, selected[1:] != selected[:-1]])
+    periods = table.periods[rows]
+    position = np.repeat(periods[starts], np.diff(np.r_[starts, len(rows)])) - periods
+    order = np.argsort(tickers)
+    slot = order[np.searchsorted(np.asarray(tickers)[order], selected)]
+    keep = position < quarters
+    cube[slot[keep], position[keep]] = np.asarray(table.values[rows[keep]])
+    latest[slot[starts]] = periods[starts]
+    return cube, latest
+
+
+def metric_values(cube: np.ndarray, metric: str) -> np.ndarray:
+    """[ticker, quarter] values of a stored column or ratio."""
+    if metric not in RATIOS:
+        return cube[..., COLUMN_INDEX[metric]]
+    numerator, denominator = (cube[..., COLUMN_INDEX[name]] for name in RATIOS[metric])
+    valid = (denominator != 0) & ~np.isnan(denominator) & ~np.isnan(numerator)
+    return np.divide(numerator, denominator, out=np.full_like(numerator, np.nan), where=valid)
+
+
+def year_over_year(values: np.ndarray, metric: str) -> np.ndarray:
+    """Latest quarter vs. the same quarter a year earlier: growth for amounts, a difference for ratios."""
+    if values.shape[1] <= 4:
+        return np.full(len(values), np.nan)
+    latest, year_ago = values[:, 0], values[:, 4]
+    if metric in RATIOS:
+        return latest - year_ago
+    valid = (year_ago != 0) & ~np.isnan(year_ago)
+    return np.divide(latest - year_ago, np.abs(year_ago), out=np.full_like(latest, np.nan), where=valid)
+
+
+def _nanmean(values: np.ndarray) -> np.ndarray:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)  # all-NaN rows stay NaN
+        return np.nanmean(values, axis=1)
+
+
+def format_value(value: float, metric: str, change: bool = False) -> str:
+    if np.isnan(value):
+        return "-"
+    sign = "+" if change else ""
+    if metric in PERCENT_METRICS:
+        return f"{value * 100:{sign}.1f}{'pp' if change else '%'}"
+    if metric in MULTIPLE_METRICS:
+        return f"{value:{sign}.2f}x"
+    if change:
+        return f"{value * 100:+.1f}%"
+    if metric == "eps":
+        return f"{value:.2f}"
+    for scale, suffix in ((1e12, "T"), (1e9, "B"), (1e6, "M")):
+        if abs(value) >= scale:
+            return f"{value / scale:.2f}{suffix}"
+    return f"{value:,.0f}"
+
+
+def _render(header: List[str], rows: List[List[str]]) -> str:
+    return "\n".join(" | ".join(row) for row in [header] + rows)
+
+
+def summary_table(table: FinancialsTable, tickers: List[str], metrics: List[str], quarters: int,
+                  sort_by: Optional[str] = None) -> str:
+    """Per ticker: latest value, average over ``quarters`` and year-over-year change of each metric.
+    
+    ``sort_by`` names a result column (e.g. ``net_margin``, ``net_margin_avg``,
+    ``revenue_yoy``); rows are ranked on it, highest first.
+    """
+    cube, latest = quarter_cube(table, tickers, max(quarters, 5))
+    columns: Dict[str, Tuple[np.ndarray, str, bool]] = {}
+    for metric in metrics:
+        values = metric_values(cube, metric)
+        columns[metric] = (values[:, 0], metric, False)
+        columns[f"{metric}_avg{quarters}q"] = (_nanmean(values[:, :quarters]), metric, False)
+        columns[f"{metric}_yoy"] = (year_over_year(values, metric), metric, True)
+    
+    order = np.arange(len(tickers))
+    if sort_by:
+        # "<metric>_avg" stands for "<metric>_avg<quarters>q"
+        key = next((name for name in columns if name in (sort_by, f"{sort_by}{quarters}q")), None)
+        if key is None:
+            raise ValueError(f"Unknown sort_by column: {sort_by}")
+        # NaN sorts last in a descending ranking
+        order = np.argsort(np.nan_to_num(-columns[key][0], nan=np.inf), kind="stable")
+    
+    header = ["rank", "ticker", "latest"] + list(columns)
+    rows = []
+    for rank, i in enumerate(order, start=1):
+        label = period_label(latest[i]) if latest[i] >= 0 else "no data"
+        rows.append([str(rank), tickers[i], label] + [
+            format_value(values[i], metric, change) for values, metric, change in columns.values()
+        ])
+    return _render(header, rows)
+
+
+def series_table(table: FinancialsTable, tickers: List[str], metrics: List[str], quarters: int) -> str:
+    """Per ticker and metric: the last ``quarters`` values, newest first."""
+    cube, latest = quarter_cube(table, tickers, quarters)
+    header = ["ticker", "metric", "latest"] + [f"t-{q}" if q else "t" for q in range(quarters)]
+    rows = []
+    for metric in metrics:
+        values = metric_values(cube, metric)
+        for i, ticker in enumerate(tickers):
+            label = period_label(latest[i]) if latest[i] >= 0 else "no data"
+            rows.append([ticker, metric, label] + [format_value(value, metric) for value in values[i]])
+    return _render(header, rows)
+
+
+class FinancialAnalytics:
+    """Ratios, growth and rankings over the local financials store, as compact text tables.
+    
+    Tickers missing from the store (or older than its TTL) are fetched first
+    with ``fetch(ticker) -> Polygon financials results``, up to
+    ``fetch_concurrency`` at a time; everything after that is vectorized
+    NumPy over the memory-mapped columns.
+    """
+    
+    def __init__(self, store: FinancialsStore, fetch: Callable[[str], Optional[List[dict]]],
+                 max_tickers: int = 20, max_quarters: int = 12, fetch_concurrency: int = 4):
+        self.store = store
+        self.fetch = fetch
+        self.max_tickers = max_tickers
+        self.max_quarters = max_quarters
+        self.fetch_concurrency = fetch_concurrency
+    
+    def refresh(self, tickers: List[str]) -> Dict[str, str]:
+        """Fetch stale tickers into the store; return the errors of those that failed."""
+        stale = self.store.stale(tickers)
+        if not stale:
+            return {}
+        errors, fetched = {}, {}
+        with ThreadPoolExecutor(max_workers=min(self.fetch_concurrency, len(stale))) as pool:
+            for ticker, future in [(ticker, pool.submit(self.fetch, ticker)) for ticker in stale]:
+                try:
+                    fetched[ticker] = future.result() or []
+                except Exception as e:
+                    logger.warning(f"Could not fetch financials for {ticker}: {e}")
+                    errors[ticker] = str(e)
+        if fetched:
+            self.store.upsert(fetched)
+        return errors
+    
+    def run(self, tickers: List[str], metrics: Optional[List[str]] = None, quarters: int = 4,
+            view: str = "summary", sort_by: Optional[str] = None) -> str:
+        tickers = list(dict.fromkeys(ticker.strip().upper() for ticker in tickers if ticker.strip()))
+        if not tickers:
+            return "No tickers given."
+        if len(tickers) > self.max_tickers:
+            return f"At most {self.max_tickers} tickers per call."
+        metrics = metrics or ["revenue", "net_margin"]
+        unknown = [metric for metric in metrics if metric not in METRICS]
+        if unknown:
+            return f"Unknown metrics {unknown}; available: {', '.join(METRICS)}"
+        quarters = max(1, min(quarters, self.max_quarters))
+        # Ranking on a metric implies showing it
+        base = sort_by.rsplit("_avg", 1)[0].removesuffix("_yoy") if sort_by else None
+        if base in METRICS and base not in metrics:
+            metrics = metrics + [base]
+        
+        errors = self.refresh(tickers)
+        table = self.store.table()
+        if view == "series":
+            text = series_table(table, tickers, metrics, quarters)
+        else:
+            try:
+                text = summary_table(table, tickers, metrics, quarters, sort_by)
+            except ValueError as e:
+                return str(e)
+        notes = [f"{ticker}: fetch failed ({error})" for ticker, error in errors.items()]
+        return "\n".join([text] + notes)
@@ -0,0 +1,213 @@
+import fcntl
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from core import logger
+
+# Stored column -> (statement, Polygon field)
+STATEMENT_FIELDS = {
+    "revenue": ("income_statement", "revenues"),
+    "gross_profit": ("income_statement", "gross_profit"),
+    "operating_income": ("income_statement", "operating_income_loss"),
+    "net_income": ("income_statement", "net_income_loss"),
+    "eps": ("income_statement", "diluted_earnings_per_share"),
+    "assets": ("balance_sheet", "assets"),
+    "current_assets": ("balance_sheet", "current_assets"),
+    "liabilities": ("balance_sheet", "liabilities"),
+    "current_liabilities": ("balance_sheet", "current_liabilities"),
+    "equity": ("balance_sheet", "equity"),
+    "operating_cash_flow": ("cash_flow_statement", "net_cash_flow_from_operating_activities"),
+}
+COLUMNS = list(STATEMENT_FIELDS)
+
+
+class FinancialsTable(NamedTuple):
+    """One consistent view of the store: row i is ``tickers[i]``'s quarter ``periods[i]``."""
+    tickers: np.ndarray  # str
+    periods: np.ndarray  # int32: fiscal year * 4 + quarter - 1
+    end_dates: List[str]
+    values: np.ndarray  # float64 [rows, COLUMNS]
+
+
+def period_label(period: int) -> str:
+    return f"{period // 4}Q{period % 4 + 1}"
+
+
+def _value(field) -> float:
+    value = field.get("value") if isinstance(field, dict) else None
+    return float(value) if value is not None else np.nan
+
+
+def normalize_statements(results: Iterable[dict]) -> List[Tuple[int, str, List[float]]]:
+    """Quarterly (period, end date, COLUMNS values) rows from Polygon financials results, newest first.
+    
+    Annual and TTM results are skipped; a quarter reported twice keeps its
+    first (most recently filed) result.
+    """
+    rows = {}
+    for result in results or []:
+        fiscal_period = str(result.get("fiscal_period", ""))
+        if result.get("timeframe", "quarterly") != "quarterly" or not fiscal_period.startswith("Q"):
+            continue
+        try:
+            period = int(result["fiscal_year"]) * 4 + int(fiscal_period[1:]) - 1
+        except (KeyError, TypeError, ValueError):
+            continue
+        if period in rows:
+            continue
+        financials = result.get("financials") or {}
+        values = [_value((financials.get(statement) or {}).get(field)) for statement, field in STATEMENT_FIELDS.values()]
+        rows[period] = (period, str(result.get("end_date", "")), values)
+    return sorted(rows.values(), key=lambda row: row[0], reverse=True)
+
+
+class FinancialsStore:
+    """Normalized quarterly statements of many tickers, persisted as memory-mapped columns.
+    
+    Layout of ``path``:
+    - ``CURRENT``: name of the generation directory to read
+    - ``generation-*/values.f64``: row-major float64 matrix, one row per
+      (ticker, quarter) and one column per ``COLUMNS`` entry; NaN where a
+      statement omits a field
+    - ``generation-*/rows.jsonl``: ticker, period and end date of each row
+    - ``generation-*/fetched.json``: when each ticker was last fetched
+    
+    Rows are sorted by ticker, newest quarter first, so a ticker's quarters are
+    contiguous. Fetching a ticker again replaces its rows: the files are
+    written to a new generation, which is cheap at a few hundred bytes per
+    quarter, and ``CURRENT`` is swapped to it, so values and rows always
+    change together. ``.lock`` serializes writers across processes (e.g.
+    gunicorn workers); a writer first reloads a generation another process
+    wrote, so that process's tickers are kept.
+    Readers take ``table()`` and work on it without holding the lock.
+    """
+    
+    def __init__(self, path: Path, ttl_seconds: float = 86400):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl_seconds
+        self._lock = threading.Lock()
+        self._fetched: Dict[str, float] = {}
+        self._generation: Optional[str] = None
+        self._table = self._empty()
+        with self._file_lock(fcntl.LOCK_SH):
+            self._load()
+    
+    @property
+    def _current_file(self) -> Path:
+        return self.path / "CURRENT"
+    
+    @staticmethod
+    def _empty() -> FinancialsTable:
+        return FinancialsTable(np.zeros(0, dtype="U16"), np.zeros(0, dtype=np.int32), [], np.zeros((0, len(COLUMNS))))
+    
+    def __len__(self) -> int:
+        return len(self._table.periods)
+    
+    @contextmanager
+    def _file_lock(self, operation: int):
+        """Hold ``.lock`` shared (loading) or exclusive (writing) across processes."""
+        with open(self.path / ".lock", "a") as file:
+            fcntl.flock(file, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+    
+    def _current(self) -> Optional[str]:
+        try:
+            return self._current_file.read_text().strip() or None
+        except FileNotFoundError:
+            return None
+    
+    def _load(self) -> None:
+        """Read the generation ``CURRENT`` names. Caller holds the file lock."""
+        generation = self._current()
+        if generation is None:
+            return
+        directory = self.path / generation
+        with open(directory / "rows.jsonl", "r") as file:
+            rows = [json.loads(line) for line in file]
+        self._fetched = json.loads((directory / "fetched.json").read_text())
+        self._table = FinancialsTable(
+            np.array([row["ticker"] for row in rows], dtype="U16"),
+            np.array([row["period"] for row in rows], dtype=np.int32),
+            [row["end_date"] for row in rows],
+            self._map(generation, len(rows)),
+        ) if rows else self._empty()
+        self._generation = generation
+        logger.info(f"Loaded financials store from {directory} ({len(self._fetched)} tickers, {len(rows)} quarters)")
+    
+    def table(self) -> FinancialsTable:
+        return self._table
+    
+    def tickers(self) -> List[str]:
+        return sorted(self._fetched)
+    
+    def stale(self, tickers: Iterable[str]) -> List[str]:
+        """Tickers never fetched or fetched longer than ``ttl_seconds`` ago."""
+        now = time.time()
+        return [ticker for ticker in tickers if now - self._fetched.get(ticker, 0.0) > self.ttl]
+    
+    def upsert(self, statements: Dict[str, List[dict]]) -> int:
+        """Replace each ticker's rows with its normalized Polygon results; return the quarters stored."""
+        normalized = {ticker.upper(): normalize_statements(results) for ticker, results in statements.items()}
+        with self._lock, self._file_lock(fcntl.LOCK_EX):
+            if self._current() != self._generation:
+                self._load()  # another process wrote since
+            old = self._table
+            keep = ~np.isin(old.tickers, list(normalized))
+            tickers = [old.tickers[keep]]
+            periods = [old.periods[keep]]
+            end_dates = [date for date, kept in zip(old.end_dates, keep) if kept]
+            values = [np.asarray(old.values[keep])]
+            for ticker, rows in normalized.items():
+                tickers.append(np.full(len(rows), ticker, dtype="U16"))
+                periods.append(np.array([row[0] for row in rows], dtype=np.int32))
+                end_dates += [row[1] for row in rows]
+                values.append(np.array([row[2] for row in rows], dtype=np.float64).reshape(len(rows), len(COLUMNS)))
+            tickers, periods, values = np.concatenate(tickers), np.concatenate(periods), np.concatenate(values)
+            order = np.lexsort((-periods, tickers))
+            table = FinancialsTable(tickers[order], periods[order], [end_dates[i] for i in order], values[order])
+            
+            now = time.time()
+            self._fetched.update({ticker: now for ticker in normalized})
+            generation = self._write(table)
+            self._table = FinancialsTable(table.tickers, table.periods, table.end_dates, self._map(generation, len(order)))
+            self._generation = generation
+            self._prune()
+        return sum(len(rows) for rows in normalized.values())
+    
+    def _write(self, table: FinancialsTable) -> str:
+        """Write ``table`` as a new generation and point ``CURRENT`` at it; return its name. Caller holds both locks."""
+        directory = Path(tempfile.mkdtemp(prefix="generation-", dir=self.path))
+        np.ascontiguousarray(table.values, dtype=np.float64).tofile(directory / "values.f64")
+        with open(directory / "rows.jsonl", "w") as file:
+            for ticker, period, end_date in zip(table.tickers, table.periods, table.end_dates):
+                file.write(json.dumps({"ticker": str(ticker), "period": int(period), "end_date": end_date}) + "\n")
+        (directory / "fetched.json").write_text(json.dumps(self._fetched))
+        with tempfile.NamedTemporaryFile("w", prefix="CURRENT.", dir=self.path, delete=False) as file:
+            file.write(directory.name)
+        os.replace(file.name, self._current_file)
+        return directory.name
+    
+    def _prune(self) -> None:
+        """Delete superseded generations; maps readers still hold stay valid after the unlink."""
+        # Under the exclusive file lock, so no process is half-way through loading one
+        for directory in self.path.glob("generation-*"):
+            if directory.name != self._generation:
+                shutil.rmtree(directory, ignore_errors=True)
+    
+    def _map(self, generation: str, rows: int) -> np.ndarray:
+        if rows == 0:
+            return np.zeros((0, len(COLUMNS)))
+        return np.memmap(self.path / generation / "values.f64", dtype=np.float64, mode="r", shape=(rows, len(COLUMNS)))
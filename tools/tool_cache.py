@@ -0,0 +1,309 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import weakref
+from collections import Counter
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from langchain_core.tools import BaseTool, StructuredTool
+
+from core import StateStore, load_config, logger, open_state_store, run_in_threadpool
+
+# How often a worker waiting on another worker's identical call checks for its result
+REMOTE_POLL_SECONDS = 0.05
+
+
+def normalize_args(args: dict) -> str:
+    """Canonical form of tool arguments: trimmed, case- and whitespace-folded strings, sorted keys."""
+    def normalize(value):
+        if isinstance(value, str):
+            return " ".join(value.lower().split())
+        if isinstance(value, dict):
+            return {key: normalize(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [normalize(item) for item in value]
+        return value
+    return json.dumps(normalize(args), sort_keys=True, default=str)
+
+
+class ToolResultCache:
+    """TTL cache with single-flight coalescing for external tool calls.
+    
+    Results live in the ``tool_results`` state store (a bounded in-memory LRU,
+    or a server shared by all workers) and, optionally, a SQLite tier that
+    survives restarts. Concurrent identical calls (same tool, same normalized
+    arguments) share one upstream request: the first caller runs it and the
+    rest wait for its result. With a shared store the first caller also takes
+    a short lock there, so other workers wait for its result instead of
+    repeating the request. Errors are not cached.
+    """
+    
+    def __init__(self, config: Optional[dict] = None, store: Optional[StateStore] = None):
+        config = config or load_config()
+        settings = config["tools"].get("cache", {})
+        self.enabled = settings.get("enabled", True)
+        self.max_entries = settings.get("max_entries", 2048)
+        self.default_ttl = settings.get("default_ttl_seconds", 300)
+        self.tool_ttls = settings.get("ttl_seconds", {})
+        # How long other workers wait on an in-flight call before making it themselves
+        self.lock_timeout = settings.get("lock_timeout_seconds", 30)
+        
+        self._store = store or open_state_store("tool_results", max_entries=self.max_entries, config=config)
+        self._lock = threading.Lock()
+        self._inflight: dict = {}
+        # asyncio futures are bound to the loop that created them
+        self._ainflight = weakref.WeakKeyDictionary()
+        self.stats = Counter()
+        
+        self._conn = None
+        disk = settings.get("disk", {})
+        if disk.get("enabled", False):
+            path = Path(__file__).parent.parent / disk.get("path", ".cache/tool_results.sqlite")
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(path), check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS tool_results "
+                "(key TEXT PRIMARY KEY, tool TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+    
+    @property
+    def _blocking(self) -> bool:
+        """Whether lookups do I/O (disk tier or a shared store) and belong in the thread pool."""
+        return self._conn is not None or self._store.shared
+    
+    def ttl_for(self, tool_name: str) -> float:
+        return self.tool_ttls.get(tool_name, self.default_ttl)
+    
+    @staticmethod
+    def key(tool_name: str, args: dict) -> str:
+        return hashlib.sha256(f"{tool_name}\0{normalize_args(args)}".encode("utf-8")).hexdigest()
+    
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """Return (found, value), checking the state store first, then disk."""
+        value = self._store.get(key)
+        if value is not None:
+            self.stats["memory_hits"] += 1
+            return True, json.loads(value)
+        
+        if self._conn is not None:
+            now = time.time()
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT value, expires_at FROM tool_results WHERE key = ?", (key,)
+                ).fetchone()
+            if row is not None and row[1] > now:
+                self._store.set(key, row[0], ttl=row[1] - now)
+                self.stats["disk_hits"] += 1
+                return True, json.loads(row[0])
+        
+        self.stats["misses"] += 1
+        return False, None
+    
+    def set(self, key: str, tool_name: str, value: Any) -> None:
+        try:
+            serialized = json.dumps(value)
+        except (TypeError, ValueError):
+            logger.warning(f"Result of {tool_name} is not JSON-serializable; not cached")
+            return
+        ttl = self.ttl_for(tool_name)
+        self._store.set(key, serialized, ttl=ttl)
+        if self._conn is not None:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO tool_results (key, tool, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, tool_name, serialized, time.time() + ttl),
+                )
+                self._conn.commit()
+    
+    def _claim(self, key: str) -> bool:
+        """Take the cross-worker lock on ``key``; always True for a process-local store."""
+        return not self._store.shared or self._store.add(f"lock:{key}", "1", ttl=self.lock_timeout)
+    
+    def _release(self, key: str) -> None:
+        if self._store.shared:
+            self._store.delete(f"lock:{key}")
+    
+    def _poll(self, key: str) -> Tuple[bool, Any]:
+        """One check on another worker's call: (True, value) once cached, (False, None) while it runs.
+        
+        Returns (True, None) and no value when the call is over without a result
+        (it failed, or the lock expired), so the caller should fetch it itself.
+        """
+        value = self._store.get(key)
+        if value is not None:
+            self.stats["coalesced"] += 1
+            return True, json.loads(value)
+        if self._store.get(f"lock:{key}") is None:
+            return True, None
+        return False, None
+    
+    def _wait_remote(self, key: str) -> Tuple[bool, Any]:
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            done, value = self._poll(key)
+            if done:
+                return value is not None, value
+            time.sleep(REMOTE_POLL_SECONDS)
+        return False, None
+    
+    async def _await_remote(self, key: str) -> Tuple[bool, Any]:
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            done, value = await run_in_threadpool(self._poll, key)
+            if done:
+                return value is not None, value
+            await asyncio.sleep(REMOTE_POLL_SECONDS)
+        return False, None
+    
+    def call(self, tool_name: str, args: dict, fetch: Callable[[], Any]) -> Any:
+        """Return the cached result for (tool_name, args), or run ``fetch`` once for all concurrent callers."""
+        if not self.enabled:
+            return fetch()
+        key = self.key(tool_name, args)
+        found, value = self.get(key)
+        if found:
+            return value
+        
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            self.stats["coalesced"] += 1
+            return future.result()
+        
+        try:
+            claimed = self._claim(key)
+            if not claimed:
+                found, value = self._wait_remote(key)
+                if found:
+                    future.set_result(value)
+                    return value
+            self.stats["upstream_calls"] += 1
+            try:
+                value = fetch()
+                self.set(key, tool_name, value)
+            finally:
+                if claimed:
+                    self._release(key)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            self.stats["errors"] += 1
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+    
+    async def acall(self, tool_name: str, args: dict, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Async variant of :meth:`call`; coalesces callers on the same event loop.
+        
+        The call runs in its own task, so a caller that is cancelled (e.g. by a
+        tool timeout) leaves it running for the others instead of passing its
+        cancellation on to them.
+        """
+        if not self.enabled:
+            return await fetch()
+        key = self.key(tool_name, args)
+        found, value = await run_in_threadpool(self.get, key) if self._blocking else self.get(key)
+        if found:
+            return value
+        
+        inflight = self._ainflight.setdefault(asyncio.get_running_loop(), {})
+        task = inflight.get(key)
+        if task is None:
+            task = inflight[key] = asyncio.ensure_future(self._alead(key, tool_name, fetch))
+            task.add_done_callback(lambda done: self._afinish(inflight, key, done))
+        else:
+            self.stats["coalesced"] += 1
+        return await asyncio.shield(task)
+    
+    async def _alead(self, key: str, tool_name: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Run ``fetch`` for :meth:`acall` and cache its result."""
+        claimed = await run_in_threadpool(self._claim, key) if self._store.shared else True
+        if not claimed:
+            found, value = await self._await_remote(key)
+            if found:
+                return value
+        self.stats["upstream_calls"] += 1
+        try:
+            value = await fetch()
+            if self._blocking:
+                await run_in_threadpool(self.set, key, tool_name, value)
+            else:
+                self.set(key, tool_name, value)
+        finally:
+            if claimed and self._store.shared:
+                await run_in_threadpool(self._release, key)
+        return value
+    
+    def _afinish(self, inflight: dict, key: str, task: asyncio.Future) -> None:
+        inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            # Retrieved here too, so a call every caller gave up on doesn't warn about it
+            self.stats["errors"] += 1
+    
+    def clear(self) -> None:
+        self._store.clear()
+        if self._conn is not None:
+            with self._lock:
+                self._conn.execute("DELETE FROM tool_results")
+                self._conn.commit()
+    
+    def get_stats(self) -> dict:
+        stats = dict(self.stats)
+        hits = stats.get("memory_hits", 0) + stats.get("disk_hits", 0) + stats.get("coalesced", 0)
+        lookups = hits + stats.get("upstream_calls", 0)
+        store_stats = self._store.get_stats()
+        stats.update(
+            entries=store_stats.pop("entries"),
+            expired=store_stats.get("expired", 0),
+            evictions=store_stats.get("evictions", 0),
+            backend=store_stats["backend"],
+        )
+        stats["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+        return stats
+
+
+def cached_tool(tool: BaseTool, cache: Optional[ToolResultCache] = None) -> StructuredTool:
+    """Wrap ``tool`` so its calls go through ``cache``, keeping its name, description and schema.
+    
+    Without ``cache`` the process-wide one is used, created on the first call.
+    """
+    
+    def run(**kwargs):
+        return (cache or get_tool_cache()).call(tool.name, kwargs, lambda: tool.invoke(kwargs))
+    
+    async def arun(**kwargs):
+        return await (cache or get_tool_cache()).acall(tool.name, kwargs, lambda: tool.ainvoke(kwargs))
+    
+    return StructuredTool.from_function(
+        func=run,
+        coroutine=arun,
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+    )
+
+
+_tool_cache: Optional[ToolResultCache] = None
+_tool_cache_lock = threading.Lock()
+
+
+def get_tool_cache() -> ToolResultCache:
+    """Return the process-wide ToolResultCache, creating it on first use."""
+    global _tool_cache
+    if _tool_cache is None:
+        with _tool_cache_lock:
+            if _tool_cache is None:
+                _tool_cache = ToolResultCache()
+    return _tool_cache
@@ -1,46 +1,31 @@
-import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
 from dotenv import load_dotenv
-from langchain.tools import tool
-from langchain_community.tools import TavilySearchResults
-from langchain_community.tools.polygon.financials import PolygonFinancials
-from langchain_community.utilities.polygon import PolygonAPIWrapper
-from langchain_pinecone import PineconeVectorStore
-from pinecone import Pinecone
+from langchain_core.tools import BaseTool, StructuredTool
 
-from core import load_config, ModelLoader
-from models.schemas import RagToolInput
+from core import get_upstream_scheduler, load_config, run_in_threadpool
+from models.schemas import FinancialAnalyticsInput, FinancialsInput, RagToolInput, WebSearchInput
+from vectorstore import get_vector_store_manager
+from tools.tool_cache import cached_tool
 
 load_dotenv()
 
 # Initialize shared resources
 config = load_config()
-model_loader = ModelLoader()
-api_wrapper = PolygonAPIWrapper()
+# "fake" swaps Tavily and Polygon for deterministic offline tools (see tools/fakes.py)
+TOOLS_BACKEND = config["tools"].get("backend", "live")
 
 
-@tool(args_schema=RagToolInput)
-def retriever_tool(question: str) -> str:
+def _retrieve(question: str) -> str:
     """
     Search the stock market knowledge base for relevant information.
     Use this tool when the user asks about concepts, strategies, or information
     that might be covered in uploaded documents about stock trading and investing.
     """
-    pinecone_api_key = os.getenv("PINECONE_API_KEY")
-    pc = Pinecone(api_key=pinecone_api_key)
-    
-    vector_store = PineconeVectorStore(
-        index=pc.Index(config["vector_db"]["index_name"]),
-        embedding=model_loader.load_embeddings()
-    )
-    
-    retriever = vector_store.as_retriever(
-        search_type="similarity_score_threshold",
-        search_kwargs={
-            "k": config["retriever"]["top_k"],
-            "score_threshold": config["retriever"]["score_threshold"]
-        },
-    )
-    
+    retriever = get_vector_store_manager().get_retriever()
     results = retriever.invoke(question)
     
     if not results:
@@ -49,23 +34,192 @@ def retriever_tool(question: str) -> str:
     return "\n\n".join([doc.page_content for doc in results])
 
 
-# Tavily web search tool
-tavily_tool = TavilySearchResults(
-    max_results=config["tools"]["tavily"]["max_results"],
-    search_depth="advanced",
-    include_answer=True,
-    include_raw_content=True,
-    name="web_search",
-    description="Search the web for current stock market news, prices, and real-time information. Use this for up-to-date market data and news."
-)
+async def _aretrieve(question: str) -> str:
+    """Async retriever_tool: the Pinecone SDK is blocking, so run it in the bounded pool."""
+    return await run_in_threadpool(_retrieve, question)
 
 
-# Polygon financials tool
-financials_tool = PolygonFinancials(
-    api_wrapper=api_wrapper,
-    description="Get financial data and fundamentals for publicly traded companies. Use this for earnings, revenue, balance sheets, and other financial metrics."
+# Knowledge base tool (sync + async)
+retriever_tool = StructuredTool.from_function(
+    func=_retrieve,
+    coroutine=_aretrieve,
+    name="retriever_tool",
+    args_schema=RagToolInput,
 )
 
 
+WEB_SEARCH_DESCRIPTION = "Search the web for current stock market news, prices, and real-time information. Use this for up-to-date market data and news."
+FINANCIALS_DESCRIPTION = "Get financial data and fundamentals for publicly traded companies. Use this for earnings, revenue, balance sheets, and other financial metrics."
+ANALYTICS_DESCRIPTION = "Compare companies' financials across quarters: ratios (margins, ROE, leverage, liquidity), year-over-year growth, averages and rankings, returned as a compact table. Use this instead of fetching raw financials when comparing several companies or quarters."
+
+
+def lazy_tool(name: str, description: str, args_schema, factory: Callable[[], BaseTool]) -> StructuredTool:
+    """A tool that builds the real one with ``factory`` on its first call.
+    
+    Name, description and schema are known up front, so the agent can bind it
+    without importing the provider SDK; the import and client construction
+    happen once, when the tool is first used.
+    """
+    built = []
+    lock = threading.Lock()
+    
+    def resolve() -> BaseTool:
+        if not built:
+            with lock:
+                if not built:
+                    built.append(factory())
+        return built[0]
+    
+    def run(**kwargs):
+        return resolve().invoke(kwargs)
+    
+    async def arun(**kwargs):
+        tool = resolve() if built else await run_in_threadpool(resolve)
+        return await tool.ainvoke(kwargs)
+    
+    return StructuredTool.from_function(
+        func=run,
+        coroutine=arun,
+        name=name,
+        description=description,
+        args_schema=args_schema,
+    )
+
+
+def scheduled_tool(tool: BaseTool, provider: str) -> StructuredTool:
+    """Wrap ``tool`` so its calls go through the upstream scheduler's limits for ``provider``."""
+    
+    def run(**kwargs):
+        return get_upstream_scheduler().call(provider, lambda: tool.invoke(kwargs))
+    
+    async def arun(**kwargs):
+        return await get_upstream_scheduler().acall(provider, lambda: tool.ainvoke(kwargs))
+    
+    return StructuredTool.from_function(
+        func=run,
+        coroutine=arun,
+        name=tool.name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+    )
+
+
+def _build_web_search() -> BaseTool:
+    if TOOLS_BACKEND == "fake":
+        from tools.fakes import fake_search_tool
+        
+        return fake_search_tool(WEB_SEARCH_DESCRIPTION, latency=config["tools"].get("fake", {}).get("latency_seconds", 0.3))
+    
+    from langchain_community.tools import TavilySearchResults
+    
+    # Tavily web search tool (natively async via ainvoke)
+    return TavilySearchResults(
+        max_results=config["tools"]["tavily"]["max_results"],
+        search_depth="advanced",
+        include_answer=True,
+        include_raw_content=True,
+        name="web_search",
+        description=WEB_SEARCH_DESCRIPTION,
+    )
+
+
+def _build_financials() -> BaseTool:
+    if TOOLS_BACKEND == "fake":
+        from tools.fakes import fake_financials_tool
+        
+        return fake_financials_tool(FINANCIALS_DESCRIPTION, latency=config["tools"].get("fake", {}).get("latency_seconds", 0.3))
+    
+    from langchain_community.tools.polygon.financials import PolygonFinancials
+    from langchain_community.utilities.polygon import PolygonAPIWrapper
+    
+    class AsyncPolygonFinancials(PolygonFinancials):
+        """PolygonFinancials whose async path runs in the bounded thread pool."""
+        
+        async def _arun(self, query: str, run_manager=None) -> str:
+            return await run_in_threadpool(self._run, query)
+    
+    # Polygon financials tool
+    return AsyncPolygonFinancials(
+        api_wrapper=PolygonAPIWrapper(),
+        description=FINANCIALS_DESCRIPTION,
+    )
+
+
+def _build_financial_analytics() -> BaseTool:
+    from tools.financial_analytics import FinancialAnalytics
+    from tools.financials_store import FinancialsStore
+    
+    settings = config["tools"].get("analytics", {})
+    quarters = settings.get("max_quarters", 12)
+    if TOOLS_BACKEND == "fake":
+        from tools.fakes import fake_statements
+        
+        latency = config["tools"].get("fake", {}).get("latency_seconds", 0.3)
+        
+        def fetch(ticker: str) -> list:
+            time.sleep(latency)
+            return fake_statements(ticker, quarters)
+    else:
+        import requests
+        from langchain_community.utilities.polygon import POLYGON_BASE_URL, PolygonAPIWrapper
+        
+        api_key = PolygonAPIWrapper().polygon_api_key
+        
+        def fetch(ticker: str) -> list:
+            # PolygonAPIWrapper.get_financials sends neither timeframe nor limit
+            response = requests.get(f"{POLYGON_BASE_URL}vX/reference/financials", params={
+                "ticker": ticker,
+                "timeframe": "quarterly",
+                "limit": quarters,
+                "apiKey": api_key,
+            }, timeout=30)
+            response.raise_for_status()  # HTTPError carries the status the scheduler retries on
+            data = response.json()
+            if data.get("status") not in ("OK", "STOCKBUSINESS", "STOCKSBUSINESS"):
+                raise ValueError(f"API Error: {data}")
+            return data.get("results") or []
+    
+    def scheduled_fetch(ticker: str) -> list:
+        return get_upstream_scheduler().call("fake" if TOOLS_BACKEND == "fake" else "polygon", lambda: fetch(ticker))
+    
+    store = FinancialsStore(
+        Path(__file__).parent.parent / settings.get("path", ".cache/financials"),
+        ttl_seconds=settings.get("ttl_seconds", 86400),
+    )
+    analytics = FinancialAnalytics(
+        store,
+        scheduled_fetch,
+        max_tickers=settings.get("max_tickers", 20),
+        max_quarters=quarters,
+        fetch_concurrency=settings.get("fetch_concurrency", 4),
+    )
+    
+    async def arun(**kwargs) -> str:
+        return await run_in_threadpool(analytics.run, **kwargs)
+    
+    return StructuredTool.from_function(
+        func=analytics.run,
+        coroutine=arun,
+        name="financial_analytics",
+        description=ANALYTICS_DESCRIPTION,
+        args_schema=FinancialAnalyticsInput,
+    )
+
+
+# Providers are imported and constructed on first call, not at import
+tavily_tool = lazy_tool("web_search", WEB_SEARCH_DESCRIPTION, WebSearchInput, _build_web_search)
+financials_tool = lazy_tool("polygon_financials", FINANCIALS_DESCRIPTION, FinancialsInput, _build_financials)
+# Fetches go through the scheduler one ticker at a time; the tables are computed locally
+analytics_tool = lazy_tool("financial_analytics", ANALYTICS_DESCRIPTION, FinancialAnalyticsInput, _build_financial_analytics)
+
+# Calls that reach the providers are paced by the upstream scheduler
+financials_tool = scheduled_tool(financials_tool, "fake" if TOOLS_BACKEND == "fake" else "polygon")
+tavily_tool = scheduled_tool(tavily_tool, "fake" if TOOLS_BACKEND == "fake" else "tavily")
+
+# External API tools share a TTL cache with single-flight coalescing
+financials_tool = cached_tool(financials_tool)
+tavily_tool = cached_tool(tavily_tool)
+
+
 # Export all tools
-all_tools = [retriever_tool, financials_tool, tavily_tool]
+all_tools = [retriever_tool, financials_tool, tavily_tool, analytics_tool]
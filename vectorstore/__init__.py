@@ -0,0 +1,15 @@
+from vectorstore.manager import VectorStoreManager, get_vector_store_manager
+from vectorstore.local_index import LocalVectorIndex
+from vectorstore.local_store import LocalVectorStore
+from vectorstore.bm25 import BM25Index
+from vectorstore.hybrid import HybridRetriever, reciprocal_rank_fusion
+
+__all__ = [
+    "VectorStoreManager",
+    "get_vector_store_manager",
+    "LocalVectorIndex",
+    "LocalVectorStore",
+    "BM25Index",
+    "HybridRetriever",
+    "reciprocal_rank_fusion",
+]
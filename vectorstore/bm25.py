@@ -0,0 +1,134 @@
+import json
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from core import logger
+
+# Keeps tickers ("aapl"), ratios ("p/e"), amounts ("$1.2b") and hyphenated terms intact
+TOKEN_PATTERN = re.compile(r"[a-z0-9$][a-z0-9.&/%$-]*[a-z0-9%]|[a-z0-9]")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how i in is it its of on or that the this to was what when "
+    "where which who why will with you your do does did can".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase and split into terms, dropping common English stopwords."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """Incremental Okapi BM25 inverted index persisted in SQLite.
+    
+    Postings are held in memory for scoring and written through to SQLite on
+    every add/delete, so the index is built as documents are ingested and
+    survives restarts without a rebuild step.
+    """
+    
+    def __init__(self, path: Path, k1: float = 1.5, b: float = 0.75):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.k1 = k1
+        self.b = b
+        
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._lengths: Dict[str, int] = {}
+        self._texts: Dict[str, Tuple[str, dict]] = {}
+        self._total_length = 0
+        
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents (id TEXT PRIMARY KEY, text TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        self._load()
+    
+    def __len__(self) -> int:
+        return len(self._lengths)
+    
+    def _load(self) -> None:
+        for doc_id, text, metadata in self._conn.execute("SELECT id, text, metadata FROM documents"):
+            self._index(doc_id, text, json.loads(metadata))
+        if self._lengths:
+            logger.info(f"Loaded BM25 index from {self.path} ({len(self)} documents)")
+    
+    def _index(self, doc_id: str, text: str, metadata: dict) -> None:
+        terms = Counter(tokenize(text))
+        for term, tf in terms.items():
+            self._postings[term][doc_id] = tf
+        length = sum(terms.values())
+        self._lengths[doc_id] = length
+        self._total_length += length
+        self._texts[doc_id] = (text, metadata)
+    
+    def _unindex(self, doc_id: str) -> None:
+        text, _ = self._texts.pop(doc_id)
+        for term in set(tokenize(text)):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+        self._total_length -= self._lengths.pop(doc_id)
+    
+    def add(self, ids: List[str], texts: List[str], metadatas: Optional[List[dict]] = None) -> None:
+        """Index documents; re-adding an id replaces it."""
+        metadatas = metadatas or [{} for _ in ids]
+        with self._lock:
+            for doc_id, text, metadata in zip(ids, texts, metadatas):
+                if doc_id in self._texts:
+                    self._unindex(doc_id)
+                self._index(doc_id, text, metadata)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO documents (id, text, metadata) VALUES (?, ?, ?)",
+                [(doc_id, text, json.dumps(metadata)) for doc_id, text, metadata in zip(ids, texts, metadatas)],
+            )
+            self._conn.commit()
+    
+    def contains(self, ids: List[str]) -> List[str]:
+        with self._lock:
+            return [doc_id for doc_id in ids if doc_id in self._texts]
+    
+    def delete(self, ids: List[str]) -> None:
+        with self._lock:
+            removed = [doc_id for doc_id in ids if doc_id in self._texts]
+            for doc_id in removed:
+                self._unindex(doc_id)
+            self._conn.executemany("DELETE FROM documents WHERE id = ?", [(doc_id,) for doc_id in removed])
+            self._conn.commit()
+    
+    def search(self, query: str, k: int = 10, min_score: float = 0.0) -> List[Tuple[str, float, str, dict]]:
+        """Return up to ``k`` (id, bm25 score, text, metadata), best first.
+        
+        ``min_score`` drops hits scoring below that fraction of the query's
+        reference score: that of an average-length document containing every
+        query term once (the sum of the terms' IDFs, counting terms no document
+        contains). A hit that only shares a common word with the query stays
+        well below it.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            n = len(self._lengths)
+            if n == 0 or not terms:
+                return []
+            avg_length = self._total_length / n
+            scores: Dict[str, float] = defaultdict(float)
+            reference = 0.0
+            for term in terms:
+                postings = self._postings.get(term) or {}
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                reference += idf
+                for doc_id, tf in postings.items():
+                    norm = tf + self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / norm
+            floor = min_score * reference
+            top = sorted(((doc_id, score) for doc_id, score in scores.items() if score >= floor),
+                         key=lambda item: item[1], reverse=True)[:k]
+            return [(doc_id, score, *self._texts[doc_id]) for doc_id, score in top]
@@ -0,0 +1,94 @@
+import hashlib
+import re
+from typing import Any, Dict, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+
+from core import extract_tickers
+from core.tracing import get_tracer
+from vectorstore.bm25 import BM25Index, tokenize
+
+
+def _doc_key(document: Document) -> str:
+    """Chunk IDs are content hashes, so the content identifies a chunk across retrievers."""
+    return hashlib.sha256(document.page_content.encode("utf-8")).hexdigest()
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], rrf_k: int = 60) -> List[tuple]:
+    """Fuse ranked lists: score(d) = sum over lists of 1 / (rrf_k + rank)."""
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking, start=1):
+            key = _doc_key(document)
+            documents.setdefault(key, document)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+    fused = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return [(documents[key], score) for key, score in fused]
+
+
+def lexical_rerank(question: str, candidates: List[tuple]) -> List[tuple]:
+    """Cheap local reranker over fused (document, score) candidates.
+    
+    Blends the normalized fusion score with query-term coverage and a bonus
+    for chunks containing a ticker the question names (cashtags, upper-case
+    symbols other than words like "I", "EPS" or "CEO", and company names).
+    """
+    if not candidates:
+        return candidates
+    terms = set(tokenize(question))
+    tickers = extract_tickers(question)
+    top_score = candidates[0][1]
+    
+    reranked = []
+    for document, score in candidates:
+        doc_terms = set(tokenize(document.page_content))
+        coverage = len(terms & doc_terms) / len(terms) if terms else 0.0
+        mentions_ticker = any(re.search(rf"\b{re.escape(t)}\b", document.page_content) for t in tickers)
+        ticker_bonus = 0.2 if mentions_ticker else 0.0
+        reranked.append((document, 0.5 * score / top_score + 0.5 * coverage + ticker_bonus))
+    return sorted(reranked, key=lambda item: item[1], reverse=True)
+
+
+class HybridRetriever(BaseRetriever):
+    """BM25 + vector retrieval fused with reciprocal rank fusion.
+    
+    Vector candidates below ``score_threshold`` are dropped before fusion, so an
+    exact ticker or term match from BM25 can still surface when embeddings miss.
+    BM25 candidates below ``keyword_min_score`` (relative to the query, see
+    ``BM25Index.search``) are dropped too, so a question unrelated to the
+    knowledge base finds nothing rather than whatever shares a word with it.
+    """
+    
+    vector_store: VectorStore
+    keyword_index: BM25Index
+    k: int = 3
+    candidate_k: int = 20
+    score_threshold: float = 0.0
+    keyword_min_score: float = 0.3
+    rrf_k: int = 60
+    reranker: Optional[str] = "lexical"
+    
+    model_config = {"arbitrary_types_allowed": True}
+    
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: Optional[CallbackManagerForRetrieverRun] = None, **kwargs: Any
+    ) -> List[Document]:
+        tracer = get_tracer()
+        with tracer.span("vector_query", type(self.vector_store).__name__, k=self.candidate_k):
+            vector_results = self.vector_store.similarity_search_with_relevance_scores(query, k=self.candidate_k)
+        vector_hits = [document for document, score in vector_results if score >= self.score_threshold]
+        with tracer.span("vector_query", "bm25", k=self.candidate_k):
+            keyword_results = self.keyword_index.search(query, k=self.candidate_k, min_score=self.keyword_min_score)
+        keyword_hits = [
+            Document(id=doc_id, page_content=text, metadata=metadata)
+            for doc_id, _, text, metadata in keyword_results
+        ]
+        
+        fused = reciprocal_rank_fusion([vector_hits, keyword_hits], rrf_k=self.rrf_k)
+        if self.reranker == "lexical":
+            fused = lexical_rerank(query, fused)
+        return [document for document, _ in fused[:self.k]]
@@ -0,0 +1,274 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from core import logger
+
+
+class LocalVectorIndex:
+    """In-process cosine-similarity index persisted as memory-mapped files.
+    
+    Layout of ``path``:
+    - ``vectors.f32``: row-major float32 matrix of unit-normalized vectors (append-only)
+    - ``records.jsonl``: one line per row with its id and metadata, plus
+      ``{"deleted": id}`` tombstones
+    - ``ivf.npz``: trained IVF centroids and row assignments (approximate mode)
+    
+    ``search="exact"`` scores every live row. ``search="ivf"`` clusters rows with
+    k-means and only scores rows in the ``nprobe`` clusters closest to the query,
+    trading a little recall for much lower latency on large corpora. IVF is used
+    once the index has at least ``min_train_size`` rows and is retrained when the
+    index grows 4x past its last training size.
+    """
+    
+    def __init__(
+        self,
+        path: Path,
+        dimension: int,
+        search: str = "exact",
+        nlist: int = 0,
+        nprobe: int = 8,
+        min_train_size: int = 10000,
+    ):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.dimension = dimension
+        self.search_mode = search
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        
+        self._lock = threading.RLock()
+        self._ids: List[str] = []
+        self._metadata: List[dict] = []
+        self._row_of: Dict[str, int] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._matrix = np.zeros((0, dimension), dtype=np.float32)
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._trained_size = 0
+        self._load()
+    
+    @property
+    def _vectors_file(self) -> Path:
+        return self.path / "vectors.f32"
+    
+    @property
+    def _records_file(self) -> Path:
+        return self.path / "records.jsonl"
+    
+    @property
+    def _ivf_file(self) -> Path:
+        return self.path / "ivf.npz"
+    
+    def __len__(self) -> int:
+        return len(self._row_of)
+    
+    def _load(self) -> None:
+        if not self._records_file.exists():
+            return
+        
+        with open(self._records_file, "r") as file:
+            for line in file:
+                record = json.loads(line)
+                if "deleted" in record:
+                    row = self._row_of.pop(record["deleted"], None)
+                    if row is not None:
+                        self._metadata[row] = None
+                    continue
+                previous = self._row_of.get(record["id"])
+                if previous is not None:
+                    self._metadata[previous] = None
+                self._row_of[record["id"]] = len(self._ids)
+                self._ids.append(record["id"])
+                self._metadata.append(record["metadata"])
+        
+        self._remap()
+        self._alive = np.zeros(len(self._ids), dtype=bool)
+        self._alive[list(self._row_of.values())] = True
+        
+        if self._ivf_file.exists():
+            ivf = np.load(self._ivf_file)
+            self._centroids = ivf["centroids"]
+            trained_rows = len(ivf["assignments"])
+            self._assignments = np.concatenate(
+                [ivf["assignments"], self._assign(self._matrix[trained_rows:])]
+            ).astype(np.int32)
+            self._trained_size = int(ivf["trained_size"])
+        logger.info(f"Loaded local vector index from {self.path} ({len(self)} vectors)")
+    
+    def _remap(self) -> None:
+        """Re-open the vectors file as a read-only memory map."""
+        rows = len(self._ids)
+        if rows == 0:
+            self._matrix = np.zeros((0, self.dimension), dtype=np.float32)
+        else:
+            self._matrix = np.memmap(self._vectors_file, dtype=np.float32, mode="r", shape=(rows, self.dimension))
+    
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype(np.float32)
+    
+    def add(self, ids: List[str], vectors: Iterable[List[float]], metadata: List[dict]) -> None:
+        """Append vectors; re-adding an existing id replaces it."""
+        vectors = self._normalize(np.asarray(list(vectors), dtype=np.float32).reshape(len(ids), self.dimension))
+        
+        with self._lock:
+            start = len(self._ids)
+            with open(self._vectors_file, "ab") as file:
+                file.write(vectors.tobytes())
+            with open(self._records_file, "a") as file:
+                for vector_id, meta in zip(ids, metadata):
+                    file.write(json.dumps({"id": vector_id, "metadata": meta}) + "\n")
+            
+            alive = np.concatenate([self._alive, np.ones(len(ids), dtype=bool)])
+            for offset, (vector_id, meta) in enumerate(zip(ids, metadata)):
+                previous = self._row_of.get(vector_id)
+                if previous is not None:
+                    alive[previous] = False
+                    self._metadata[previous] = None
+                self._row_of[vector_id] = start + offset
+                self._ids.append(vector_id)
+                self._metadata.append(meta)
+            
+            self._remap()
+            if self._centroids is not None:
+                self._assignments = np.concatenate([self._assignments, self._assign(vectors)]).astype(np.int32)
+            self._alive = alive
+            self._maybe_train()
+    
+    def delete(self, ids: List[str]) -> None:
+        """Tombstone ids; compacts the files once most rows are dead."""
+        with self._lock:
+            removed = [vector_id for vector_id in ids if vector_id in self._row_of]
+            if not removed:
+                return
+            with open(self._records_file, "a") as file:
+                for vector_id in removed:
+                    file.write(json.dumps({"deleted": vector_id}) + "\n")
+            alive = self._alive.copy()
+            for vector_id in removed:
+                row = self._row_of.pop(vector_id)
+                alive[row] = False
+                self._metadata[row] = None
+            self._alive = alive
+            
+            if len(self._row_of) < len(self._ids) // 2:
+                self._compact()
+    
+    def _compact(self) -> None:
+        """Rewrite the files without dead rows. Caller holds the lock."""
+        rows = np.flatnonzero(self._alive)
+        vectors = np.array(self._matrix[rows])
+        ids = [self._ids[row] for row in rows]
+        metadata = [self._metadata[row] for row in rows]
+        
+        tmp_vectors = self._vectors_file.with_suffix(".tmp")
+        tmp_records = self._records_file.with_suffix(".tmp")
+        vectors.tofile(tmp_vectors)
+        with open(tmp_records, "w") as file:
+            for vector_id, meta in zip(ids, metadata):
+                file.write(json.dumps({"id": vector_id, "metadata": meta}) + "\n")
+        self._matrix = np.zeros((0, self.dimension), dtype=np.float32)  # release the old map
+        os.replace(tmp_vectors, self._vectors_file)
+        os.replace(tmp_records, self._records_file)
+        
+        self._ids, self._metadata = ids, metadata
+        self._row_of = {vector_id: row for row, vector_id in enumerate(ids)}
+        self._alive = np.ones(len(ids), dtype=bool)
+        self._remap()
+        if self._centroids is not None:
+            self._assignments = self._assignments[rows]
+            self._save_ivf()
+        logger.info(f"Compacted local vector index to {len(ids)} vectors")
+    
+    def contains(self, ids: List[str]) -> List[str]:
+        return [vector_id for vector_id in ids if vector_id in self._row_of]
+    
+    def get(self, ids: List[str]) -> List[Tuple[str, dict]]:
+        with self._lock:
+            return [(vector_id, self._metadata[self._row_of[vector_id]]) for vector_id in ids if vector_id in self._row_of]
+    
+    def get_vectors(self, ids: List[str]) -> List[Tuple[str, np.ndarray]]:
+        """Stored (normalized) vectors by id; unknown ids are left out."""
+        with self._lock:
+            return [(vector_id, np.array(self._matrix[self._row_of[vector_id]])) for vector_id in ids if vector_id in self._row_of]
+    
+    # ---- IVF -----------------------------------------------------------------
+    
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        if self._centroids is None or len(vectors) == 0:
+            return np.zeros(len(vectors), dtype=np.int32)
+        return np.argmax(np.asarray(vectors) @ self._centroids.T, axis=1).astype(np.int32)
+    
+    def _maybe_train(self) -> None:
+        """Train IVF when first large enough and retrain after 4x growth. Caller holds the lock."""
+        if self.search_mode != "ivf" or len(self) < self.min_train_size:
+            return
+        if self._centroids is not None and len(self) < 4 * self._trained_size:
+            return
+        self.train()
+    
+    def train(self, iterations: int = 10, sample_size: int = 50000, seed: int = 0) -> None:
+        """Run spherical k-means over a sample of live rows."""
+        with self._lock:
+            rows = np.flatnonzero(self._alive)
+            if len(rows) == 0:
+                return
+            nlist = self.nlist or max(1, int(np.sqrt(len(rows))))
+            rng = np.random.default_rng(seed)
+            sample = np.asarray(self._matrix[rng.choice(rows, size=min(sample_size, len(rows)), replace=False)])
+            centroids = sample[rng.choice(len(sample), size=min(nlist, len(sample)), replace=False)]
+            
+            for _ in range(iterations):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                for cluster in range(len(centroids)):
+                    members = sample[labels == cluster]
+                    if len(members):
+                        centroids[cluster] = members.mean(axis=0)
+                centroids = self._normalize(centroids)
+            
+            self._centroids = centroids
+            self._assignments = np.concatenate([
+                self._assign(self._matrix[i:i + 65536]) for i in range(0, len(self._ids), 65536)
+            ]).astype(np.int32)
+            self._trained_size = len(rows)
+            self._save_ivf()
+            logger.info(f"Trained IVF with {len(centroids)} lists over {len(rows)} vectors")
+    
+    def _save_ivf(self) -> None:
+        np.savez(self._ivf_file, centroids=self._centroids, assignments=self._assignments,
+                 trained_size=self._trained_size)
+    
+    # ---- Search --------------------------------------------------------------
+    
+    def search(self, vector: List[float], k: int = 4, exact: Optional[bool] = None) -> List[Tuple[str, float, dict]]:
+        """Return up to ``k`` (id, cosine similarity, metadata), best first."""
+        query = self._normalize(np.asarray(vector, dtype=np.float32).reshape(1, -1))[0]
+        with self._lock:
+            matrix, alive, ids, metadata = self._matrix, self._alive, self._ids, self._metadata
+            centroids, assignments = self._centroids, self._assignments
+        
+        if len(ids) == 0:
+            return []
+        
+        use_ivf = centroids is not None and self.search_mode == "ivf" and not exact
+        if use_ivf:
+            probe = np.zeros(len(centroids), dtype=bool)
+            probe[np.argsort(centroids @ query)[-self.nprobe:]] = True
+            candidates = np.flatnonzero(probe[assignments] & alive[:len(assignments)])
+        else:
+            candidates = np.flatnonzero(alive)
+        if len(candidates) == 0:
+            return []
+        
+        scores = np.asarray(matrix[candidates]) @ query
+        top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[candidates[i]], float(scores[i]), metadata[candidates[i]]) for i in top]
@@ -0,0 +1,89 @@
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+from uuid import uuid4
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from core import run_in_threadpool
+from vectorstore.local_index import LocalVectorIndex
+
+
+class LocalVectorStore(VectorStore):
+    """LangChain VectorStore over a LocalVectorIndex.
+    
+    Mirrors PineconeVectorStore's conventions (text stored in metadata under
+    ``text``, cosine scores mapped to [0, 1] relevance) so the retriever's
+    ``score_threshold`` means the same thing for both providers.
+    """
+    
+    def __init__(self, index: LocalVectorIndex, embedding: Embeddings, text_key: str = "text"):
+        self.index = index
+        self._embedding = embedding
+        self._text_key = text_key
+    
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+    
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        ids = list(ids) if ids else [str(uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = self._embedding.embed_documents(texts)
+        self.index.add(ids, vectors, [{**meta, self._text_key: text} for meta, text in zip(metadatas, texts)])
+        return ids
+    
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if ids:
+            self.index.delete(ids)
+        return True
+    
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        return [self._to_document(vector_id, meta) for vector_id, meta in self.index.get(list(ids))]
+    
+    def _to_document(self, vector_id: str, metadata: dict) -> Document:
+        metadata = dict(metadata)
+        text = metadata.pop(self._text_key, "")
+        return Document(id=vector_id, page_content=text, metadata=metadata)
+    
+    def similarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4) -> List[Tuple[Document, float]]:
+        return [(self._to_document(vector_id, meta), score) for vector_id, score, meta in self.index.search(embedding, k)]
+    
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k)
+    
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+    
+    async def asimilarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return await run_in_threadpool(self.similarity_search_with_score, query, k)
+    
+    @staticmethod
+    def _cosine_relevance_score_fn(score: float) -> float:
+        """Cosine similarity in [-1, 1] -> relevance in [0, 1], as PineconeVectorStore does."""
+        return min(1.0, max(0.0, (score + 1) / 2))  # clip float32 rounding past +-1
+    
+    def _select_relevance_score_fn(self):
+        return self._cosine_relevance_score_fn
+    
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        *,
+        path: str = ".cache/vector_index",
+        dimension: int = 768,
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        store = cls(LocalVectorIndex(path, dimension), embedding)
+        store.add_texts(texts, metadatas, **kwargs)
+        return store
@@ -0,0 +1,276 @@
+import os
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set, Union
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from core import load_config, ModelLoader, logger
+from vectorstore.bm25 import BM25Index
+from vectorstore.hybrid import HybridRetriever
+from vectorstore.local_index import LocalVectorIndex
+from vectorstore.local_store import LocalVectorStore
+
+if TYPE_CHECKING:
+    from langchain_pinecone import PineconeVectorStore
+    from pinecone import Pinecone
+
+PROVIDERS = ["pinecone", "local"]
+
+
+class VectorStoreManager:
+    """Lazily created, reusable vector-store and embedding clients.
+    
+    The backend is chosen by ``vector_db.provider``: ``pinecone`` (serverless)
+    or ``local`` (an in-process LocalVectorIndex persisted under
+    ``vector_db.local.path``). Clients, index handles, the embedding model and
+    vector stores are built on first use and reused afterwards, so connection
+    pools survive across tool calls and uploads. ``stats`` counts how often each
+    resource was created vs. reused. The Pinecone SDK is only imported when
+    the pinecone provider is actually used.
+    """
+    
+    def __init__(
+        self,
+        config: Optional[dict] = None,
+        pinecone_factory: Optional[Callable[..., "Pinecone"]] = None,
+        embeddings_factory: Optional[Callable] = None,
+    ):
+        load_dotenv()
+        self.config = config or load_config()
+        self.provider = self.config["vector_db"].get("provider", "pinecone")
+        if self.provider not in PROVIDERS:
+            raise ValueError(f"Unknown vector_db.provider '{self.provider}', expected one of {PROVIDERS}")
+        self._pinecone_factory = pinecone_factory
+        self._embeddings_factory = embeddings_factory
+        self._lock = threading.RLock()
+        self._client = None
+        self._embeddings = None
+        self._indexes = {}
+        self._vector_stores = {}
+        self._known_indexes = set()
+        self._keyword_index = None
+        self._retrievers = {}
+        self.stats = Counter()
+    
+    def _get_or_create(self, name: str, current, create: Callable):
+        """Return ``current`` if set, otherwise create it; counts either way."""
+        if current is not None:
+            self.stats[f"{name}_reused"] += 1
+            return current, False
+        self.stats[f"{name}_created"] += 1
+        return create(), True
+    
+    def get_client(self) -> "Pinecone":
+        """Return the shared Pinecone client."""
+        with self._lock:
+            self._client, _ = self._get_or_create("client", self._client, self._create_client)
+            return self._client
+    
+    def _create_client(self) -> "Pinecone":
+        api_key = os.getenv("PINECONE_API_KEY")
+        if not api_key:
+            raise EnvironmentError("Missing environment variables: ['PINECONE_API_KEY']")
+        pool_threads = self.config["vector_db"].get("pool_threads", 4)
+        logger.info(f"Creating Pinecone client (pool_threads={pool_threads})")
+        factory = self._pinecone_factory
+        if factory is None:
+            from pinecone import Pinecone as factory
+        return factory(api_key=api_key, pool_threads=pool_threads)
+    
+    def get_embeddings(self):
+        """Return the shared embedding model."""
+        with self._lock:
+            self._embeddings, _ = self._get_or_create("embeddings", self._embeddings, self._create_embeddings)
+            return self._embeddings
+    
+    def _create_embeddings(self):
+        if self._embeddings_factory is not None:
+            return self._embeddings_factory()
+        return ModelLoader().load_embeddings()
+    
+    def _index_name(self, index_name: Optional[str]) -> str:
+        return index_name or self.config["vector_db"]["index_name"]
+    
+    def _create_local_index(self, name: str) -> LocalVectorIndex:
+        settings = self.config["vector_db"].get("local", {})
+        path = Path(__file__).parent.parent / settings.get("path", ".cache/vector_index") / name
+        ivf = settings.get("ivf", {})
+        return LocalVectorIndex(
+            path,
+            dimension=settings.get("dimension", 768),
+            search=settings.get("search", "exact"),
+            nlist=ivf.get("nlist", 0),
+            nprobe=ivf.get("nprobe", 8),
+            min_train_size=ivf.get("min_train_size", 10000),
+        )
+    
+    def get_index(self, index_name: Optional[str] = None):
+        """Return a shared handle for the index (a LocalVectorIndex for the local provider)."""
+        name = self._index_name(index_name)
+        if self.provider == "local":
+            create = lambda: self._create_local_index(name)
+        else:
+            create = lambda: self.get_client().Index(name)
+        with self._lock:
+            index, _ = self._get_or_create("index", self._indexes.get(name), create)
+            self._indexes[name] = index
+            return index
+    
+    def ensure_index(self, index_name: Optional[str] = None, dimension: int = 768) -> None:
+        """Create the index if it doesn't exist. Checked once per process."""
+        name = self._index_name(index_name)
+        with self._lock:
+            if self.provider == "local" or name in self._known_indexes:
+                return
+            client = self.get_client()
+            existing_indexes = [idx.name for idx in client.list_indexes()]
+            if name not in existing_indexes:
+                from pinecone import ServerlessSpec
+                
+                logger.info(f"Creating Pinecone index: {name}")
+                client.create_index(
+                    name=name,
+                    dimension=dimension,
+                    metric="cosine",
+                    spec=ServerlessSpec(cloud="aws", region="us-east-1"),
+                )
+            self._known_indexes.add(name)
+    
+    def get_vector_store(self, index_name: Optional[str] = None) -> Union["PineconeVectorStore", LocalVectorStore]:
+        """Return a shared vector store bound to the index and embedding model."""
+        name = self._index_name(index_name)
+        if self.provider == "local":
+            store_class = LocalVectorStore
+        else:
+            from langchain_pinecone import PineconeVectorStore as store_class
+        with self._lock:
+            store, _ = self._get_or_create(
+                "vector_store",
+                self._vector_stores.get(name),
+                lambda: store_class(index=self.get_index(name), embedding=self.get_embeddings()),
+            )
+            self._vector_stores[name] = store
+            return store
+    
+    def get_keyword_index(self) -> Optional[BM25Index]:
+        """Return the shared BM25 index, or None if ``retriever.bm25.enabled`` is off."""
+        settings = self.config["retriever"].get("bm25", {})
+        if not settings.get("enabled", False):
+            return None
+        with self._lock:
+            if self._keyword_index is None:
+                path = Path(__file__).parent.parent / settings.get("path", ".cache/bm25.sqlite")
+                self._keyword_index = BM25Index(path, k1=settings.get("k1", 1.5), b=settings.get("b", 0.75))
+            return self._keyword_index
+    
+    def get_retriever(self, index_name: Optional[str] = None):
+        """Return the shared retriever for ``retriever.mode`` (``vector`` or ``hybrid``)."""
+        name = self._index_name(index_name)
+        with self._lock:
+            retriever, _ = self._get_or_create("retriever", self._retrievers.get(name), lambda: self._create_retriever(name))
+            self._retrievers[name] = retriever
+            return retriever
+    
+    def _create_retriever(self, name: str):
+        settings = self.config["retriever"]
+        vector_store = self.get_vector_store(name)
+        keyword_index = self.get_keyword_index()
+        
+        if settings.get("mode", "vector") == "hybrid" and keyword_index is not None:
+            hybrid = settings.get("hybrid", {})
+            return HybridRetriever(
+                vector_store=vector_store,
+                keyword_index=keyword_index,
+                k=settings["top_k"],
+                candidate_k=hybrid.get("candidate_k", 20),
+                score_threshold=settings["score_threshold"],
+                keyword_min_score=hybrid.get("keyword_min_score", 0.3),
+                rrf_k=hybrid.get("rrf_k", 60),
+                reranker=hybrid.get("reranker", "lexical"),
+            )
+        
+        return vector_store.as_retriever(
+            search_type="similarity_score_threshold",
+            search_kwargs={"k": settings["top_k"], "score_threshold": settings["score_threshold"]},
+        )
+    
+    def existing_ids(self, ids: List[str], index_name: Optional[str] = None) -> Set[str]:
+        """Return the subset of ``ids`` already stored in the index."""
+        index = self.get_index(index_name)
+        if self.provider == "local":
+            return set(index.contains(ids))
+        found = set()
+        for i in range(0, len(ids), 100):
+            response = index.fetch(ids=ids[i:i + 100])
+            found.update(response.vectors.keys())
+        return found
+    
+    def get_documents(self, ids: List[str], index_name: Optional[str] = None) -> List[Document]:
+        """Stored chunks by ID, rebuilt from the text and metadata kept with their vectors."""
+        index = self.get_index(index_name)
+        if self.provider == "local":
+            records = [(vector_id, dict(metadata)) for vector_id, metadata in index.get(ids)]
+        else:
+            records = []
+            for i in range(0, len(ids), 100):
+                response = index.fetch(ids=ids[i:i + 100])
+                records += [(vector_id, dict(vector.metadata or {})) for vector_id, vector in response.vectors.items()]
+        return [Document(id=vector_id, page_content=metadata.pop("text", ""), metadata=metadata) for vector_id, metadata in records]
+    
+    def get_vectors(self, ids: List[str], index_name: Optional[str] = None) -> Dict[str, List[float]]:
+        """Stored vectors by ID; IDs not in the index are left out."""
+        index = self.get_index(index_name)
+        if self.provider == "local":
+            return {vector_id: vector.tolist() for vector_id, vector in index.get_vectors(ids)}
+        vectors = {}
+        for i in range(0, len(ids), 100):
+            response = index.fetch(ids=ids[i:i + 100])
+            vectors.update((vector_id, list(vector.values)) for vector_id, vector in response.vectors.items())
+        return vectors
+    
+    def add_vectors(self, ids: List[str], vectors: List[List[float]], documents: List[Document],
+                    index_name: Optional[str] = None) -> None:
+        """Upsert already computed vectors for ``documents``, keeping the text under ``text`` like the vector stores."""
+        index = self.get_index(index_name)
+        metadata = [{**document.metadata, "text": document.page_content} for document in documents]
+        if self.provider == "local":
+            index.add(ids, vectors, metadata)
+            return
+        records = [{"id": vector_id, "values": [float(x) for x in vector], "metadata": meta}
+                   for vector_id, vector, meta in zip(ids, vectors, metadata)]
+        for i in range(0, len(records), 100):
+            index.upsert(vectors=records[i:i + 100])
+    
+    def delete_ids(self, ids: List[str], index_name: Optional[str] = None) -> None:
+        """Delete vectors (and their keyword-index entries) by ID."""
+        keyword_index = self.get_keyword_index()
+        if keyword_index is not None:
+            keyword_index.delete(ids)
+        index = self.get_index(index_name)
+        if self.provider == "local":
+            index.delete(ids)
+            return
+        for i in range(0, len(ids), 1000):
+            index.delete(ids=ids[i:i + 1000])
+    
+    def get_stats(self) -> dict:
+        """Return creation/reuse counters."""
+        with self._lock:
+            return dict(self.stats)
+
+
+_manager: Optional[VectorStoreManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_vector_store_manager() -> VectorStoreManager:
+    """Return the process-wide VectorStoreManager, creating it on first use."""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = VectorStoreManager()
+    return _manager